@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析任务队列
+负责将耗时的简历分析流程从HTTP请求中解耦：接口层只负责入队并立即返回任务ID，
+由有界线程池在后台执行 提取 → 大模型分析 → 报告渲染，客户端通过任务ID轮询状态、进度与结果；
+ASGI服务模式下任务以协程形式在事件循环中执行，并发数只受排队上限约束
+"""
+
+import os
+import time
+import asyncio
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, Callable
+
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# 任务状态
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_SUCCEEDED = 'succeeded'
+JOB_FAILED = 'failed'
+
+
+class JobQueueFullError(Exception):
+    """任务队列已满"""
+
+
+class AnalysisJob:
+    """单个分析任务"""
+
+    def __init__(self, job_id: str):
+        self.job_id = job_id
+        self.status = JOB_QUEUED
+        self.stage = 'queued'
+        self.progress = 0
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self._lock = threading.Lock()
+
+    def update(self, stage: Optional[str] = None, progress: Optional[int] = None):
+        """
+        更新任务阶段与进度，供任务函数在各处理阶段调用
+
+        Args:
+            stage: 当前阶段名称
+            progress: 进度百分比（0-100）
+        """
+        with self._lock:
+            if stage is not None:
+                self.stage = stage
+            if progress is not None:
+                self.progress = max(0, min(100, int(progress)))
+            self.updated_at = time.time()
+
+    def _start(self):
+        with self._lock:
+            self.status = JOB_RUNNING
+            self.stage = 'running'
+            self.updated_at = time.time()
+
+    def _finish(self, status: str, result: Any = None, error: Optional[str] = None):
+        with self._lock:
+            self.status = status
+            self.stage = 'done' if status == JOB_SUCCEEDED else 'failed'
+            if status == JOB_SUCCEEDED:
+                self.progress = 100
+            self.result = result
+            self.error = error
+            self.updated_at = time.time()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (JOB_SUCCEEDED, JOB_FAILED)
+
+    def to_dict(self, include_result: bool = True) -> Dict[str, Any]:
+        """
+        转换为可序列化的字典
+
+        Args:
+            include_result: 是否包含任务结果
+
+        Returns:
+            任务状态字典
+        """
+        with self._lock:
+            data = {
+                'job_id': self.job_id,
+                'status': self.status,
+                'stage': self.stage,
+                'progress': self.progress,
+                'created_at': self.created_at,
+                'updated_at': self.updated_at,
+            }
+            if self.error:
+                data['error'] = self.error
+            if include_result and self.status == JOB_SUCCEEDED:
+                data['result'] = self.result
+            return data
+
+
+class AnalysisJobManager:
+    """有界线程池驱动的分析任务管理器"""
+
+    def __init__(self, max_workers: int = 4, max_pending: int = 100, ttl: int = 3600):
+        """
+        初始化任务管理器
+
+        Args:
+            max_workers: 同时执行的任务数上限
+            max_pending: 排队+执行中的任务数上限，超过后拒绝入队
+            ttl: 已结束任务的保留时长（秒）
+        """
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.ttl = ttl
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='analysis-job')
+        # 按创建顺序保存任务，清理时只需从头部弹出过期任务
+        self._jobs = OrderedDict()
+        self._pending = 0
+        self._lock = threading.Lock()
+        # 持有协程任务的引用，避免执行中被垃圾回收
+        self._tasks = set()
+
+    def submit(self, func: Callable[..., Any], *args, **kwargs) -> AnalysisJob:
+        """
+        提交分析任务
+
+        Args:
+            func: 任务函数，第一个参数为AnalysisJob，用于上报进度；返回值作为任务结果
+            *args, **kwargs: 传给任务函数的其余参数
+
+        Returns:
+            新建的任务对象
+
+        Raises:
+            JobQueueFullError: 排队任务数已达上限
+        """
+        job = self._create_job()
+        # 任务沿用提交请求的追踪上下文，任务内的span归入同一追踪
+        self._executor.submit(tracing.propagate(self._run), job, func, args, kwargs)
+        return job
+
+    def submit_async(self, func: Callable[..., Any], *args, **kwargs) -> AnalysisJob:
+        """
+        在当前事件循环中提交异步分析任务，需在协程中调用
+
+        Args:
+            func: 异步任务函数，第一个参数为AnalysisJob，用于上报进度；返回值作为任务结果
+            *args, **kwargs: 传给任务函数的其余参数
+
+        Returns:
+            新建的任务对象
+
+        Raises:
+            JobQueueFullError: 排队任务数已达上限
+        """
+        job = self._create_job()
+        task = asyncio.ensure_future(self._run_async(job, func, args, kwargs))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> Optional[AnalysisJob]:
+        """按ID查询任务，不存在或已过期时返回None"""
+        with self._lock:
+            self._purge_expired()
+            return self._jobs.get(job_id)
+
+    def stats(self) -> Dict[str, int]:
+        """返回队列统计信息"""
+        with self._lock:
+            running = sum(1 for job in self._jobs.values() if job.status == JOB_RUNNING)
+            return {
+                'max_workers': self.max_workers,
+                'pending': self._pending,
+                'running': running,
+                'tracked': len(self._jobs),
+            }
+
+    def _create_job(self) -> AnalysisJob:
+        with self._lock:
+            self._purge_expired()
+            if self._pending >= self.max_pending:
+                raise JobQueueFullError("分析任务队列已满")
+            job = AnalysisJob(uuid.uuid4().hex)
+            self._jobs[job.job_id] = job
+            self._pending += 1
+        return job
+
+    def _run(self, job: AnalysisJob, func, args, kwargs):
+        job._start()
+        try:
+            result = func(job, *args, **kwargs)
+            job._finish(JOB_SUCCEEDED, result=result)
+        except Exception as e:
+            # 避免将内部异常细节暴露给客户端
+            logger.error(f"分析任务执行失败（{job.job_id}）：{str(e)}")
+            job._finish(JOB_FAILED, error='服务暂时不可用，请稍后重试')
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._mark_finished(job)
+
+    async def _run_async(self, job: AnalysisJob, func, args, kwargs):
+        job._start()
+        try:
+            result = await func(job, *args, **kwargs)
+            job._finish(JOB_SUCCEEDED, result=result)
+        except Exception as e:
+            # 避免将内部异常细节暴露给客户端
+            logger.error(f"分析任务执行失败（{job.job_id}）：{str(e)}")
+            job._finish(JOB_FAILED, error='服务暂时不可用，请稍后重试')
+        finally:
+            with self._lock:
+                self._pending -= 1
+                self._mark_finished(job)
+
+    def _mark_finished(self, job: AnalysisJob):
+        # 调用方需持有 self._lock；结束的任务移到末尾，使已结束任务之间按结束时间有序
+        if job.job_id in self._jobs:
+            self._jobs.move_to_end(job.job_id)
+
+    def _purge_expired(self):
+        # 调用方需持有 self._lock；已结束的任务从结束时间（updated_at）起计算保留时长，
+        # 它们之间按结束时间有序，遇到未过期的已结束任务即可停止；排队与执行中的任务跳过（数量受max_pending限制）
+        deadline = time.time() - self.ttl
+        expired = []
+        for job_id, job in self._jobs.items():
+            if not job.finished:
+                continue
+            if job.updated_at >= deadline:
+                break
+            expired.append(job_id)
+        for job_id in expired:
+            del self._jobs[job_id]
+
+# 创建全局任务管理器
+job_manager = AnalysisJobManager(
+    max_workers=int(os.getenv('ANALYSIS_WORKERS', 4)),
+    max_pending=int(os.getenv('ANALYSIS_QUEUE_LIMIT', 100)),
+    ttl=int(os.getenv('ANALYSIS_JOB_TTL', 3600)),
+)
@@ -0,0 +1,734 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ASGI异步服务模式
+与 elegant_server.py 提供相同的接口契约（/upload、/analyze、/analyze/html、/api/analysis/*），
+大模型调用以协程方式等待，文件解析/OCR等CPU密集型工作交给线程池执行，
+单个进程即可同时承载数百个进行中的分析请求
+
+启动方式：
+    python asgi_server.py
+    或 uvicorn asgi_server:app --host 0.0.0.0 --port 8888
+安装 uvicorn[standard]（uvloop + httptools）可显著降低高并发下事件循环的单请求开销
+"""
+
+import io
+import os
+import math
+import uuid
+import asyncio
+import time
+import functools
+from concurrent.futures import ThreadPoolExecutor
+
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.middleware.gzip import GZipMiddleware
+from starlette.datastructures import Headers
+from starlette.requests import Request
+from starlette.responses import JSONResponse, HTMLResponse, StreamingResponse, Response
+from starlette.routing import Route
+from werkzeug.datastructures import FileStorage
+
+import html_report
+import metrics
+import tracing
+from elegant_server import (
+    OCR_EXTENSIONS, OCR_UPLOAD_COST, BATCH_RATE_COST, parse_analysis_inputs, validate_form_inputs,
+    prepare_batch_inputs, parse_top_k, load_previous_analysis, load_batch_candidate, analyze_batch_candidate, rank_batch_candidates,
+    extract_file_content_cached, sse_event, publish_report
+)
+from llm_proxy import llm_proxy
+from analysis_jobs import job_manager, JobQueueFullError, JOB_FAILED
+from extraction_cache import extraction_cache
+from ocr_engines import ocr_engines, OCR_WARMUP
+from rate_limiter import rate_limiter
+from incremental_analysis import analysis_history
+from report_store import report_store
+from http_delivery import static_assets, COMPRESS_MIN_SIZE
+from batch_screening import batch_manager, BatchLimitError, BatchQueueFullError, CANDIDATE_FAILED, CANDIDATE_SUCCEEDED
+from temp_store import temp_store
+
+# 文件解析/OCR线程池大小
+ASGI_EXTRACT_WORKERS = int(os.getenv('ASGI_EXTRACT_WORKERS', (os.cpu_count() or 1) * 2))
+_extract_executor = ThreadPoolExecutor(max_workers=ASGI_EXTRACT_WORKERS, thread_name_prefix='asgi-extract')
+
+
+async def run_blocking(func, *args):
+    """在解析线程池中执行阻塞函数（沿用当前的追踪上下文）"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_extract_executor, functools.partial(tracing.propagate(func), *args))
+
+
+def error_response(payload, status_code):
+    return JSONResponse(payload, status_code=status_code)
+
+
+async def upload_cost(request: Request):
+    """根据上传文件类型计算请求成本，图片和PDF可能触发OCR"""
+    form = await request.form()
+    file = form.get('file')
+    filename = getattr(file, 'filename', None) or ''
+    if os.path.splitext(filename)[1].lower() in OCR_EXTENSIONS:
+        return OCR_UPLOAD_COST
+    return 1
+
+
+# 频率限流装饰器，与Flask模式共用同一限流器，cost可以是数值或接收请求的异步函数
+def rate_limit(func=None, cost=1):
+    if func is None:
+        return functools.partial(rate_limit, cost=cost)
+
+    @functools.wraps(func)
+    async def wrapper(request: Request):
+        client_ip = request.client.host if request.client else None
+        request_cost = await cost(request) if callable(cost) else cost
+        # SQLite后端的检查需要加写锁，在线程池中执行，避免阻塞事件循环
+        result = await run_blocking(rate_limiter.check, client_ip, request_cost)
+        if not result.allowed:
+            return JSONResponse(
+                {'error': '请求过于频繁，请稍后重试'},
+                status_code=429,
+                headers={'Retry-After': str(max(1, math.ceil(result.retry_after)))}
+            )
+        return await func(request)
+    return wrapper
+
+
+async def to_file_storage(upload):
+    """将Starlette上传文件转换为提取函数使用的werkzeug文件对象，未上传文件时返回None"""
+    if upload is None or not getattr(upload, 'filename', None):
+        return None
+    data = await upload.read()
+    return FileStorage(stream=io.BytesIO(data), filename=upload.filename, content_type=upload.content_type)
+
+
+async def extract_cached(file):
+    """在线程池中提取文件内容，返回 (内容, 缓存条目)"""
+    return await run_blocking(extract_file_content_cached, file)
+
+
+async def analyze_resume_with_AI(resume_text: str, jd_text: str, target_position: str) -> str:
+    """
+    异步调用AI分析简历内容
+    :param resume_text: 简历文本内容
+    :param jd_text: 职位JD文本内容
+    :param target_position: 目标岗位
+    :return: AI分析结果
+    """
+    if not llm_proxy:
+        return "服务暂时不可用，请稍后重试"
+
+    try:
+        return await llm_proxy.aanalyze_resume(resume_text, jd_text, target_position)
+    except Exception as e:
+        # 避免泄露密钥相关错误信息
+        print(f"大模型API调用失败：{str(e)}")
+        return "服务暂时不可用，请稍后重试"
+
+
+async def read_form_inputs(request: Request):
+    """
+    读取表单方式提交的分析请求，并在线程池中提取上传文件的内容
+    :return: ((简历内容, JD内容, 目标岗位), None)，校验失败时返回 (None, 错误提示)
+    """
+    form = await request.form()
+    target_position = form.get('target_position')
+    jd_text = form.get('jd_text', '')
+    resume_text = form.get('resume_text', '')
+    jd_file = await to_file_storage(form.get('jd_file'))
+    resume_file = await to_file_storage(form.get('resume_file'))
+
+    # JD与简历的提取互不依赖，并发执行
+    jd_content, resume_content = jd_text, resume_text
+    if jd_file and resume_file:
+        (jd_content, _), (resume_content, _) = await asyncio.gather(
+            extract_cached(jd_file), extract_cached(resume_file)
+        )
+    elif jd_file:
+        jd_content, _ = await extract_cached(jd_file)
+    elif resume_file:
+        resume_content, _ = await extract_cached(resume_file)
+
+    return validate_form_inputs(target_position, jd_text, jd_file, jd_content,
+                                resume_text, resume_file, resume_content)
+
+
+def asset_response(request: Request, asset):
+    """返回静态资源：按Accept-Encoding直接返回预压缩内容，带强ETag与缓存头"""
+    status, headers, body = asset.response(request.headers)
+    return Response(body, status_code=status, headers=headers)
+
+
+async def index(request: Request):
+    asset = static_assets.get('index.html')
+    if not asset:
+        return error_response({'code': 404, 'msg': '页面不存在'}, 404)
+    return asset_response(request, asset)
+
+
+async def get_asset(request: Request):
+    """
+    静态资源接口
+    返回带内容指纹的共享资源（如报告样式表），可被浏览器长期缓存
+    """
+    asset = static_assets.get(request.path_params['name'])
+    if not asset:
+        return error_response({'code': 404, 'msg': '资源不存在'}, 404)
+    return asset_response(request, asset)
+
+
+@rate_limit
+async def analyze(request: Request):
+    try:
+        inputs, error = await read_form_inputs(request)
+        if error:
+            return error_response({'error': error}, 400)
+
+        analysis_result = await analyze_resume_with_AI(*inputs)
+        return JSONResponse({'analysis': analysis_result})
+    except Exception as e:
+        # 避免泄露详细错误信息
+        print(f"分析请求处理失败：{str(e)}")
+        return error_response({'error': '服务暂时不可用，请稍后重试'}, 500)
+
+
+@rate_limit
+async def analyze_html(request: Request):
+    try:
+        inputs, error = await read_form_inputs(request)
+        if error:
+            return error_response({'error': error}, 400)
+
+        resume_content, jd_content, target_position = inputs
+        analysis_result = await analyze_resume_with_AI(resume_content, jd_content, target_position)
+        html_content = await run_blocking(html_report.markdown_to_html, analysis_result, target_position)
+        return HTMLResponse(html_content)
+    except Exception as e:
+        # 避免泄露详细错误信息
+        print(f"HTML报告生成失败：{str(e)}")
+        return error_response({'error': '服务暂时不可用，请稍后重试'}, 500)
+
+
+@rate_limit(cost=upload_cost)
+@metrics.timed('upload')
+@tracing.traced('handle_file_upload')
+async def handle_file_upload(request: Request):
+    """
+    文件上传接口
+    返回临时文件ID，用于后续分析请求
+    """
+    try:
+        form = await request.form()
+        file = await to_file_storage(form.get('file'))
+        if not file:
+            return error_response({'error': '请选择要上传的文件'}, 400)
+
+        file_content, cache_entry = await extract_cached(file)
+
+        # 相同内容的临时文件仍有效时直接复用其文件ID（同时续期）
+        if cache_entry and cache_entry['file_id'] and await run_blocking(temp_store.touch, cache_entry['file_id']):
+            return JSONResponse({'file_id': cache_entry['file_id']})
+
+        file_id = await run_blocking(temp_store.put, file_content, file.filename)
+        if cache_entry:
+            cache_entry['file_id'] = file_id
+        return JSONResponse({'file_id': file_id})
+    except Exception as e:
+        print(f"文件上传失败：{str(e)}")
+        return error_response({'error': '文件上传失败，请稍后重试'}, 500)
+
+
+async def analyze_and_record(resume_content, jd_content, target_position, previous=None, analysis_id=None):
+    """
+    异步分析简历并保存分析记录；提供上次的分析记录时做增量重新分析
+    :return: (Markdown分析结果, 分析ID)，分析失败时分析ID为None
+    """
+    if not llm_proxy:
+        return "服务暂时不可用，请稍后重试", None
+
+    try:
+        if previous:
+            result = await llm_proxy.areanalyze_resume(previous, resume_content, jd_content, target_position,
+                                                       raise_errors=True)
+        else:
+            result = await llm_proxy.aanalyze_resume(resume_content, jd_content, target_position, raise_errors=True)
+    except ValueError as e:
+        return str(e), None
+    except Exception as e:
+        # 避免泄露密钥相关错误信息
+        print(f"大模型API调用失败：{str(e)}")
+        return "服务暂时不可用，请稍后重试", None
+
+    return result, await run_blocking(
+        analysis_history.save, result, resume_content, jd_content, target_position, analysis_id
+    )
+
+
+@tracing.traced('run_analysis_job')
+async def run_analysis_job(job, resume_content, jd_content, target_position, previous=None):
+    """
+    后台执行的异步分析任务：大模型分析 → 渲染并保存HTML报告
+    :return: 任务结果（分析ID、报告ID与报告查看地址）
+    """
+    job.update(stage='analyzing', progress=10)
+    analysis_result, analysis_id = await analyze_and_record(
+        resume_content, jd_content, target_position, previous, analysis_id=job.job_id
+    )
+
+    job.update(stage='rendering', progress=90)
+    report = await run_blocking(publish_report, job.job_id, analysis_result, target_position)
+    return dict(report, analysis_id=analysis_id)
+
+
+def report_response(request: Request, report, inline: bool = False):
+    """返回已保存的报告：按Accept-Encoding直接返回预压缩内容，支持ETag/Last-Modified条件请求"""
+    status, headers, body = report.response(request.headers, inline)
+    return Response(body, status_code=status, headers=headers)
+
+
+async def read_json(request: Request):
+    try:
+        return await request.json()
+    except ValueError:
+        return None
+
+
+@rate_limit
+async def start_analysis(request: Request):
+    """
+    分析初始化接口
+    接收JD文件ID、简历文件ID和目标岗位，将分析任务入队后立即返回任务ID；
+    提供previous_analysis_id时，只重新生成受简历修改影响的部分
+    """
+    try:
+        data = await read_json(request)
+        inputs, error = await run_blocking(parse_analysis_inputs, data)
+        if error:
+            return error_response({'error': error}, 400)
+        previous = await run_blocking(load_previous_analysis, data)
+
+        # 分析任务以协程形式在事件循环中执行
+        try:
+            job = job_manager.submit_async(run_analysis_job, *inputs, previous=previous)
+        except JobQueueFullError:
+            return error_response({'code': 503, 'msg': '当前分析任务较多，请稍后重试'}, 503)
+
+        return JSONResponse({'code': 200, 'data': {'job_id': job.job_id, 'status': job.status}}, status_code=202)
+    except Exception as e:
+        # 避免泄露详细错误信息
+        print(f"分析初始化失败：{str(e)}")
+        return JSONResponse({'code': 500, 'msg': '服务暂时不可用，请稍后重试'})
+
+
+@rate_limit
+async def stream_analysis(request: Request):
+    """
+    流式分析接口
+    以Server-Sent Events逐段推送大模型生成的内容（delta事件）及已完成部分渲染出的带样式HTML片段（fragment事件），
+    生成结束后推送分析ID与报告查看地址（done事件）；提供previous_analysis_id时做增量重新分析，结果以单个delta事件推送
+    """
+    try:
+        data = await read_json(request)
+        inputs, error = await run_blocking(parse_analysis_inputs, data)
+        if error:
+            return error_response({'error': error}, 400)
+        previous = await run_blocking(load_previous_analysis, data)
+        if not llm_proxy:
+            return error_response({'code': 503, 'msg': '服务暂时不可用，请稍后重试'}, 503)
+    except Exception as e:
+        print(f"流式分析初始化失败：{str(e)}")
+        return error_response({'code': 500, 'msg': '服务暂时不可用，请稍后重试'}, 500)
+
+    resume_content, jd_content, target_position = inputs
+
+    async def generate():
+        chunks = []
+        renderer = html_report.IncrementalHTMLRenderer()
+        try:
+            if previous:
+                analysis_result, analysis_id = await analyze_and_record(
+                    resume_content, jd_content, target_position, previous
+                )
+                yield sse_event('delta', {'text': analysis_result})
+                fragment = renderer.feed(analysis_result)
+                if fragment:
+                    yield sse_event('fragment', {'html': fragment})
+            else:
+                async for delta in llm_proxy.aanalyze_resume_stream(resume_content, jd_content, target_position):
+                    chunks.append(delta)
+                    yield sse_event('delta', {'text': delta})
+                    fragment = renderer.feed(delta)
+                    if fragment:
+                        yield sse_event('fragment', {'html': fragment})
+                analysis_result = ''.join(chunks)
+                analysis_id = await run_blocking(
+                    analysis_history.save, analysis_result, resume_content, jd_content, target_position
+                )
+            yield sse_event('fragment', {'html': renderer.finish()})
+
+            report = await run_blocking(
+                publish_report, analysis_id or uuid.uuid4().hex, analysis_result, target_position
+            )
+            yield sse_event('done', dict(report, analysis_id=analysis_id))
+        except Exception as e:
+            # 避免泄露详细错误信息
+            print(f"流式分析失败：{str(e)}")
+            yield sse_event('error', {'msg': '服务暂时不可用，请稍后重试'})
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # 禁止反向代理缓冲，保证增量内容及时送达
+        'X-Accel-Buffering': 'no',
+    })
+
+
+async def get_analysis(request: Request):
+    """
+    分析任务查询接口
+    返回任务状态、进度，任务完成后一并返回分析结果
+    """
+    job = job_manager.get(request.path_params['job_id'])
+    if not job:
+        return error_response({'code': 404, 'msg': '分析任务不存在或已过期'}, 404)
+    return JSONResponse({'code': 200, 'data': job.to_dict()})
+
+
+async def get_analysis_result(request: Request):
+    """
+    分析结果接口
+    任务完成后直接返回HTML报告
+    """
+    job = job_manager.get(request.path_params['job_id'])
+    if not job:
+        return error_response({'code': 404, 'msg': '分析任务不存在或已过期'}, 404)
+    if job.status == JOB_FAILED:
+        return error_response({'code': 500, 'msg': job.error}, 500)
+    if not job.finished:
+        return error_response({'code': 202, 'data': job.to_dict(include_result=False)}, 202)
+    report = await run_blocking(report_store.get, job.result['report_id'])
+    if not report:
+        return error_response({'code': 404, 'msg': '报告不存在或已过期'}, 404)
+    return report_response(request, report, inline=True)
+
+
+async def view_report(request: Request):
+    """
+    报告查看接口
+    按报告ID返回已保存的HTML报告，可作为分享链接反复打开；?inline=1 时返回内联样式的独立HTML
+    """
+    report = await run_blocking(report_store.get, request.path_params['report_id'])
+    if not report:
+        return error_response({'code': 404, 'msg': '报告不存在或已过期'}, 404)
+    return report_response(request, report, inline=request.query_params.get('inline') == '1')
+
+
+async def read_batch_request(request: Request):
+    """
+    读取批量筛选请求（JSON或表单），JD文件的提取在线程池中执行
+    :return: ((目标岗位, JD内容, 候选人列表), top_k, None)，校验失败时返回 (None, None, 错误提示)
+    """
+    if request.headers.get('content-type', '').startswith('multipart/form-data'):
+        fields = await request.form()
+        jd_file = await to_file_storage(fields.get('jd_file'))
+        candidates = []
+        for upload in fields.getlist('resume_files'):
+            file = await to_file_storage(upload)
+            if file:
+                candidates.append({'file': file})
+        candidates += [{'text': text} for text in fields.getlist('resume_texts') if text.strip()]
+    else:
+        fields, jd_file = await read_json(request) or {}, None
+        # JSON请求只接受文件ID和文本
+        candidates = [
+            {key: c.get(key) for key in ('name', 'file_id', 'text')} if isinstance(c, dict) else c
+            for c in (fields.get('candidates') or [])
+        ]
+    top_k, error = parse_top_k(fields.get('top_k'))
+    if error:
+        return None, None, error
+    inputs, error = await run_blocking(
+        prepare_batch_inputs, fields.get('target_position'), fields.get('jd_text', ''),
+        fields.get('jd_file_id'), jd_file, candidates
+    )
+    return inputs, top_k, error
+
+
+@rate_limit(cost=BATCH_RATE_COST)
+async def start_batch(request: Request):
+    """
+    批量筛选接口
+    接收一个JD和多份简历（JSON：candidates为文件ID/文本列表；表单：resume_files为多个文件），
+    入队后立即返回批次ID，结果通过批次查询接口或事件流获取；指定top_k时只分析词法预排序的前K名
+    """
+    try:
+        inputs, top_k, error = await read_batch_request(request)
+        if error:
+            return error_response({'error': error}, 400)
+
+        try:
+            batch = batch_manager.submit(*inputs, load_batch_candidate, analyze_batch_candidate, top_k=top_k)
+        except BatchLimitError as e:
+            return error_response({'error': str(e)}, 400)
+        except BatchQueueFullError:
+            return error_response({'code': 503, 'msg': '当前批量筛选任务较多，请稍后重试'}, 503)
+
+        return JSONResponse({'code': 200, 'data': {
+            'batch_id': batch.batch_id, 'status': batch.status, 'total': len(batch.candidates)
+        }}, status_code=202)
+    except Exception as e:
+        # 避免泄露详细错误信息
+        print(f"批量筛选初始化失败：{str(e)}")
+        return JSONResponse({'code': 500, 'msg': '服务暂时不可用，请稍后重试'})
+
+
+@rate_limit
+async def rank_batch(request: Request):
+    """
+    批量预排序接口
+    参数与批量筛选接口相同，仅用本地BM25打分同步返回排名（可用top_k截取前K名），不调用大模型
+    """
+    try:
+        inputs, top_k, error = await read_batch_request(request)
+        if error:
+            return error_response({'error': error}, 400)
+        data = await run_blocking(functools.partial(rank_batch_candidates, *inputs, top_k=top_k))
+        return JSONResponse({'code': 200, 'data': data})
+    except Exception as e:
+        # 避免泄露详细错误信息
+        print(f"批量预排序失败：{str(e)}")
+        return JSONResponse({'code': 500, 'msg': '服务暂时不可用，请稍后重试'})
+
+
+async def get_batch(request: Request):
+    """
+    批量筛选查询接口
+    返回批次进度、各候选人状态与评分，以及按整体评分排序的排名
+    """
+    batch = batch_manager.get(request.path_params['batch_id'])
+    if not batch:
+        return error_response({'code': 404, 'msg': '批量筛选任务不存在或已过期'}, 404)
+    return JSONResponse({'code': 200, 'data': batch.to_dict()})
+
+
+async def stream_batch(request: Request):
+    """
+    批量筛选事件流
+    每完成一位候选人推送一条candidate事件，全部完成后推送summary事件（包含排名）；支持断线续传
+    """
+    batch = batch_manager.get(request.path_params['batch_id'])
+    if not batch:
+        return error_response({'code': 404, 'msg': '批量筛选任务不存在或已过期'}, 404)
+    try:
+        after = int(request.headers.get('last-event-id') or request.query_params.get('after', -1))
+    except ValueError:
+        after = -1
+
+    async def generate():
+        last, idle = after, 0.0
+        while True:
+            # 非阻塞读取，避免每个订阅者占用一个线程
+            events = batch.wait_events(last, timeout=0)
+            if not events:
+                if batch.finished:
+                    return
+                await asyncio.sleep(0.5)
+                idle += 0.5
+                if idle >= 15:
+                    # 保持连接，避免代理因空闲断开
+                    idle = 0.0
+                    yield ": keep-alive\n\n"
+                continue
+            idle = 0.0
+            for event_id, event, data in events:
+                last = event_id
+                yield sse_event(event, data, event_id)
+                if event == 'summary':
+                    return
+
+    return StreamingResponse(generate(), media_type='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        # 禁止反向代理缓冲，保证增量内容及时送达
+        'X-Accel-Buffering': 'no',
+    })
+
+
+async def get_batch_candidate(request: Request):
+    """
+    批量筛选单个候选人报告接口
+    返回该候选人的HTML分析报告，首次查看时渲染并保存，之后直接返回已保存的报告
+    """
+    batch = batch_manager.get(request.path_params['batch_id'])
+    candidate = batch.candidate(request.path_params['index']) if batch else None
+    if not candidate:
+        return error_response({'code': 404, 'msg': '候选人不存在或批量筛选任务已过期'}, 404)
+    if candidate['status'] == CANDIDATE_FAILED:
+        return error_response({'code': 500, 'msg': candidate['error']}, 500)
+    if candidate['status'] != CANDIDATE_SUCCEEDED:
+        candidate.pop('report', None)
+        return error_response({'code': 202, 'data': candidate}, 202)
+    report_id = f"{request.path_params['batch_id']}-{request.path_params['index']}"
+    report = await run_blocking(report_store.get, report_id)
+    if not report:
+        report = await run_blocking(report_store.save, report_id, candidate['report'], batch.target_position)
+    return report_response(request, report, inline=True)
+
+
+async def cache_stats(request: Request):
+    """
+    缓存统计接口
+    返回分析结果缓存、文件提取缓存的命中/未命中与容量信息
+    """
+    def collect():
+        # 各缓存的磁盘层统计需要查询SQLite或遍历报告目录，整体在线程池中执行
+        stats = {}
+        if llm_proxy and llm_proxy.cache is not None:
+            stats['llm_results'] = llm_proxy.cache.stats()
+        stats['extraction'] = extraction_cache.stats()
+        stats['temp_files'] = temp_store.stats()
+        stats['analysis_history'] = analysis_history.stats()
+        stats['reports'] = report_store.stats()
+        return stats
+
+    return JSONResponse({'code': 200, 'data': await run_blocking(collect)})
+
+
+async def ocr_stats(request: Request):
+    return JSONResponse({'code': 200, 'data': ocr_engines.stats()})
+
+
+async def llm_stats(request: Request):
+    if not llm_proxy:
+        return error_response({'code': 503, 'msg': '服务暂时不可用，请稍后重试'}, 503)
+    return JSONResponse({'code': 200, 'data': llm_proxy.llm.stats()})
+
+
+async def rate_limit_stats(request: Request):
+    return JSONResponse({'code': 200, 'data': await run_blocking(rate_limiter.stats)})
+
+
+async def metrics_endpoint(request: Request):
+    """
+    指标接口
+    以Prometheus文本格式返回各阶段耗时直方图、大模型token用量与SLO超限计数
+    """
+    body, content_type = metrics.render()
+    return Response(body, headers={'Content-Type': content_type})
+
+
+class RequestMetricsMiddleware:
+    """记录HTTP请求耗时（流式响应只统计到响应头发出），端点名取路由匹配到的视图函数名"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                endpoint = scope.get('endpoint')
+                metrics.observe_request(getattr(endpoint, '__name__', None), scope['method'], message['status'],
+                                        time.perf_counter() - start)
+            await send(message)
+
+        await self.app(scope, receive, send_wrapper)
+
+
+class RequestTracingMiddleware:
+    """
+    沿用客户端传入的追踪ID（traceparent或X-Trace-Id）开始请求span，在响应头中返回追踪ID；
+    请求span覆盖整个响应（含流式响应体），请求内的各环节记录为其子span
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+        client = scope.get('client')
+        span = tracing.start_request(scope['method'], scope['path'], Headers(scope=scope),
+                                     client[0] if client else None)
+        if span is None:
+            await self.app(scope, receive, send)
+            return
+
+        async def send_wrapper(message):
+            if message['type'] == 'http.response.start':
+                route = scope.get('route')
+                tracing.finish_request(span, message['status'], getattr(route, 'path', None))
+                headers = list(message.get('headers', []))
+                headers.append((tracing.TRACE_HEADER.lower().encode('latin-1'), span.trace_id.encode('latin-1')))
+                message = dict(message, headers=headers)
+            await send(message)
+
+        token = tracing.activate(span)
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except BaseException as e:
+            span.record_exception(e)
+            raise
+        finally:
+            tracing.deactivate(token)
+            span.end()
+
+
+routes = [
+    Route('/', index),
+    Route('/analyze', analyze, methods=['POST']),
+    Route('/analyze/html', analyze_html, methods=['POST']),
+    Route('/upload', handle_file_upload, methods=['POST']),
+    Route('/api/analysis/start', start_analysis, methods=['POST']),
+    Route('/api/analysis/stream', stream_analysis, methods=['POST']),
+    Route('/api/analysis/{job_id}', get_analysis, methods=['GET']),
+    Route('/api/analysis/{job_id}/result', get_analysis_result, methods=['GET']),
+    Route('/reports/{report_id}', view_report, methods=['GET']),
+    Route('/assets/{name}', get_asset, methods=['GET']),
+    Route('/api/batch/start', start_batch, methods=['POST']),
+    Route('/api/batch/rank', rank_batch, methods=['POST']),
+    Route('/api/batch/{batch_id}', get_batch, methods=['GET']),
+    Route('/api/batch/{batch_id}/stream', stream_batch, methods=['GET']),
+    Route('/api/batch/{batch_id}/candidates/{index:int}', get_batch_candidate, methods=['GET']),
+    Route('/api/cache/stats', cache_stats, methods=['GET']),
+    Route('/api/ocr/stats', ocr_stats, methods=['GET']),
+    Route('/api/llm/stats', llm_stats, methods=['GET']),
+    Route('/api/ratelimit/stats', rate_limit_stats, methods=['GET']),
+    Route('/metrics', metrics_endpoint, methods=['GET']),
+]
+
+app = Starlette(
+    routes=routes,
+    middleware=[
+        Middleware(RequestTracingMiddleware),
+        Middleware(RequestMetricsMiddleware),
+        Middleware(CORSMiddleware, allow_origins=['*'], allow_methods=['*'], allow_headers=['*']),
+        # 动态响应压缩；已带Content-Encoding的预压缩内容与SSE流不会被再次压缩
+        Middleware(GZipMiddleware, minimum_size=COMPRESS_MIN_SIZE),
+    ]
+)
+
+
+if __name__ == '__main__':
+    import uvicorn
+
+    port = int(os.environ.get('PORT', 8888))
+    print(f"\n=== AIPM 简历分析智能助手（ASGI模式） ===")
+    print(f"服务器正在运行...")
+    print(f"\n请在浏览器中访问: http://localhost:{port}")
+    print(f"\n按 Ctrl+C 停止服务器")
+    print(f"================================\n")
+
+    # 后台预热OCR模型，避免首个请求承担模型加载耗时
+    if OCR_WARMUP:
+        ocr_engines.warmup_in_background(OCR_WARMUP)
+
+    # 多进程模式下分析任务保存在各自进程中，轮询任务状态需要会话保持；限流与临时文件可通过SQLite后端共享
+    workers = int(os.environ.get('ASGI_WORKERS', 1))
+    uvicorn.run('asgi_server:app' if workers > 1 else app, host='0.0.0.0', port=port, workers=workers,
+                log_level=os.environ.get('ASGI_LOG_LEVEL', 'warning'))
@@ -0,0 +1,376 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+批量筛选
+一个JD对多份简历的批量分析：JD只预处理一次，各候选人的提取与大模型分析在有界并发下执行，
+每完成一位候选人即产生一条事件供客户端流式读取，全部结束后按整体评分生成排名汇总
+"""
+
+import os
+import re
+import time
+import uuid
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Callable
+
+from lexical_ranker import LexicalIndex
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# 批次状态
+BATCH_QUEUED = 'queued'
+BATCH_RUNNING = 'running'
+BATCH_DONE = 'done'
+
+# 候选人状态
+CANDIDATE_PENDING = 'pending'
+CANDIDATE_SUCCEEDED = 'succeeded'
+CANDIDATE_FAILED = 'failed'
+# 词法预排序未进入前K名，未调用大模型
+CANDIDATE_SKIPPED = 'skipped'
+
+# 报告中「整体评分：8.5分」「**整体评分**：8/10」等写法
+_SCORE_PATTERN = re.compile(r'整体评分[^0-9\n]{0,20}?(\d+(?:\.\d+)?)')
+
+
+class BatchLimitError(Exception):
+    """批次数或候选人数超过上限"""
+
+
+class BatchQueueFullError(Exception):
+    """排队与执行中的批次数已达上限"""
+
+
+def parse_overall_score(report: str) -> Optional[float]:
+    """
+    从分析报告中解析整体评分
+
+    Args:
+        report: Markdown格式的分析报告
+
+    Returns:
+        0-10之间的评分，未找到时返回None
+    """
+    if not report:
+        return None
+    match = _SCORE_PATTERN.search(report)
+    if not match:
+        return None
+    score = float(match.group(1))
+    return score if 0 <= score <= 10 else None
+
+
+def normalize_material(text: str) -> str:
+    """规整材料文本：统一换行、去除行尾空白并合并连续空行"""
+    text = (text or '').replace('\r\n', '\n').replace('\r', '\n')
+    text = re.sub(r'[ \t　]+\n', '\n', text)
+    return re.sub(r'\n{3,}', '\n\n', text).strip()
+
+
+class ScreeningBatch:
+    """单个批量筛选任务"""
+
+    def __init__(self, batch_id: str, target_position: str, jd_content: str, candidates: List[Dict[str, Any]],
+                 top_k: Optional[int] = None):
+        self.batch_id = batch_id
+        self.target_position = target_position
+        self.jd_content = jd_content
+        self.top_k = top_k
+        # 词法预排序的索引统计（规模与建索引/查询耗时）
+        self.lexical = None
+        self.status = BATCH_QUEUED
+        self.created_at = time.time()
+        self.updated_at = self.created_at
+        self.candidates = []
+        for index, candidate in enumerate(candidates):
+            self.candidates.append({
+                'index': index,
+                'name': candidate.get('name') or f"候选人{index + 1}",
+                'status': CANDIDATE_PENDING,
+                'score': None,
+                'lexical_score': None,
+                'report': None,
+                'error': None,
+                'elapsed': None,
+            })
+        # 按顺序追加的事件，元素为 (事件ID, 事件类型, 事件数据)
+        self.events = []
+        self._condition = threading.Condition()
+
+    @property
+    def finished(self) -> bool:
+        return self.status == BATCH_DONE
+
+    def _emit(self, event: str, data: Dict[str, Any]):
+        # 调用方需持有 self._condition
+        self.events.append((len(self.events), event, data))
+        self.updated_at = time.time()
+        self._condition.notify_all()
+
+    def _start(self):
+        with self._condition:
+            self.status = BATCH_RUNNING
+            self.updated_at = time.time()
+
+    def _complete(self, index: int, report: Optional[str], error: Optional[str], elapsed: float):
+        with self._condition:
+            candidate = self.candidates[index]
+            candidate['elapsed'] = round(elapsed, 3)
+            if error:
+                candidate['status'] = CANDIDATE_FAILED
+                candidate['error'] = error
+            else:
+                candidate['status'] = CANDIDATE_SUCCEEDED
+                candidate['report'] = report
+                candidate['score'] = parse_overall_score(report)
+            self._emit('candidate', self._public(candidate))
+
+    def _shortlist(self, lexical_scores: Dict[int, float], selected: List[int], lexical: Dict[str, Any]):
+        with self._condition:
+            self.lexical = lexical
+            for index, score in lexical_scores.items():
+                self.candidates[index]['lexical_score'] = round(score, 4)
+            # 未进入前K名的候选人直接结束
+            chosen = set(selected)
+            for index in lexical_scores:
+                if index not in chosen:
+                    candidate = self.candidates[index]
+                    candidate['status'] = CANDIDATE_SKIPPED
+                    self._emit('candidate', self._public(candidate))
+
+    def _abort(self, error: str):
+        with self._condition:
+            # 批次执行异常中断时，尚未完成的候选人统一记为失败
+            for candidate in self.candidates:
+                if candidate['status'] == CANDIDATE_PENDING:
+                    candidate['status'] = CANDIDATE_FAILED
+                    candidate['error'] = error
+                    self._emit('candidate', self._public(candidate))
+
+    def _finish(self):
+        with self._condition:
+            self.status = BATCH_DONE
+            self._emit('summary', self._summary())
+
+    def wait_events(self, after: int = -1, timeout: Optional[float] = None) -> List[tuple]:
+        """
+        读取事件ID大于after的事件，暂无新事件时最多等待timeout秒
+
+        Args:
+            after: 已读取的最后一个事件ID
+            timeout: 等待时长（秒）
+
+        Returns:
+            新事件列表
+        """
+        with self._condition:
+            if len(self.events) <= after + 1 and not self.finished:
+                self._condition.wait(timeout)
+            return self.events[after + 1:]
+
+    def candidate(self, index: int) -> Optional[Dict[str, Any]]:
+        """按序号读取候选人（包含完整报告），序号无效时返回None"""
+        with self._condition:
+            if 0 <= index < len(self.candidates):
+                return dict(self.candidates[index])
+            return None
+
+    def ranking(self) -> List[Dict[str, Any]]:
+        """按整体评分从高到低排列已完成的候选人，无评分的排在最后"""
+        with self._condition:
+            return self._ranking()
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._condition:
+            data = self._summary()
+            data['candidates'] = [self._public(candidate) for candidate in self.candidates]
+            return data
+
+    def _ranking(self) -> List[Dict[str, Any]]:
+        done = [c for c in self.candidates if c['status'] == CANDIDATE_SUCCEEDED]
+        # 整体评分相同时按词法得分排序
+        done.sort(key=lambda c: (c['score'] is None, -(c['score'] or 0), -(c['lexical_score'] or 0), c['index']))
+        return [
+            {'rank': rank, 'index': c['index'], 'name': c['name'], 'score': c['score'],
+             'lexical_score': c['lexical_score']}
+            for rank, c in enumerate(done, start=1)
+        ]
+
+    def _summary(self) -> Dict[str, Any]:
+        counts = {CANDIDATE_PENDING: 0, CANDIDATE_SUCCEEDED: 0, CANDIDATE_FAILED: 0, CANDIDATE_SKIPPED: 0}
+        for candidate in self.candidates:
+            counts[candidate['status']] += 1
+        return {
+            'batch_id': self.batch_id,
+            'status': self.status,
+            'target_position': self.target_position,
+            'total': len(self.candidates),
+            'completed': counts[CANDIDATE_SUCCEEDED],
+            'failed': counts[CANDIDATE_FAILED],
+            'pending': counts[CANDIDATE_PENDING],
+            'skipped': counts[CANDIDATE_SKIPPED],
+            'top_k': self.top_k,
+            'lexical': self.lexical,
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
+            'ranking': self._ranking(),
+        }
+
+    @staticmethod
+    def _public(candidate: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: value for key, value in candidate.items() if key != 'report'}
+
+
+class BatchScreeningManager:
+    """批量筛选任务管理器"""
+
+    def __init__(self, max_active: int = 4, concurrency: int = 8, max_candidates: int = 500, ttl: int = 6 * 3600,
+                 max_pending: int = 16):
+        """
+        初始化管理器
+
+        Args:
+            max_active: 同时执行的批次数上限，超过的批次排队
+            concurrency: 单个批次内同时分析的候选人数
+            max_candidates: 单个批次的候选人数上限
+            ttl: 已结束批次的保留时长（秒）
+            max_pending: 排队+执行中的批次数上限，超过后拒绝提交
+        """
+        self.max_active = max_active
+        self.concurrency = concurrency
+        self.max_candidates = max_candidates
+        self.ttl = ttl
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_active, thread_name_prefix='batch-screening')
+        self._batches = OrderedDict()
+        self._lock = threading.Lock()
+        self._pending = 0
+
+    def submit(self, target_position: str, jd_content: str, candidates: List[Dict[str, Any]],
+               load: Callable[[Dict[str, Any]], str], analyze: Callable[[str, str, str], str],
+               top_k: Optional[int] = None) -> ScreeningBatch:
+        """
+        提交批量筛选任务
+
+        Args:
+            target_position: 目标岗位
+            jd_content: 已预处理的JD文本（整批共用）
+            candidates: 候选人列表，每项至少包含name，其余字段原样传给load
+            load: 读取简历文本的函数 load(candidate)
+            analyze: 分析函数 analyze(resume_content, jd_content, target_position)，返回Markdown报告
+            top_k: 只将词法预排序的前K名交给大模型分析，None或不小于候选人数时全部分析
+
+            load与analyze抛出ValueError表示候选人输入有误，其提示会展示给客户端
+
+        Returns:
+            新建的批次
+
+        Raises:
+            BatchLimitError: 候选人数超过上限
+            BatchQueueFullError: 排队与执行中的批次数已达上限
+        """
+        if not candidates:
+            raise BatchLimitError("候选人列表不能为空")
+        if len(candidates) > self.max_candidates:
+            raise BatchLimitError(f"单个批次最多{self.max_candidates}份简历")
+
+        if top_k is not None and top_k < 1:
+            raise BatchLimitError("top_k必须为正整数")
+
+        batch = ScreeningBatch(uuid.uuid4().hex, target_position, jd_content, candidates, top_k)
+        with self._lock:
+            self._purge_expired()
+            if self._pending >= self.max_pending:
+                raise BatchQueueFullError("批量筛选任务队列已满")
+            self._batches[batch.batch_id] = batch
+            self._pending += 1
+        self._executor.submit(tracing.propagate(self._run), batch, candidates, load, analyze)
+        return batch
+
+    def get(self, batch_id: str) -> Optional[ScreeningBatch]:
+        """按ID查询批次，不存在或已过期时返回None"""
+        with self._lock:
+            self._purge_expired()
+            return self._batches.get(batch_id)
+
+    def _run(self, batch: ScreeningBatch, candidates: List[Dict[str, Any]], load: Callable, analyze: Callable):
+        batch._start()
+        logger.info(f"开始批量筛选（{batch.batch_id}），共{len(candidates)}份简历")
+        try:
+            self._screen(batch, candidates, load, analyze)
+            logger.info(f"批量筛选完成（{batch.batch_id}）")
+        except Exception as e:
+            # 预排序或线程池异常时批次也必须结束，否则会一直处于执行中且不会被清理
+            logger.error(f"批量筛选执行失败（{batch.batch_id}）：{str(e)}")
+            batch._abort('分析失败，请稍后重试')
+        finally:
+            batch._finish()
+            with self._lock:
+                self._pending -= 1
+
+    def _screen(self, batch: ScreeningBatch, candidates: List[Dict[str, Any]], load: Callable, analyze: Callable):
+        texts = [None] * len(candidates)
+
+        def fail(index: int, e: Exception, start: float):
+            logger.error(f"批量筛选候选人分析失败（{batch.batch_id}#{index}）：{str(e)}")
+            # ValueError为输入问题（如简历内容为空），提示可直接展示；其余异常避免暴露内部细节
+            error = str(e) if isinstance(e, ValueError) else '分析失败，请稍后重试'
+            batch._complete(index, None, error, time.monotonic() - start)
+
+        def extract(index: int):
+            start = time.monotonic()
+            try:
+                texts[index] = load(candidates[index])
+            except Exception as e:
+                fail(index, e, start)
+
+        def work(index: int):
+            start = time.monotonic()
+            try:
+                text = texts[index] if texts[index] is not None else load(candidates[index])
+                report = analyze(text, batch.jd_content, batch.target_position)
+                batch._complete(index, report, None, time.monotonic() - start)
+            except Exception as e:
+                fail(index, e, start)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix='batch-candidate') as pool:
+            selected = list(range(len(candidates)))
+            if batch.top_k is not None and batch.top_k < len(candidates):
+                # 先提取全部简历并做词法预排序，只有前K名进入大模型分析
+                list(pool.map(tracing.propagate(extract), selected))
+                selected = self._shortlist(batch, texts)
+            # 未预排序时提取与分析在同一任务中流水线执行
+            list(pool.map(tracing.propagate(work), selected))
+
+    def _shortlist(self, batch: ScreeningBatch, texts: List[Optional[str]]) -> List[int]:
+        """对成功提取的简历做BM25预排序，返回进入大模型分析的候选人序号"""
+        index = LexicalIndex()
+        index.add_many((i, text) for i, text in enumerate(texts) if text is not None)
+        ranked = index.search(batch.jd_content)
+        selected = [i for i, _ in ranked[:batch.top_k]]
+        batch._shortlist(dict(ranked), selected, index.stats())
+        logger.info(f"批量筛选词法预排序完成（{batch.batch_id}），{len(ranked)}份简历中选取{len(selected)}份")
+        return selected
+
+    def _purge_expired(self):
+        # 调用方需持有 self._lock；批次按创建时间有序
+        deadline = time.time() - self.ttl
+        while self._batches:
+            batch_id, batch = next(iter(self._batches.items()))
+            if batch.created_at >= deadline or not batch.finished:
+                break
+            self._batches.popitem(last=False)
+
+
+# 创建全局批量筛选管理器
+batch_manager = BatchScreeningManager(
+    max_active=int(os.getenv('BATCH_MAX_ACTIVE', 4)),
+    concurrency=int(os.getenv('BATCH_CONCURRENCY', 8)),
+    max_candidates=int(os.getenv('BATCH_MAX_CANDIDATES', 500)),
+    ttl=int(os.getenv('BATCH_TTL', 6 * 3600)),
+    max_pending=int(os.getenv('BATCH_QUEUE_LIMIT', 16)),
+)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR图像预处理基准测试
+生成模拟手机拍摄的大尺寸简历照片（高分辨率、轻微倾斜、光照不均、噪点），
+分别对原图与预处理后的图像进行OCR，对比耗时与字符准确率
+
+用法：
+    python benchmarks/bench_preprocess.py [--size 4000x3000] [--angle 2.5] [--repeat 3]
+"""
+
+import os
+import sys
+import time
+import difflib
+import argparse
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from image_preprocess import preprocess_for_ocr  # noqa: E402
+from ocr_engines import ocr_engines  # noqa: E402
+
+SAMPLE_LINES = [
+    "Work Experience",
+    "2021-2024 Product Manager, Example Technology Co., Ltd.",
+    "Led the launch of an AI resume screening product used by 300 recruiters.",
+    "Defined evaluation metrics for accuracy and latency of LLM outputs.",
+    "Improved candidate matching precision from 72% to 89% in six months.",
+    "Education",
+    "2017-2021 B.S. Computer Science, Example University",
+    "Skills: Python, SQL, A/B testing, prompt engineering, data analysis",
+]
+
+
+def make_photo(width: int, height: int, angle: float, seed: int = 0) -> Image.Image:
+    """生成模拟手机拍摄的简历照片"""
+    rng = np.random.default_rng(seed)
+    page = Image.new('L', (width, height), 255)
+    draw = ImageDraw.Draw(page)
+    font_size = max(12, height // 45)
+    try:
+        font = ImageFont.load_default(size=font_size)
+    except TypeError:
+        font = ImageFont.load_default()
+    y = height // 10
+    for line in SAMPLE_LINES:
+        draw.text((width // 12, y), line, fill=20, font=font)
+        y += int(font_size * 1.8)
+    page = page.rotate(angle, resample=Image.BILINEAR, expand=False, fillcolor=255)
+
+    # 叠加左右方向的光照渐变与高斯噪声
+    pixels = np.asarray(page, dtype=np.float32)
+    gradient = np.linspace(0.65, 1.0, width, dtype=np.float32)[None, :]
+    pixels = pixels * gradient + rng.normal(0, 8, pixels.shape)
+    pixels = np.clip(pixels, 0, 255).astype(np.uint8)
+    return Image.fromarray(pixels).convert('RGB')
+
+
+def accuracy(text: str) -> float:
+    """按字符序列相似度计算识别准确率"""
+    expected = "\n".join(SAMPLE_LINES)
+    normalize = lambda value: " ".join(value.split())
+    return difflib.SequenceMatcher(None, normalize(expected), normalize(text)).ratio()
+
+
+def measure(label: str, image: Image.Image, repeat: int, preprocess: bool):
+    timings = {'preprocess': [], 'ocr': []}
+    text = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        prepared = preprocess_for_ocr(image) if preprocess else image
+        timings['preprocess'].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        try:
+            text = ocr_engines.tesseract(prepared, lang='eng')
+        except Exception as e:
+            text = None
+            print(f"  tesseract不可用，仅统计预处理耗时：{e}")
+            break
+        timings['ocr'].append(time.perf_counter() - start)
+
+    pre_ms = np.median(timings['preprocess']) * 1000
+    print(f"{label}")
+    print(f"  输入尺寸:     {image.width}x{image.height} -> {prepared.width}x{prepared.height}")
+    print(f"  预处理耗时:   {pre_ms:.1f} ms（中位数）")
+    if timings['ocr']:
+        ocr_ms = np.median(timings['ocr']) * 1000
+        print(f"  OCR耗时:      {ocr_ms:.1f} ms（中位数）")
+        print(f"  总耗时:       {pre_ms + ocr_ms:.1f} ms")
+        print(f"  字符准确率:   {accuracy(text) * 100:.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='OCR图像预处理基准测试')
+    parser.add_argument('--size', default='4000x3000', help='模拟照片尺寸，默认12MP')
+    parser.add_argument('--angle', type=float, default=2.5, help='模拟倾斜角度（度）')
+    parser.add_argument('--repeat', type=int, default=3, help='每组重复次数')
+    args = parser.parse_args()
+
+    width, height = (int(value) for value in args.size.lower().split('x'))
+    image = make_photo(width, height, args.angle)
+
+    measure('原图直接OCR', image, args.repeat, preprocess=False)
+    measure('预处理后OCR', image, args.repeat, preprocess=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+报告渲染性能测试
+生成包含大量表格行的模拟分析报告，对比优化前后 markdown_to_html 的渲染耗时分位数，并校验两者输出一致；
+再按模拟token逐段喂给流式渲染器，测量每段的处理耗时，并校验拼接后的片段与完整渲染一致
+
+用法：
+    python benchmarks/bench_render.py [--rows 300] [--questions 50] [--iterations 200] [--token-size 4]
+"""
+
+import os
+import re
+import sys
+import time
+import argparse
+from datetime import datetime
+from unittest import mock
+
+import markdown
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import html_report
+
+
+def legacy_markdown_to_html(markdown_content, target_position):
+    """优化前的实现（每次新建Markdown实例、多次全文替换），作为性能基线与输出一致性的参照"""
+    # 配置Markdown扩展，使用更全面的扩展集
+    extensions = [
+        'tables',
+        'fenced_code',
+        'nl2br',
+        'attr_list',
+        'codehilite',
+        'sane_lists',
+        'md_in_html'
+    ]
+
+    # 转换Markdown到HTML
+    html_content = markdown.markdown(markdown_content, extensions=extensions)
+
+    # 自定义处理特定的格式标记
+    html_content = html_content.replace('⚠️', '<span class="warning">⚠️</span>')
+    html_content = html_content.replace('✅', '<span class="checkmark">✅</span>')
+
+    # 为主要板块添加语义化section标签
+    sections = [
+        "一、评分与分析理由板块",
+        "二、对照岗位 JD 逐条修改简历板块",
+        "三、面试可能问的问题板块",
+        "四、职业发展路径板块",
+        "五、结语建议板块"
+    ]
+
+    for section in sections:
+        html_content = html_content.replace(
+            f'<h2>{section}</h2>',
+            f'<section><h2>{section}</h2>'
+        )
+
+    # 关闭所有section标签
+    html_content = html_content + '</section>' * len(sections)
+
+    # 为评分部分添加特殊样式
+    html_content = html_content.replace(
+        '<h3>1. 整体评分</h3>',
+        '<div class="score-section"><h3 class="score-label">1. 整体评分</h3>'
+    )
+    html_content = html_content.replace(
+        '</div>',
+        '</div>',
+        1  # 只替换第一个匹配项
+    )
+
+    # 为综合评价添加高亮样式
+    if '<h3>2. 综合评价</h3>' in html_content:
+        # 找到综合评价的起始和结束位置
+        start_idx = html_content.find('<h3>2. 综合评价</h3>') + len('<h3>2. 综合评价</h3>')
+        next_h3_idx = html_content.find('<h3>', start_idx)
+        if next_h3_idx != -1:
+            # 提取综合评价内容
+            eval_content = html_content[start_idx:next_h3_idx]
+            # 包裹高亮样式
+            highlighted_eval = f'<div class="highlight">{eval_content}</div>'
+            # 替换原内容
+            html_content = html_content[:start_idx] + highlighted_eval + html_content[next_h3_idx:]
+
+    # 处理差距总结部分，添加警告样式
+    html_content = html_content.replace(
+        '<h3>4. 主要差距总结</h3>',
+        '<div class="alert-warning"><h3 style="margin-top: 0;">4. 主要差距总结</h3>'
+    )
+    html_content = html_content.replace(
+        '</div>',
+        '</div>',
+        1  # 只替换第一个匹配项
+    )
+
+    # 为职业发展路径的时间阶段添加特殊样式
+    career_phases = [
+        '短期 (1-3年)',
+        '中期 (3-5年)',
+        '长期 (5年以上)'
+    ]
+
+    for phase in career_phases:
+        html_content = html_content.replace(
+            f'<h3>{phase}</h3>',
+            f'<h3 style="color: #667eea; border-left: 4px solid #667eea; padding-left: 16px;">{phase}</h3>'
+        )
+
+    # 填充HTML模板
+    today = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    final_html = html_report.HTML_TEMPLATE.replace('{target_position}', target_position)
+    final_html = final_html.replace('{{ content }}', html_content)
+    final_html = final_html.replace('{{ date }}', today)
+
+    return final_html
+
+
+def make_report(rows: int, questions: int) -> str:
+    """生成与大模型输出结构相同的模拟报告"""
+    lines = [
+        "---", "## 一、评分与分析理由板块", "### 1. 整体评分", "**7.5分**", "",
+        "### 2. 综合评价", "候选人具备扎实的产品基础，✅ 有AI项目经验，⚠️ 缺少商业化经历。", "",
+        "### 3. 维度拆解分析", "| 维度 | 评分 (/10) | 分析理由 |", "|---|---|---|",
+    ]
+    lines += [f"| 维度{i} | {i % 10} | 分析理由{i}，**重点**说明 |" for i in range(5)]
+    lines += ["", "### 4. 主要差距总结", "- 差距一", "- 差距二", "", "---",
+              "## 二、对照岗位 JD 逐条修改简历板块",
+              "| 简历现有内容 | 岗位 JD 要求 | 差异分析 | 修改建议 |", "|---|---|---|---|"]
+    lines += [f"| 负责项目{i}的需求分析 | 要求{i} | 差异{i} ⚠️ | 改写为「主导项目{i}，提升指标{i}%」 |"
+              for i in range(rows)]
+    lines += ["", "---", "## 三、面试可能问的问题板块"]
+    lines += [f"{i + 1}. 关于项目{i}，你是如何衡量效果的？⚠️ 考察数据思维" for i in range(questions)]
+    lines += ["", "---", "## 四、职业发展路径板块"]
+    for phase in html_report.CAREER_PHASES:
+        lines += [f"### {phase}", "- 目标职位：AI产品经理", "- 行动建议：✅ 完成一个端到端项目", ""]
+    lines += ["---", "## 五、结语建议板块", "1. 建议一", "2. 建议二", "", "```python", "print('code')", "```"]
+    return "\n".join(lines)
+
+
+def measure(func, report: str, iterations: int) -> np.ndarray:
+    timings = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func(report, 'AI产品经理')
+        timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1000
+
+
+def measure_stream(report: str, token_size: int):
+    """按固定长度切分报告模拟token流，返回 (每段耗时数组, 拼接后的HTML)"""
+    renderer = html_report.IncrementalHTMLRenderer()
+    timings = []
+    for i in range(0, len(report), token_size):
+        start = time.perf_counter()
+        renderer.feed(report[i:i + token_size])
+        timings.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    renderer.finish()
+    timings.append(time.perf_counter() - start)
+    return np.array(timings) * 1000, renderer.html
+
+
+def main():
+    parser = argparse.ArgumentParser(description='markdown_to_html 渲染性能测试')
+    parser.add_argument('--rows', type=int, default=300, help='逐条修改表格的行数')
+    parser.add_argument('--questions', type=int, default=50, help='面试问题数量')
+    parser.add_argument('--iterations', type=int, default=200, help='每种实现的渲染次数')
+    parser.add_argument('--token-size', type=int, default=4, help='流式渲染时每段的字符数')
+    args = parser.parse_args()
+
+    report = make_report(args.rows, args.questions)
+    # 固定生成时间后比较输出
+    fixed = datetime(2024, 1, 1)
+    with mock.patch.object(html_report, 'datetime', mock.Mock(now=lambda: fixed)):
+        new_html = html_report.markdown_to_html(report, 'AI产品经理')
+        with mock.patch(__name__ + '.datetime', mock.Mock(now=lambda: fixed)):
+            old_html = legacy_markdown_to_html(report, 'AI产品经理')
+    print(f"报告 {len(report)} 字符，表格 {args.rows} 行，渲染 {args.iterations} 次")
+    print(f"输出一致: {'是' if new_html == old_html else '否'}\n")
+
+    for name, func in (('优化前', legacy_markdown_to_html), ('优化后', html_report.markdown_to_html)):
+        # 预热
+        func(report, 'AI产品经理')
+        timings = measure(func, report, args.iterations)
+        p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+        print(f"{name}: p50 {p50:.2f}ms  p95 {p95:.2f}ms  p99 {p99:.2f}ms")
+
+    timings, streamed = measure_stream(report, args.token_size)
+    # 片段之间以换行拼接，比较时忽略标签间的空白
+    full = html_report._postprocess(html_report._markdown_converter().reset().convert(report))
+    same = re.sub(r'>\s+<', '><', streamed) == re.sub(r'>\s+<', '><', full)
+    p50, p99 = np.percentile(timings, [50, 99])
+    print(f"\n流式渲染: {len(timings)}段，合计 {timings.sum():.2f}ms，每段 p50 {p50:.3f}ms  p99 {p99:.3f}ms  "
+          f"max {timings.max():.2f}ms，与完整渲染一致: {'是' if same else '否'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+服务模式负载测试
+启动一个模拟大模型接口（固定延迟返回分析结果），分别以Flask模式（elegant_server.py）
+和ASGI模式（asgi_server.py）启动服务，对 /analyze 发起并发请求，对比吞吐量、延迟分位数以及服务进程的峰值内存与线程数
+
+用法：
+    python benchmarks/bench_serving.py [--concurrency 200] [--requests 600] [--llm-latency 2.0] [--modes flask,asgi]
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import socket
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MOCK_REPORT = "## 一、评分与分析理由板块\n1. **整体评分**：8分\n\n---\n## 五、结语建议板块\n- 模拟结果"
+
+SERVER_COMMANDS = {
+    'flask': [sys.executable, os.path.join(ROOT, 'elegant_server.py')],
+    'asgi': [sys.executable, os.path.join(ROOT, 'asgi_server.py')],
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_mock_llm(latency: float) -> int:
+    """
+    在后台线程中启动模拟的OpenAI兼容 chat.completions 接口（asyncio实现，
+    避免模拟服务本身的线程创建开销影响对比结果）
+
+    Returns:
+        监听端口
+    """
+    port = free_port()
+    body = json.dumps({
+        'id': 'mock', 'object': 'chat.completion', 'created': int(time.time()), 'model': 'mock',
+        'choices': [{'index': 0, 'finish_reason': 'stop',
+                     'message': {'role': 'assistant', 'content': MOCK_REPORT}}],
+    }).encode('utf-8')
+    response = (b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                b"Content-Length: " + str(len(body)).encode('ascii') + b"\r\n\r\n" + body)
+
+    async def handle(reader, writer):
+        try:
+            while True:
+                header = await reader.readuntil(b"\r\n\r\n")
+                length = 0
+                for line in header.split(b"\r\n"):
+                    if line.lower().startswith(b"content-length:"):
+                        length = int(line.split(b":", 1)[1])
+                await reader.readexactly(length)
+                await asyncio.sleep(latency)
+                writer.write(response)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    ready = threading.Event()
+
+    def serve():
+        async def main():
+            await asyncio.start_server(handle, '127.0.0.1', port, backlog=2048)
+            ready.set()
+            await asyncio.Event().wait()
+        asyncio.run(main())
+
+    threading.Thread(target=serve, daemon=True).start()
+    ready.wait()
+    return port
+
+
+def sample_process(pid: int, stop: threading.Event, peak: dict):
+    """采样服务进程的内存占用与线程数峰值"""
+    while not stop.wait(0.2):
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    key, _, value = line.partition(':')
+                    if key in ('VmRSS', 'Threads'):
+                        peak[key] = max(peak.get(key, 0), int(value.split()[0]))
+        except OSError:
+            return
+
+
+def start_server(mode: str, port: int, llm_url: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.update({
+        'PORT': str(port),
+        'LLM_API_KEY': 'bench',
+        'LLM_API_BASE_URL': llm_url,
+        'LLM_CACHE_ENABLED': '0',
+        'RATE_LIMIT_PER_MINUTE': '1000000',
+        'OCR_WARMUP': '',
+    })
+    process = subprocess.Popen(SERVER_COMMANDS[mode], cwd=ROOT, env=env,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 60
+    while time.time() < deadline:
+        try:
+            requests.get(f'http://127.0.0.1:{port}/api/cache/stats', timeout=1)
+            return process
+        except requests.RequestException:
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError(f"{mode}模式服务启动超时")
+
+
+def run_load(port: int, concurrency: int, total: int):
+    url = f'http://127.0.0.1:{port}/analyze'
+    form = {'target_position': 'AI产品经理', 'jd_text': '负责AI产品规划', 'resume_text': '三年产品经理经验'}
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(index):
+        nonlocal errors
+        # 每个请求使用不同的简历文本，避免命中任何缓存
+        data = dict(form, resume_text=f"{form['resume_text']} #{index}")
+        start = time.perf_counter()
+        try:
+            ok = requests.post(url, data=data, timeout=300).status_code == 200
+        except requests.RequestException:
+            ok = False
+        elapsed = time.perf_counter() - start
+        with lock:
+            if ok:
+                latencies.append(elapsed)
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(total)))
+    return time.perf_counter() - start, latencies, errors
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Flask / ASGI 服务模式负载测试')
+    parser.add_argument('--concurrency', type=int, default=200, help='并发客户端数')
+    parser.add_argument('--requests', type=int, default=600, help='请求总数')
+    parser.add_argument('--llm-latency', type=float, default=2.0, help='模拟大模型响应延迟（秒）')
+    parser.add_argument('--modes', default='flask,asgi', help='参与对比的服务模式')
+    args = parser.parse_args()
+
+    llm_url = f'http://127.0.0.1:{start_mock_llm(args.llm_latency)}/v1'
+    print(f"并发数 {args.concurrency}，请求总数 {args.requests}，模拟大模型延迟 {args.llm_latency}s\n")
+
+    for mode in [m.strip() for m in args.modes.split(',') if m.strip()]:
+        port = free_port()
+        process = start_server(mode, port, llm_url)
+        peak, stop = {}, threading.Event()
+        sampler = threading.Thread(target=sample_process, args=(process.pid, stop, peak), daemon=True)
+        sampler.start()
+        try:
+            wall, latencies, errors = run_load(port, args.concurrency, args.requests)
+        finally:
+            stop.set()
+            process.terminate()
+            process.wait(timeout=10)
+
+        print(f"{mode}")
+        print(f"  吞吐量:   {len(latencies) / wall:.1f} req/s（总耗时 {wall:.1f}s）")
+        if latencies:
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            print(f"  延迟:     p50 {p50:.2f}s  p95 {p95:.2f}s  p99 {p99:.2f}s")
+        print(f"  失败数:   {errors}")
+        if peak:
+            print(f"  峰值内存: {peak.get('VmRSS', 0) / 1024:.0f} MB，峰值线程数: {peak.get('Threads', 0)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+热点路径微基准测试套件
+离线生成固定的测试文件（文本PDF、扫描PDF、DOCX、PNG/JPEG简历照片、大型模拟分析报告），
+逐项测量文件提取（extract_file_content）、OCR（ocr_olmocr）、报告渲染（markdown_to_html、流式渲染）
+与限流（rate_limit）的耗时分位数、吞吐量与Python堆内存峰值；结果可保存为基线，
+之后在同一台机器上与基线对比，超过阈值的退化以非零退出码报告，可直接用于CI
+
+用法：
+    python benchmarks/bench_suite.py run [--only render,rate_limit] [--quick] [--output results.json]
+    python benchmarks/bench_suite.py run --save-baseline
+    python benchmarks/bench_suite.py compare [--baseline benchmarks/baseline.json] [--current results.json]
+                                             [--threshold 0.15] [--memory-threshold 0.25]
+
+说明：
+    - 基线与机器、Python及依赖版本相关，只应与同一环境下的结果对比（基线中记录了环境信息）
+    - 内存峰值由tracemalloc统计，只包含Python分配的内存，不含tesseract子进程与OCR进程池
+    - 未安装tesseract时OCR相关用例标记为跳过，不参与对比
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tracemalloc
+import subprocess
+from datetime import datetime
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_preprocess import make_photo, SAMPLE_LINES  # noqa: E402
+from bench_render import make_report  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# 用例分组，--only 按分组筛选
+GROUPS = ('extract', 'ocr', 'render', 'rate_limit')
+
+
+class BenchCase:
+    """一个基准测试用例"""
+
+    def __init__(self, name: str, group: str, func, iterations: int, batch: int = 1,
+                 input_bytes: int = 0, skip: str = None):
+        """
+        Args:
+            name: 用例名（基线对比时的键）
+            group: 所属分组
+            func: 无参数的被测函数
+            iterations: 计时采样次数
+            batch: 每次采样连续调用的次数，耗时按单次调用折算（用于微秒级的函数）
+            input_bytes: 单次调用处理的输入字节数，用于计算MB/s
+            skip: 跳过原因，None表示执行
+        """
+        self.name = name
+        self.group = group
+        self.func = func
+        self.iterations = iterations
+        self.batch = batch
+        self.input_bytes = input_bytes
+        self.skip = skip
+
+
+def make_text_pdf(pages: int, lines_per_page: int = 40, title: str = '') -> bytes:
+    """生成带文本层的多页PDF（Helvetica字体，仅用ASCII文本，无需额外依赖），title写在首页第一行"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", None,
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for page in range(pages):
+        rows = ["BT /F1 10 Tf 50 800 Td 14 TL"]
+        lines = [f"{SAMPLE_LINES[i % len(SAMPLE_LINES)]} (page {page + 1}, line {i + 1})" for i in range(lines_per_page)]
+        for line in ([title] if title and page == 0 else []) + lines:
+            line = line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+            rows.append(f"({line}) Tj T*")
+        rows.append("ET")
+        stream = "\n".join(rows).encode('latin-1')
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        kids.append(b"%d 0 R" % len(objects))
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), pages)
+
+    out = io.BytesIO()
+    out.write(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(out.tell())
+        out.write(b"%d 0 obj\n%s\nendobj\n" % (number, body))
+    xref = out.tell()
+    out.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+    for offset in offsets:
+        out.write(b"%010d 00000 n \n" % offset)
+    out.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+    return out.getvalue()
+
+
+def make_scanned_pdf(pages: int) -> bytes:
+    """生成只有图像、没有文本层的扫描版PDF"""
+    images = [make_photo(1240, 1754, angle=1.0, seed=page) for page in range(pages)]
+    out = io.BytesIO()
+    images[0].save(out, 'PDF', save_all=True, append_images=images[1:], resolution=150)
+    return out.getvalue()
+
+
+def make_docx(paragraphs: int) -> bytes:
+    import docx
+    document = docx.Document()
+    for i in range(paragraphs):
+        document.add_paragraph(f"{SAMPLE_LINES[i % len(SAMPLE_LINES)]} 负责需求分析与数据驱动的迭代（第{i + 1}条）")
+    out = io.BytesIO()
+    document.save(out)
+    return out.getvalue()
+
+
+def make_image(fmt: str) -> bytes:
+    out = io.BytesIO()
+    make_photo(1600, 1200, angle=2.0).save(out, fmt, **({'quality': 90} if fmt == 'JPEG' else {}))
+    return out.getvalue()
+
+
+def tesseract_missing():
+    """未安装tesseract时返回跳过原因"""
+    try:
+        import pytesseract
+        pytesseract.get_tesseract_version()
+    except Exception:
+        return '未安装tesseract'
+    return None
+
+
+def build_cases(quick: bool = False):
+    """构建全部用例，quick时减少采样次数"""
+    os.environ.setdefault('LLM_API_KEY', 'benchmark')
+    # 微基准不导出追踪数据，后台写文件会干扰计时
+    os.environ.setdefault('TRACE_EXPORT_PATH', '')
+    import html_report
+    import elegant_server
+    from rate_limiter import RateLimiter
+    from werkzeug.datastructures import FileStorage
+
+    scale = 0.2 if quick else 1.0
+    count = lambda n: max(3, int(n * scale))
+    ocr_skip = tesseract_missing()
+
+    def extract(data: bytes, filename: str):
+        return lambda: elegant_server.extract_file_content(FileStorage(io.BytesIO(data), filename=filename))
+
+    text_pdf = make_text_pdf(10)
+    docx_data = make_docx(400)
+    png = make_image('PNG')
+    jpeg = make_image('JPEG')
+    scanned_pdf = make_scanned_pdf(2)
+    photo = make_photo(1600, 1200, angle=2.0)
+    report = make_report(300, 50)
+    report_bytes = len(report.encode('utf-8'))
+
+    def stream_render():
+        renderer = html_report.IncrementalHTMLRenderer()
+        for i in range(0, len(report), 4):
+            renderer.feed(report[i:i + 4])
+        return renderer.finish()
+
+    def rate_limited(limiter):
+        # 在请求上下文中调用被 @rate_limit 包装的空视图，测量装饰器本身的开销
+        view = elegant_server.rate_limit(lambda: 'ok')
+        context = elegant_server.app.test_request_context('/analyze', method='POST')
+
+        def call():
+            original, elegant_server.rate_limiter = elegant_server.rate_limiter, limiter
+            try:
+                with context:
+                    for _ in range(100):
+                        view()
+            finally:
+                elegant_server.rate_limiter = original
+        return call
+
+    sqlite_path = os.path.join(ROOT, '.cache', 'bench_rate_limit.sqlite3')
+    return [
+        BenchCase('extract_text_pdf', 'extract', extract(text_pdf, 'resume.pdf'), count(30), input_bytes=len(text_pdf)),
+        BenchCase('extract_docx', 'extract', extract(docx_data, 'resume.docx'), count(50), input_bytes=len(docx_data)),
+        BenchCase('extract_scanned_pdf', 'ocr', extract(scanned_pdf, 'scan.pdf'), count(5),
+                  input_bytes=len(scanned_pdf), skip=ocr_skip),
+        BenchCase('extract_png', 'ocr', extract(png, 'photo.png'), count(5), input_bytes=len(png), skip=ocr_skip),
+        BenchCase('extract_jpeg', 'ocr', extract(jpeg, 'photo.jpg'), count(5), input_bytes=len(jpeg), skip=ocr_skip),
+        BenchCase('ocr_olmocr', 'ocr', lambda: elegant_server.ocr_olmocr(photo), count(5), skip=ocr_skip),
+        BenchCase('markdown_to_html', 'render', lambda: html_report.markdown_to_html(report, 'AI产品经理'),
+                  count(100), input_bytes=report_bytes),
+        BenchCase('markdown_to_html_linked_css', 'render',
+                  lambda: html_report.markdown_to_html(report, 'AI产品经理', '/assets/report.css'),
+                  count(100), input_bytes=report_bytes),
+        BenchCase('stream_render', 'render', stream_render, count(30), input_bytes=report_bytes),
+        # 每次采样调用100次视图，耗时按单次调用折算
+        BenchCase('rate_limit_allowed', 'rate_limit', rate_limited(RateLimiter(limit=1e12)), count(200), batch=100),
+        BenchCase('rate_limit_rejected', 'rate_limit', rate_limited(RateLimiter(limit=1)), count(200), batch=100),
+        BenchCase('rate_limit_sqlite', 'rate_limit',
+                  rate_limited(RateLimiter(limit=1e12, backend='sqlite', path=sqlite_path)), count(20), batch=100),
+    ]
+
+
+def run_case(case: BenchCase, warmup: int = 1) -> dict:
+    """执行用例：预热后计时采样，再单独执行一次统计内存峰值（tracemalloc会拖慢执行，不与计时混用）"""
+    for _ in range(warmup):
+        case.func()
+    timings = []
+    for _ in range(case.iterations):
+        start = time.perf_counter()
+        case.func()
+        timings.append((time.perf_counter() - start) / case.batch)
+    timings = np.array(timings) * 1000
+
+    tracemalloc.start()
+    case.func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    p50, p95, p99 = np.percentile(timings, [50, 95, 99])
+    result = {
+        'group': case.group,
+        'samples': len(timings),
+        'calls_per_sample': case.batch,
+        'mean_ms': round(float(timings.mean()), 4),
+        'p50_ms': round(float(p50), 4),
+        'p95_ms': round(float(p95), 4),
+        'p99_ms': round(float(p99), 4),
+        'min_ms': round(float(timings.min()), 4),
+        'ops_per_s': round(1000 / float(p50), 2) if p50 > 0 else None,
+        # 单次执行（batch次调用）的Python堆内存峰值
+        'peak_kb': round(peak / 1024, 1),
+    }
+    if case.input_bytes:
+        result['mb_per_s'] = round(case.input_bytes / 1024 / 1024 / (float(p50) / 1000), 2) if p50 > 0 else None
+    return result
+
+
+def environment() -> dict:
+    """记录结果对应的运行环境，对比时环境不同会给出提示"""
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True, timeout=10).stdout.strip() or None
+    except Exception:
+        commit = None
+    return {
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'machine': platform.machine(),
+        'cpu_count': os.cpu_count(),
+        'commit': commit,
+        'created_at': datetime.now().isoformat(timespec='seconds'),
+    }
+
+
+def run_suite(only=None, quick: bool = False) -> dict:
+    """执行套件并逐项打印结果"""
+    results = {}
+    print(f"{'用例':<30}{'p50':>10}{'p95':>10}{'吞吐':>14}{'内存峰值':>12}")
+    for case in build_cases(quick):
+        if only and case.group not in only:
+            continue
+        if case.skip:
+            results[case.name] = {'group': case.group, 'skipped': case.skip}
+            print(f"{case.name:<30}跳过（{case.skip}）")
+            continue
+        result = run_case(case)
+        results[case.name] = result
+        throughput = f"{result['mb_per_s']}MB/s" if result.get('mb_per_s') else f"{result['ops_per_s']}/s"
+        print(f"{case.name:<30}{result['p50_ms']:>8.3f}ms{result['p95_ms']:>8.3f}ms{throughput:>14}"
+              f"{result['peak_kb']:>10.1f}KB")
+    return {'environment': environment(), 'quick': quick, 'results': results}
+
+
+def compare(baseline: dict, current: dict, threshold: float, memory_threshold: float) -> list:
+    """
+    对比两次结果，打印逐项变化
+
+    Args:
+        baseline: 基线结果
+        current: 当前结果
+        threshold: p50耗时允许的最大增幅（0.15表示15%）
+        memory_threshold: 内存峰值允许的最大增幅
+
+    Returns:
+        退化项列表 [(用例名, 指标, 基线值, 当前值)]
+    """
+    base_env, current_env = baseline.get('environment', {}), current.get('environment', {})
+    for key in ('python', 'machine', 'cpu_count'):
+        if base_env.get(key) != current_env.get(key):
+            print(f"注意：运行环境不同（{key}: {base_env.get(key)} -> {current_env.get(key)}），对比结果仅供参考")
+    if baseline.get('quick') != current.get('quick'):
+        print("注意：基线与当前结果的 --quick 设置不同，测试数据规模不一致")
+
+    regressions = []
+    print(f"\n{'用例':<30}{'基线p50':>12}{'当前p50':>12}{'变化':>10}{'内存变化':>10}")
+    for name, base in baseline.get('results', {}).items():
+        now = current.get('results', {}).get(name)
+        if now is None or 'skipped' in base or 'skipped' in now:
+            print(f"{name:<30}（跳过或当前结果中没有该用例）")
+            continue
+        change = now['p50_ms'] / base['p50_ms'] - 1 if base['p50_ms'] else 0
+        memory_change = now['peak_kb'] / base['peak_kb'] - 1 if base['peak_kb'] else 0
+        flags = []
+        if change > threshold:
+            regressions.append((name, 'p50_ms', base['p50_ms'], now['p50_ms']))
+            flags.append('耗时退化')
+        if memory_change > memory_threshold:
+            regressions.append((name, 'peak_kb', base['peak_kb'], now['peak_kb']))
+            flags.append('内存退化')
+        print(f"{name:<30}{base['p50_ms']:>10.3f}ms{now['p50_ms']:>10.3f}ms{change:>+10.1%}{memory_change:>+10.1%}"
+              f"  {' '.join(flags)}")
+    return regressions
+
+
+def load(path: str) -> dict:
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+def dump(data: dict, path: str):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    print(f"\n结果已保存到 {path}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='提取、OCR、渲染与限流热点路径的微基准测试')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run = sub.add_parser('run', help='执行基准测试')
+    run.add_argument('--only', default='', help=f"只执行指定分组（逗号分隔）：{','.join(GROUPS)}")
+    run.add_argument('--quick', action='store_true', help='减少采样次数（冒烟测试用，结果不宜作为基线）')
+    run.add_argument('--output', help='结果保存路径')
+    run.add_argument('--save-baseline', action='store_true', help='将结果保存为基线')
+    run.add_argument('--baseline', default=DEFAULT_BASELINE, help='基线文件路径')
+
+    cmp = sub.add_parser('compare', help='与基线对比，存在退化时以退出码1结束')
+    cmp.add_argument('--baseline', default=DEFAULT_BASELINE, help='基线文件路径')
+    cmp.add_argument('--current', help='当前结果文件，不指定时立即执行一次（分组与规模同基线）')
+    cmp.add_argument('--threshold', type=float, default=0.15, help='p50耗时允许的最大增幅')
+    cmp.add_argument('--memory-threshold', type=float, default=0.25, help='内存峰值允许的最大增幅')
+    args = parser.parse_args()
+
+    if args.command == 'run':
+        only = {group.strip() for group in args.only.split(',') if group.strip()}
+        unknown = only - set(GROUPS)
+        if unknown:
+            parser.error(f"未知的分组：{','.join(sorted(unknown))}")
+        data = run_suite(only, args.quick)
+        if args.output:
+            dump(data, args.output)
+        if args.save_baseline:
+            dump(data, args.baseline)
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"基线文件不存在：{args.baseline}，请先执行 run --save-baseline")
+        return 2
+    baseline = load(args.baseline)
+    if args.current:
+        current = load(args.current)
+    else:
+        groups = {result['group'] for result in baseline.get('results', {}).values()}
+        current = run_suite(groups, baseline.get('quick', False))
+    regressions = compare(baseline, current, args.threshold, args.memory_threshold)
+    if regressions:
+        print(f"\n发现{len(regressions)}项退化（耗时阈值 {args.threshold:.0%}，内存阈值 {args.memory_threshold:.0%}）：")
+        for name, metric, before, after in regressions:
+            print(f"  {name} {metric}: {before} -> {after}")
+        return 1
+    print("\n未发现超过阈值的退化")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+熔断器回归检查
+在本地启动总是返回500的模拟大模型服务（benchmarks/mock_llm.py），依次用 create、stream、acreate、astream
+调用 ResilientLLMClient，检查：连续失败后熔断打开；恢复窗口后放行的试探请求遇到可重试的5xx时，
+熔断器重新打开（而不是停留在半开状态），且试探请求本身不计入拒绝数
+
+用法：
+    python benchmarks/check_breaker.py
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, 'benchmarks'))
+
+from load_test import start_mock_llm
+from llm_resilience import (
+    ResilientLLMClient, CircuitBreaker, RetryPolicy, CircuitOpenError, BREAKER_OPEN
+)
+
+RECOVERY = 0.5
+MESSAGES = [{'role': 'user', 'content': 'ping'}]
+
+
+def call(client: ResilientLLMClient, method: str, loop: asyncio.AbstractEventLoop):
+    """以指定方式发起一次调用，返回异常类型名；异步调用在同一个事件循环中执行（异步连接池绑定事件循环）"""
+    try:
+        if method == 'create':
+            client.create(model='mock', messages=MESSAGES)
+        elif method == 'stream':
+            list(client.stream(model='mock', messages=MESSAGES))
+        elif method == 'acreate':
+            loop.run_until_complete(client.acreate(model='mock', messages=MESSAGES))
+        else:
+            async def consume():
+                async for _ in client.astream(model='mock', messages=MESSAGES):
+                    pass
+            loop.run_until_complete(consume())
+    except Exception as e:
+        return type(e).__name__
+    return None
+
+
+def check(base_url: str, method: str) -> list:
+    """检查一种调用方式，返回不满足预期的描述"""
+    breaker = CircuitBreaker(failure_threshold=2, recovery_timeout=RECOVERY)
+    client = ResilientLLMClient('mock-key', base_url + '/v1', deadline=10,
+                                retry_policy=RetryPolicy(max_retries=2, base_delay=0.01, max_delay=0.02),
+                                breaker=breaker)
+    loop = asyncio.new_event_loop()
+    problems = []
+    for _ in range(2):
+        call(client, method, loop)
+    if breaker.state != BREAKER_OPEN:
+        problems.append(f"连续失败后熔断器应打开，实际为{breaker.state}")
+    if call(client, method, loop) != CircuitOpenError.__name__:
+        problems.append("熔断打开时调用应快速失败")
+
+    rejected = breaker.rejected
+    for probe in range(3):
+        time.sleep(RECOVERY + 0.1)
+        call(client, method, loop)
+        if breaker.state != BREAKER_OPEN:
+            problems.append(f"第{probe + 1}个试探请求遇到5xx后熔断器应重新打开，实际为{breaker.state}")
+    if breaker.rejected != rejected:
+        problems.append(f"试探请求不应计入拒绝数（{rejected} -> {breaker.rejected}）")
+    loop.close()
+    return problems
+
+
+def main():
+    process, base_url = start_mock_llm('--latency fixed:0.01 --tokens-per-second 0 --error-500 1.0')
+    try:
+        failed = False
+        for method in ('create', 'stream', 'acreate', 'astream'):
+            problems = check(base_url, method)
+            print(f"{method:<8}{'通过' if not problems else '失败'}")
+            for problem in problems:
+                print(f"    {problem}")
+            failed = failed or bool(problems)
+    finally:
+        process.kill()
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,396 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+端到端负载测试
+以目标RPS（开环：按计划时刻发起请求，不因服务变慢而降低发送速率）驱动 /upload 与 /api/analysis/start，
+跟踪分析任务直至完成，按接口报告吞吐量、延迟分位数（p50/p95/p99）与错误率（按429、4xx、5xx、超时、连接错误分类），
+用于上线前的容量评估
+
+默认在本地启动模拟大模型服务（benchmarks/mock_llm.py）与指定模式的服务端，完全离线运行；
+指定 --url 时压测已运行的服务（其大模型接口由该服务自身的配置决定）
+
+用法：
+    python benchmarks/load_test.py [--rps 10] [--duration 60] [--mix pipeline:1] [--mode flask|asgi]
+                                   [--mock-llm-args "--latency lognormal:2,0.4 --tokens-per-second 60 --error-429 0.02"]
+    python benchmarks/load_test.py --url http://127.0.0.1:8888 --rps 5 --mix upload:1,analysis:3 --output result.json
+
+场景（--mix 按权重混合）：
+    upload:   上传一份简历文件（每次内容不同，不命中提取缓存）
+    analysis: 以文本发起分析任务并轮询至完成
+    pipeline: 上传简历文件后以文件ID发起分析任务并轮询至完成（与前端流程一致）
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import random
+import shlex
+import argparse
+import threading
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bench_serving import free_port, start_server, sample_process  # noqa: E402
+from bench_suite import make_text_pdf  # noqa: E402
+
+SCENARIOS = ('upload', 'analysis', 'pipeline')
+
+JD_TEXT = ("负责AI产品的规划与落地，定义大模型应用的评估指标；具备数据分析能力，熟悉SQL与A/B测试；"
+           "有招聘、HR SaaS或内容平台经验者优先。")
+RESUME_TEXT = ("三年产品经理经验，主导AI简历筛选产品从0到1上线，服务300名招聘顾问；"
+               "建立大模型输出准确率与延迟的评估体系，候选人匹配准确率从72%提升到89%。")
+
+# 结果中的接口名
+UPLOAD = 'POST /upload'
+START = 'POST /api/analysis/start'
+JOB = 'analysis job (submit -> finished)'
+
+
+class EndpointStats:
+    """单个接口的延迟与错误统计，线程安全"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = []
+        self.errors = {}
+
+    def record(self, latency: float, error: str = None):
+        with self._lock:
+            if error is None:
+                self.latencies.append(latency)
+            else:
+                self.errors[error] = self.errors.get(error, 0) + 1
+
+    def summary(self, duration: float) -> dict:
+        with self._lock:
+            latencies = np.array(self.latencies)
+            errors = dict(self.errors)
+        total = len(latencies) + sum(errors.values())
+        data = {
+            'requests': total,
+            'ok': len(latencies),
+            'throughput': round(len(latencies) / duration, 2) if duration else None,
+            'error_rate': round(sum(errors.values()) / total, 4) if total else 0.0,
+            'errors': errors,
+        }
+        if len(latencies):
+            p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+            data.update({'p50_s': round(float(p50), 4), 'p95_s': round(float(p95), 4),
+                         'p99_s': round(float(p99), 4), 'max_s': round(float(latencies.max()), 4)})
+        return data
+
+
+def classify(response: requests.Response = None, error: Exception = None) -> str:
+    """将失败的请求归类"""
+    if error is not None:
+        return 'timeout' if isinstance(error, requests.Timeout) else 'connection'
+    if response.status_code == 429:
+        return '429'
+    return f"{response.status_code // 100}xx"
+
+
+class LoadTest:
+    """开环负载生成：调度线程按计划时刻把请求交给线程池，分析任务由轮询线程统一跟踪"""
+
+    def __init__(self, base_url: str, mix: dict, upload_format: str, timeout: float, job_timeout: float,
+                 poll_interval: float, max_inflight: int, seed: int = 0):
+        self.base_url = base_url.rstrip('/')
+        self.mix = mix
+        self.upload_format = upload_format
+        self.timeout = timeout
+        self.job_timeout = job_timeout
+        self.poll_interval = poll_interval
+        self.rng = random.Random(seed)
+        self.pool = ThreadPoolExecutor(max_workers=max_inflight)
+        self.poll_pool = ThreadPoolExecutor(max_workers=16)
+        self.stats = {name: EndpointStats() for name in (UPLOAD, START, JOB)}
+        # 计划发起时刻与实际发起时刻之差：持续增大说明压测客户端自身已饱和
+        self.lag = EndpointStats()
+        self._local = threading.local()
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._sequence = 0
+        self._sequence_lock = threading.Lock()
+
+    def session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+        return session
+
+    def unique_id(self) -> int:
+        with self._sequence_lock:
+            self._sequence += 1
+            return self._sequence
+
+    def make_upload(self, index: int):
+        """生成每次内容都不同的简历文件，避免命中提取缓存与临时文件复用"""
+        text = f"{RESUME_TEXT}\n编号 {index} {time.time_ns()}"
+        if self.upload_format == 'pdf':
+            # PDF字体只支持ASCII文本
+            return 'resume.pdf', make_text_pdf(1, 20, title=f"Resume #{index} {time.time_ns()}")
+        if self.upload_format == 'docx':
+            return 'resume.docx', self._docx(text)
+        return 'resume.txt', text.encode('utf-8')
+
+    @staticmethod
+    def _docx(text: str) -> bytes:
+        import docx
+        document = docx.Document()
+        for line in text.split('\n'):
+            document.add_paragraph(line)
+        out = io.BytesIO()
+        document.save(out)
+        return out.getvalue()
+
+    def post(self, name: str, path: str, **kwargs):
+        """发起请求并记录延迟，返回成功响应的JSON，失败时返回None"""
+        start = time.perf_counter()
+        try:
+            response = self.session().post(self.base_url + path, timeout=self.timeout, **kwargs)
+        except requests.RequestException as e:
+            self.stats[name].record(0, classify(error=e))
+            return None
+        elapsed = time.perf_counter() - start
+        if response.status_code >= 400:
+            self.stats[name].record(elapsed, classify(response))
+            return None
+        self.stats[name].record(elapsed)
+        try:
+            return response.json()
+        except ValueError:
+            return {}
+
+    def upload(self) -> str:
+        filename, data = self.make_upload(self.unique_id())
+        result = self.post(UPLOAD, '/upload', files={'file': (filename, data)})
+        return result.get('file_id') if result else None
+
+    def start_analysis(self, **inputs):
+        payload = dict({'target_position': 'AI产品经理', 'jd_text': JD_TEXT}, **inputs)
+        submitted = time.perf_counter()
+        result = self.post(START, '/api/analysis/start', json=payload)
+        job_id = ((result or {}).get('data') or {}).get('job_id')
+        if job_id:
+            with self._pending_lock:
+                self._pending[job_id] = submitted
+        elif result is not None:
+            self.stats[JOB].record(0, 'no_job_id')
+        else:
+            self.stats[JOB].record(0, 'submit_failed')
+
+    def run_operation(self, operation: str, scheduled: float):
+        self.lag.record(time.perf_counter() - scheduled)
+        if operation == 'upload':
+            self.upload()
+        elif operation == 'analysis':
+            # 每次简历文本不同，不命中分析结果缓存
+            self.start_analysis(resume_text=f"{RESUME_TEXT}（编号 {self.unique_id()}）")
+        else:
+            file_id = self.upload()
+            if file_id:
+                self.start_analysis(resume_file_id=file_id)
+            else:
+                self.stats[JOB].record(0, 'upload_failed')
+
+    def poll_once(self, job_id: str, submitted: float):
+        try:
+            response = self.session().get(f"{self.base_url}/api/analysis/{job_id}", timeout=self.timeout)
+            data = response.json().get('data') or {}
+        except (requests.RequestException, ValueError):
+            return
+        now = time.perf_counter()
+        status = data.get('status')
+        if response.status_code == 404:
+            self.finish_job(job_id, now - submitted, 'job_expired')
+        elif status == 'succeeded':
+            self.finish_job(job_id, now - submitted)
+        elif status == 'failed':
+            self.finish_job(job_id, now - submitted, 'job_failed')
+        elif now - submitted > self.job_timeout:
+            self.finish_job(job_id, now - submitted, 'job_timeout')
+
+    def finish_job(self, job_id: str, elapsed: float, error: str = None):
+        with self._pending_lock:
+            if self._pending.pop(job_id, None) is None:
+                return
+        self.stats[JOB].record(elapsed, error)
+
+    def poll_loop(self, stop: threading.Event):
+        """按轮询间隔检查所有未完成的任务（任务完成时间的精度为一个轮询间隔）"""
+        while not stop.wait(self.poll_interval):
+            with self._pending_lock:
+                pending = list(self._pending.items())
+            list(self.poll_pool.map(lambda item: self.poll_once(*item), pending))
+
+    def run(self, rps: float, duration: float, arrival: str):
+        """
+        执行压测
+
+        Args:
+            rps: 目标每秒发起的操作数
+            duration: 发送阶段时长（秒），之后等待进行中的请求与任务完成
+            arrival: constant（等间隔）或 poisson（指数分布间隔，更接近真实流量）
+
+        Returns:
+            发送阶段的实际时长
+        """
+        stop = threading.Event()
+        poller = threading.Thread(target=self.poll_loop, args=(stop,), daemon=True)
+        poller.start()
+        operations, weights = zip(*self.mix.items())
+
+        start = time.perf_counter()
+        next_at = start
+        futures = []
+        while next_at < start + duration:
+            delay = next_at - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            operation = self.rng.choices(operations, weights)[0]
+            futures.append(self.pool.submit(self.run_operation, operation, next_at))
+            next_at += self.rng.expovariate(rps) if arrival == 'poisson' else 1 / rps
+        sending = time.perf_counter() - start
+
+        for future in futures:
+            future.result()
+        deadline = time.perf_counter() + self.job_timeout
+        while time.perf_counter() < deadline:
+            with self._pending_lock:
+                if not self._pending:
+                    break
+            time.sleep(self.poll_interval)
+        stop.set()
+        poller.join()
+        with self._pending_lock:
+            for job_id in list(self._pending):
+                self._pending.pop(job_id)
+                self.stats[JOB].record(0, 'job_timeout')
+        self.pool.shutdown()
+        self.poll_pool.shutdown()
+        return sending
+
+    def report(self, duration: float) -> dict:
+        endpoints = {name: stats.summary(duration) for name, stats in self.stats.items()}
+        endpoints = {name: data for name, data in endpoints.items() if data['requests']}
+        return {'endpoints': endpoints, 'client_lag': self.lag.summary(duration)}
+
+
+def parse_mix(value: str) -> dict:
+    mix = {}
+    for item in value.split(','):
+        name, _, weight = item.strip().partition(':')
+        if name not in SCENARIOS:
+            raise argparse.ArgumentTypeError(f"未知的场景：{name}，支持 {', '.join(SCENARIOS)}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+def start_mock_llm(extra_args: str) -> (subprocess.Popen, str):
+    """在子进程中启动模拟大模型服务（与压测客户端、服务端分属不同进程，互不争用GIL）"""
+    port = free_port()
+    command = [sys.executable, os.path.join(ROOT, 'benchmarks', 'mock_llm.py'), '--port', str(port)]
+    process = subprocess.Popen(command + shlex.split(extra_args), cwd=ROOT,
+                               stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(f'http://127.0.0.1:{port}/mock/stats', timeout=1)
+            return process, f'http://127.0.0.1:{port}'
+        except requests.RequestException:
+            if process.poll() is not None:
+                raise RuntimeError("模拟大模型服务启动失败，请检查 --mock-llm-args")
+            time.sleep(0.2)
+    process.kill()
+    raise RuntimeError("模拟大模型服务启动超时")
+
+
+def print_report(result: dict):
+    print(f"\n目标 {result['rps']} RPS，发送 {result['duration']:.1f}s，场景 {result['mix']}")
+    print(f"{'接口':<38}{'请求':>7}{'成功/s':>9}{'p50':>9}{'p95':>9}{'p99':>9}{'错误率':>9}  错误分类")
+    for name, data in result['endpoints'].items():
+        p = lambda key: f"{data[key]:.3f}s" if key in data else '-'
+        print(f"{name:<38}{data['requests']:>7}{data['throughput']:>9}{p('p50_s'):>9}{p('p95_s'):>9}{p('p99_s'):>9}"
+              f"{data['error_rate']:>9.2%}  {data['errors'] or ''}")
+    lag = result['client_lag']
+    if lag.get('p99_s', 0) > 0.1:
+        print(f"\n注意：压测客户端发起请求的p99滞后 {lag['p99_s']:.2f}s，客户端可能已饱和，可增大 --max-inflight")
+    if result.get('server'):
+        server = result['server']
+        print(f"\n服务进程峰值内存 {server.get('VmRSS', 0) / 1024:.0f} MB，峰值线程数 {server.get('Threads', 0)}")
+    if result.get('mock_llm'):
+        print(f"模拟大模型服务统计：{result['mock_llm']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='/upload 与 /api/analysis/start 端到端负载测试')
+    parser.add_argument('--rps', type=float, default=10, help='目标每秒操作数')
+    parser.add_argument('--duration', type=float, default=60, help='发送阶段时长（秒）')
+    parser.add_argument('--mix', type=parse_mix, default='pipeline:1', help='场景及权重，如 upload:1,analysis:3')
+    parser.add_argument('--arrival', choices=('constant', 'poisson'), default='poisson', help='请求到达间隔分布')
+    parser.add_argument('--upload-format', choices=('txt', 'docx', 'pdf'), default='txt', help='上传的简历文件格式')
+    parser.add_argument('--url', help='压测已运行的服务；不指定时在本地启动模拟大模型服务与服务端')
+    parser.add_argument('--mode', choices=('flask', 'asgi'), default='flask', help='本地启动的服务端模式')
+    parser.add_argument('--mock-llm-args', default='--latency lognormal:2,0.4 --tokens-per-second 60',
+                        help='传给 mock_llm.py 的参数')
+    parser.add_argument('--timeout', type=float, default=30, help='单个HTTP请求的超时（秒）')
+    parser.add_argument('--job-timeout', type=float, default=300, help='分析任务从提交到完成的超时（秒）')
+    parser.add_argument('--poll-interval', type=float, default=0.5, help='任务状态轮询间隔（秒）')
+    parser.add_argument('--max-inflight', type=int, default=256, help='客户端最大并发请求数')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='以JSON保存结果')
+    args = parser.parse_args()
+
+    processes = []
+    mock_url, peak, stop_sampler = None, {}, threading.Event()
+    try:
+        if args.url:
+            base_url = args.url
+        else:
+            mock_process, mock_url = start_mock_llm(args.mock_llm_args)
+            processes.append(mock_process)
+            port = free_port()
+            server = start_server(args.mode, port, mock_url + '/v1')
+            processes.append(server)
+            threading.Thread(target=sample_process, args=(server.pid, stop_sampler, peak), daemon=True).start()
+            base_url = f'http://127.0.0.1:{port}'
+        print(f"压测 {base_url}，目标 {args.rps} RPS，持续 {args.duration}s")
+
+        test = LoadTest(base_url, args.mix, args.upload_format, args.timeout, args.job_timeout,
+                        args.poll_interval, args.max_inflight, args.seed)
+        duration = test.run(args.rps, args.duration, args.arrival)
+        result = dict(test.report(duration), rps=args.rps, duration=duration,
+                      mix=args.mix, arrival=args.arrival, url=base_url)
+        if peak:
+            result['server'] = dict(peak)
+        if mock_url:
+            try:
+                result['mock_llm'] = requests.get(f'{mock_url}/mock/stats', timeout=5).json()
+            except requests.RequestException:
+                pass
+    finally:
+        stop_sampler.set()
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    print_report(result)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"\n结果已保存到 {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OpenAI兼容的模拟大模型服务
+实现 /v1/chat/completions（流式与非流式），用于离线CI、延迟与并发实验及容量评估，无需真实的大模型接口：
+    - 首token延迟按可配置的分布抽样（fixed / uniform / normal / lognormal / exponential），之后按token速率输出
+    - 按比例注入429（带Retry-After）、500、挂起超时与流式中途断开
+    - 录制：转发到真实接口并按请求内容保存响应；回放：相同请求返回录制的内容（可按录制时的耗时回放）
+    - 分板块并行生成的请求只返回对应的板块，与真实接口的调用方式一致
+
+用法：
+    python benchmarks/mock_llm.py [--port 9100] [--latency lognormal:1.5,0.4] [--tokens-per-second 60]
+                                  [--error-429 0.02] [--error-500 0.01] [--timeout-rate 0.005]
+    python benchmarks/mock_llm.py --upstream https://dashscope.aliyuncs.com/compatible-mode/v1 --record recordings/
+    python benchmarks/mock_llm.py --replay recordings/ [--replay-timing recorded] [--replay-strict]
+
+    服务端指向模拟服务：LLM_API_BASE_URL=http://127.0.0.1:9100/v1 LLM_API_KEY=mock python elegant_server.py
+
+说明：
+    - 录制文件只保存模型名、响应内容、用量与耗时，不保存请求中的简历与JD原文（文件名为请求内容的摘要）
+    - 录制时转发给上游的密钥取自环境变量 MOCK_LLM_UPSTREAM_KEY，未设置时沿用客户端请求中的Authorization
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import random
+import asyncio
+import hashlib
+import argparse
+import threading
+from typing import Optional, Dict, Any, List
+
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Route
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from prompts import REPORT_SECTIONS  # noqa: E402
+
+# 录制文件中的响应格式版本
+RECORDING_VERSION = 1
+
+
+class StreamAborted(ConnectionResetError):
+    """注入的流式响应中断"""
+
+
+class LatencyModel:
+    """延迟分布，规格形如 fixed:0.5、uniform:0.2,1.0、normal:1.0,0.3、lognormal:1.0,0.5（中位数,σ）、exponential:0.5"""
+
+    KINDS = ('fixed', 'uniform', 'normal', 'lognormal', 'exponential')
+
+    def __init__(self, spec: str, rng: random.Random):
+        kind, _, params = spec.partition(':')
+        try:
+            values = [float(v) for v in params.split(',') if v.strip()]
+        except ValueError:
+            raise ValueError(f"延迟分布参数无效：{spec}") from None
+        expected = {'fixed': 1, 'uniform': 2, 'normal': 2, 'lognormal': 2, 'exponential': 1}
+        if kind not in expected or len(values) != expected[kind]:
+            raise ValueError(f"延迟分布格式无效：{spec}，支持 {', '.join(self.KINDS)}")
+        self.spec = spec
+        self.kind = kind
+        self.values = values
+        self._rng = rng
+
+    def sample(self) -> float:
+        """抽样一次延迟（秒，不小于0）"""
+        if self.kind == 'fixed':
+            value = self.values[0]
+        elif self.kind == 'uniform':
+            value = self._rng.uniform(*self.values)
+        elif self.kind == 'normal':
+            value = self._rng.gauss(*self.values)
+        elif self.kind == 'lognormal':
+            median, sigma = self.values
+            value = median * self._rng.lognormvariate(0, sigma) if median > 0 else 0
+        else:
+            value = self._rng.expovariate(1 / self.values[0]) if self.values[0] > 0 else 0
+        return max(0.0, value)
+
+
+def default_report() -> str:
+    """默认的模拟分析报告（与大模型输出结构相同）"""
+    from bench_render import make_report
+    return make_report(rows=12, questions=8)
+
+
+def split_report_sections(report: str) -> Dict[str, str]:
+    """按「## 板块标题」拆分报告，返回 标题 -> 板块内容"""
+    sections = {}
+    for title in REPORT_SECTIONS:
+        start = report.find(f"## {title}")
+        if start < 0:
+            continue
+        end = min([i for i in (report.find(f"## {other}", start + 1) for other in REPORT_SECTIONS) if i > start]
+                  or [len(report)])
+        sections[title] = report[start:end].rstrip().rstrip('-').rstrip()
+    return sections
+
+
+def request_key(payload: Dict[str, Any]) -> str:
+    """按模型与消息内容生成录制键"""
+    material = json.dumps({'model': payload.get('model'), 'messages': payload.get('messages')},
+                          ensure_ascii=False, sort_keys=True)
+    return hashlib.sha256(material.encode('utf-8')).hexdigest()[:32]
+
+
+def estimate_tokens(text: str, chars_per_token: float) -> int:
+    return max(1, int(len(text) / chars_per_token))
+
+
+def error_body(message: str, error_type: str, code: Optional[str] = None) -> Dict[str, Any]:
+    return {'error': {'message': message, 'type': error_type, 'code': code}}
+
+
+class MockLLM:
+    """模拟大模型服务的状态：配置、录制/回放与统计"""
+
+    def __init__(self, args: argparse.Namespace):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.latency = LatencyModel(args.latency, self.rng)
+        if args.response_file:
+            with open(args.response_file, 'r', encoding='utf-8') as f:
+                self.report = f.read()
+        else:
+            self.report = default_report()
+        self.sections = split_report_sections(self.report)
+        self._lock = threading.Lock()
+        self.counters = {}
+        if args.record:
+            os.makedirs(args.record, exist_ok=True)
+
+    def count(self, name: str, amount: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.counters, latency=self.latency.spec, tokens_per_second=self.args.tokens_per_second)
+
+    def content_for(self, messages: List[Dict[str, Any]]) -> str:
+        """分板块生成的请求（最后一条消息只点名一个板块）返回对应板块，否则返回完整报告"""
+        last = str(messages[-1].get('content', '')) if messages else ''
+        named = [title for title in REPORT_SECTIONS if title in last]
+        if len(named) == 1 and named[0] in self.sections:
+            return self.sections[named[0]]
+        return self.report
+
+    def pick_fault(self) -> Optional[str]:
+        """按配置的比例抽取本次请求注入的故障"""
+        args = self.args
+        roll = self.rng.random()
+        for fault, rate in (('429', args.error_429), ('500', args.error_500), ('timeout', args.timeout_rate)):
+            if roll < rate:
+                return fault
+            roll -= rate
+        return None
+
+    def recording_path(self, key: str) -> str:
+        return os.path.join(self.args.replay or self.args.record, f"{key}.json")
+
+    def load_recording(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self.recording_path(key), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def save_recording(self, key: str, model: str, content: str, usage: Optional[Dict[str, Any]],
+                       first_token: float, duration: float):
+        path = self.recording_path(key)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'version': RECORDING_VERSION, 'model': model, 'content': content, 'usage': usage,
+                'first_token': round(first_token, 4), 'duration': round(duration, 4), 'recorded_at': time.time(),
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        self.count('recorded')
+
+
+def completion_id() -> str:
+    return f"chatcmpl-mock-{uuid.uuid4().hex[:24]}"
+
+
+def usage_for(mock: MockLLM, messages: List[Dict[str, Any]], content: str) -> Dict[str, int]:
+    prompt = sum(estimate_tokens(str(m.get('content', '')), mock.args.chars_per_token) for m in messages)
+    completion = estimate_tokens(content, mock.args.chars_per_token)
+    return {'prompt_tokens': prompt, 'completion_tokens': completion, 'total_tokens': prompt + completion}
+
+
+def pieces(content: str, chars_per_token: float) -> List[str]:
+    """按每token的字符数切分内容，模拟逐token输出"""
+    size = max(1, int(round(chars_per_token)))
+    return [content[i:i + size] for i in range(0, len(content), size)]
+
+
+async def chat_completions(request: Request):
+    mock: MockLLM = request.app.state.mock
+    try:
+        payload = await request.json()
+    except ValueError:
+        return JSONResponse(error_body('请求体不是有效的JSON', 'invalid_request_error'), status_code=400)
+    messages = payload.get('messages') or []
+    model = payload.get('model') or 'mock'
+    stream = bool(payload.get('stream'))
+    include_usage = bool((payload.get('stream_options') or {}).get('include_usage'))
+    mock.count('requests')
+    mock.count('stream_requests' if stream else 'completion_requests')
+
+    fault = mock.pick_fault()
+    if fault == '429':
+        mock.count('injected_429')
+        return JSONResponse(error_body('Rate limit exceeded (mock)', 'rate_limit_error', 'rate_limit_exceeded'),
+                            status_code=429, headers={'Retry-After': str(mock.args.retry_after)})
+    if fault == '500':
+        mock.count('injected_500')
+        await asyncio.sleep(mock.latency.sample())
+        return JSONResponse(error_body('Internal server error (mock)', 'server_error'), status_code=500)
+    if fault == 'timeout':
+        # 挂起直到客户端读超时断开
+        mock.count('injected_timeout')
+        await asyncio.sleep(mock.args.hang_seconds)
+        return JSONResponse(error_body('Gateway timeout (mock)', 'server_error'), status_code=504)
+
+    key = request_key(payload)
+    if mock.args.upstream:
+        return await proxy_upstream(request, mock, payload, key, stream)
+
+    first_token, token_interval = mock.latency.sample(), None
+    content = None
+    if mock.args.replay:
+        recording = mock.load_recording(key)
+        if recording is not None:
+            mock.count('replay_hits')
+            content = recording['content']
+            if mock.args.replay_timing == 'recorded':
+                first_token = recording.get('first_token') or 0
+                steps = max(1, len(pieces(content, mock.args.chars_per_token)))
+                token_interval = max(0.0, (recording.get('duration') or 0) - first_token) / steps
+        else:
+            mock.count('replay_misses')
+            if mock.args.replay_strict:
+                return JSONResponse(error_body('No recording for this request (mock replay)', 'not_found_error'),
+                                    status_code=404)
+    if content is None:
+        content = mock.content_for(messages)
+    if token_interval is None:
+        token_interval = 1 / mock.args.tokens_per_second if mock.args.tokens_per_second > 0 else 0.0
+    usage = usage_for(mock, messages, content)
+    created = int(time.time())
+
+    if not stream:
+        await asyncio.sleep(first_token + token_interval * len(pieces(content, mock.args.chars_per_token)))
+        return JSONResponse({
+            'id': completion_id(), 'object': 'chat.completion', 'created': created, 'model': model,
+            'choices': [{'index': 0, 'finish_reason': 'stop', 'message': {'role': 'assistant', 'content': content}}],
+            'usage': usage,
+        })
+
+    abort = mock.rng.random() < mock.args.stream_abort_rate
+    if abort:
+        mock.count('injected_stream_abort')
+    return StreamingResponse(
+        stream_chunks(mock, model, created, content, usage if include_usage else None, first_token,
+                      token_interval, abort),
+        media_type='text/event-stream', headers={'Cache-Control': 'no-cache'}
+    )
+
+
+async def stream_chunks(mock: MockLLM, model: str, created: int, content: str, usage: Optional[Dict[str, int]],
+                        first_token: float, token_interval: float, abort: bool):
+    """按首token延迟与token间隔产出SSE分片；到期的多个token在同一次写入中发出，避免高速率时逐个sleep"""
+    chunk_id = completion_id()
+
+    def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None, **extra) -> bytes:
+        data = {'id': chunk_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                'choices': [{'index': 0, 'delta': delta, 'finish_reason': finish_reason}], **extra}
+        return f"data: {json.dumps(data, ensure_ascii=False)}\n\n".encode('utf-8')
+
+    tokens = pieces(content, mock.args.chars_per_token)
+    cutoff = len(tokens) // 2 if abort else len(tokens)
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    await asyncio.sleep(first_token)
+    yield chunk({'role': 'assistant', 'content': ''})
+
+    index = 0
+    while index < cutoff:
+        due = index + 1 if token_interval <= 0 else int((loop.time() - start - first_token) / token_interval) + 1
+        batch = tokens[index:min(max(due, index + 1), cutoff)]
+        index += len(batch)
+        yield b''.join(chunk({'content': token}) for token in batch)
+        if token_interval > 0 and index < cutoff:
+            await asyncio.sleep(max(0.0, start + first_token + index * token_interval - loop.time()))
+    if abort:
+        # 中途断开连接，模拟上游流式响应中断
+        raise StreamAborted("模拟的流式响应中断")
+
+    yield chunk({}, 'stop')
+    if usage is not None:
+        data = {'id': chunk_id, 'object': 'chat.completion.chunk', 'created': created, 'model': model,
+                'choices': [], 'usage': usage}
+        yield f"data: {json.dumps(data)}\n\n".encode('utf-8')
+    yield b"data: [DONE]\n\n"
+
+
+async def proxy_upstream(request: Request, mock: MockLLM, payload: Dict[str, Any], key: str, stream: bool):
+    """转发到真实接口并录制响应；流式请求边转发边解析内容"""
+    import httpx
+
+    headers = {'Content-Type': 'application/json'}
+    api_key = os.getenv('MOCK_LLM_UPSTREAM_KEY')
+    headers['Authorization'] = f"Bearer {api_key}" if api_key else request.headers.get('authorization', '')
+    url = mock.args.upstream.rstrip('/') + '/chat/completions'
+    client: httpx.AsyncClient = request.app.state.upstream
+    model = payload.get('model') or 'mock'
+    mock.count('upstream_requests')
+    start = time.perf_counter()
+
+    if not stream:
+        response = await client.post(url, json=payload, headers=headers)
+        if response.status_code == 200 and mock.args.record:
+            data = response.json()
+            elapsed = time.perf_counter() - start
+            mock.save_recording(key, model, data['choices'][0]['message']['content'] or '', data.get('usage'),
+                                elapsed, elapsed)
+        return JSONResponse(response.json(), status_code=response.status_code)
+
+    upstream = await client.send(client.build_request('POST', url, json=payload, headers=headers), stream=True)
+    if upstream.status_code != 200:
+        body = await upstream.aread()
+        await upstream.aclose()
+        return JSONResponse(json.loads(body or b'{}'), status_code=upstream.status_code)
+
+    async def relay():
+        parts, usage, first_token = [], None, None
+        try:
+            async for line in upstream.aiter_lines():
+                if line.startswith('data: ') and line != 'data: [DONE]':
+                    data = json.loads(line[6:])
+                    for choice in data.get('choices') or []:
+                        text = (choice.get('delta') or {}).get('content')
+                        if text:
+                            if first_token is None:
+                                first_token = time.perf_counter() - start
+                            parts.append(text)
+                    usage = data.get('usage') or usage
+                yield (line + '\n').encode('utf-8')
+        finally:
+            await upstream.aclose()
+        if mock.args.record and parts:
+            mock.save_recording(key, model, ''.join(parts), usage, first_token or 0, time.perf_counter() - start)
+
+    return StreamingResponse(relay(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+async def list_models(request: Request):
+    return JSONResponse({'object': 'list', 'data': [{'id': 'mock', 'object': 'model', 'owned_by': 'mock'}]})
+
+
+async def mock_stats(request: Request):
+    """模拟服务统计：请求数、注入的故障数、录制与回放命中情况"""
+    return JSONResponse(request.app.state.mock.stats())
+
+
+def suppress_stream_aborts(app):
+    """吞掉注入的流式中断异常：响应已开始时由服务器直接关闭连接，避免每次注入都打印完整的异常栈"""
+    async def wrapped(scope, receive, send):
+        try:
+            await app(scope, receive, send)
+        except StreamAborted:
+            pass
+    return wrapped
+
+
+def create_app(args: argparse.Namespace) -> Starlette:
+    app = Starlette(routes=[
+        Route('/v1/chat/completions', chat_completions, methods=['POST']),
+        Route('/v1/models', list_models, methods=['GET']),
+        Route('/mock/stats', mock_stats, methods=['GET']),
+    ])
+    app.state.mock = MockLLM(args)
+    if args.upstream:
+        import httpx
+        app.state.upstream = httpx.AsyncClient(timeout=httpx.Timeout(300, connect=10))
+    return app
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description='OpenAI兼容的模拟大模型服务')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=9100)
+    parser.add_argument('--latency', default='fixed:0.5', help='首token延迟分布（秒），如 lognormal:1.5,0.4')
+    parser.add_argument('--tokens-per-second', type=float, default=50, help='首token之后的输出速率，0表示一次性输出')
+    parser.add_argument('--chars-per-token', type=float, default=2, help='每个token对应的字符数（用于切分与用量估算）')
+    parser.add_argument('--error-429', type=float, default=0, help='返回429的请求比例')
+    parser.add_argument('--retry-after', type=int, default=1, help='429响应的Retry-After（秒）')
+    parser.add_argument('--error-500', type=float, default=0, help='返回500的请求比例')
+    parser.add_argument('--timeout-rate', type=float, default=0, help='挂起不响应的请求比例')
+    parser.add_argument('--hang-seconds', type=float, default=600, help='挂起请求的挂起时长')
+    parser.add_argument('--stream-abort-rate', type=float, default=0, help='流式响应中途断开的比例')
+    parser.add_argument('--response-file', help='以该Markdown文件作为模拟报告')
+    parser.add_argument('--upstream', help='录制模式：转发到的真实接口地址（如 .../compatible-mode/v1）')
+    parser.add_argument('--record', help='录制模式：录制文件保存目录')
+    parser.add_argument('--replay', help='回放模式：录制文件目录')
+    parser.add_argument('--replay-timing', choices=('model', 'recorded'), default='model',
+                        help='回放时按延迟分布（model）还是按录制时的耗时（recorded）输出')
+    parser.add_argument('--replay-strict', action='store_true', help='回放未命中时返回404，而不是默认报告')
+    parser.add_argument('--seed', type=int, default=None, help='随机种子（延迟与故障注入可复现）')
+    parser.add_argument('--log-level', default='warning')
+    return parser
+
+
+def main():
+    args = build_parser().parse_args()
+    if args.record and not args.upstream:
+        raise SystemExit('--record 需要同时指定 --upstream')
+    if args.upstream and args.replay:
+        raise SystemExit('--upstream 与 --replay 不能同时使用')
+
+    import uvicorn
+    app = create_app(args)
+    print(f"模拟大模型服务: http://{args.host}:{args.port}/v1（首token延迟 {args.latency}，"
+          f"{args.tokens_per_second} token/s）")
+    uvicorn.run(suppress_stream_aborts(app), host=args.host, port=args.port, log_level=args.log_level)
+
+
+if __name__ == '__main__':
+    main()
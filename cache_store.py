@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+缓存存储层
+提供进程内LRU缓存、基于SQLite的磁盘缓存以及二者组合的分层缓存，
+均支持TTL过期与容量淘汰，并记录命中/未命中统计
+"""
+
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Callable
+
+
+def make_cache_key(*parts) -> str:
+    """
+    根据若干组成部分生成内容寻址的缓存键
+
+    Args:
+        *parts: 参与计算的字符串或字节串
+
+    Returns:
+        SHA-256 十六进制摘要
+    """
+    digest = hashlib.sha256()
+    for part in parts:
+        if part is None:
+            part = ''
+        if isinstance(part, str):
+            part = part.encode('utf-8')
+        # 先写入长度，避免不同切分方式拼出相同的字节序列
+        digest.update(str(len(part)).encode('ascii') + b':')
+        digest.update(part)
+    return digest.hexdigest()
+
+
+def _default_sizeof(value) -> int:
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8'))
+    return 1
+
+
+class MemoryLRUCache:
+    """线程安全的进程内LRU缓存，支持条目数/字节数上限与TTL"""
+
+    def __init__(self, max_entries: Optional[int] = 1024, max_bytes: Optional[int] = None,
+                 ttl: Optional[float] = None, sizeof: Callable[[Any], int] = _default_sizeof):
+        """
+        初始化缓存
+
+        Args:
+            max_entries: 最大条目数，None表示不限制
+            max_bytes: 最大字节数，None表示不限制
+            ttl: 条目存活时间（秒），None表示永不过期
+            sizeof: 计算条目大小的函数
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.sizeof = sizeof
+        # key -> (value, size, expires_at)
+        self._data = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str, default=None):
+        """读取条目，命中时将其移到最近使用端"""
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at <= time.time():
+                self._remove(key)
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value, size: Optional[int] = None):
+        """写入条目，超出容量时从最久未使用端淘汰"""
+        if size is None:
+            size = self.sizeof(value)
+        expires_at = time.time() + self.ttl if self.ttl else None
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+            if self.max_bytes is not None and size > self.max_bytes:
+                # 单个条目超过总容量，直接放弃缓存
+                return
+            self._data[key] = (value, size, expires_at)
+            self._bytes += size
+            while self._over_capacity():
+                oldest = next(iter(self._data))
+                self._remove(oldest)
+                self.evictions += 1
+
+    def delete(self, key: str) -> bool:
+        """删除条目，返回是否存在"""
+        with self._lock:
+            if key in self._data:
+                self._remove(key)
+                return True
+            return False
+
+    def __contains__(self, key: str) -> bool:
+        with self._lock:
+            entry = self._data.get(key)
+            return entry is not None and (entry[2] is None or entry[2] > time.time())
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def purge_expired(self) -> int:
+        """清理所有过期条目，返回清理数量"""
+        if not self.ttl:
+            return 0
+        now = time.time()
+        with self._lock:
+            expired = [key for key, entry in self._data.items() if entry[2] <= now]
+            for key in expired:
+                self._remove(key)
+            return len(expired)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """返回缓存统计信息"""
+        with self._lock:
+            return {
+                'entries': len(self._data),
+                'bytes': self._bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def _remove(self, key: str):
+        # 调用方需持有 self._lock
+        _, size, _ = self._data.pop(key)
+        self._bytes -= size
+
+    def _over_capacity(self) -> bool:
+        if self.max_entries is not None and len(self._data) > self.max_entries:
+            return True
+        if self.max_bytes is not None and self._bytes > self.max_bytes:
+            return True
+        return False
+
+
+class SQLiteCache:
+    """基于SQLite（WAL模式）的磁盘缓存，多线程、多进程共享同一文件"""
+
+    def __init__(self, path: str, ttl: Optional[float] = None, max_bytes: Optional[int] = None):
+        """
+        初始化磁盘缓存
+
+        Args:
+            path: SQLite数据库文件路径
+            ttl: 条目存活时间（秒），None表示永不过期
+            max_bytes: 缓存内容总字节数上限，None表示不限制
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key TEXT PRIMARY KEY,"
+            " value BLOB NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " expires_at REAL,"
+            " accessed_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_accessed ON cache (accessed_at)")
+
+    def get(self, key: str):
+        """读取条目，过期条目视为未命中"""
+        now = time.time()
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT value, expires_at FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None or (row[1] is not None and row[1] <= now):
+            if row is not None:
+                conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._count('misses')
+            return None
+        conn.execute("UPDATE cache SET accessed_at = ? WHERE key = ?", (now, key))
+        self._count('hits')
+        return row[0]
+
+    def set(self, key: str, value):
+        """写入条目（str或bytes），超出容量时按最久未访问淘汰"""
+        now = time.time()
+        size = _default_sizeof(value)
+        expires_at = now + self.ttl if self.ttl else None
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, value, size, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            (key, value, size, expires_at, now)
+        )
+        if self.max_bytes is not None:
+            self._evict(conn)
+
+    def delete(self, key: str) -> bool:
+        cursor = self._conn().execute("DELETE FROM cache WHERE key = ?", (key,))
+        return cursor.rowcount > 0
+
+    def purge_expired(self) -> int:
+        """清理所有过期条目，返回清理数量"""
+        cursor = self._conn().execute(
+            "DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+        )
+        return cursor.rowcount
+
+    def stats(self) -> Dict[str, Any]:
+        entries, total = self._conn().execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM cache"
+        ).fetchone()
+        with self._stats_lock:
+            return {
+                'entries': entries,
+                'bytes': total,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+            }
+
+    def _evict(self, conn: sqlite3.Connection):
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM cache").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        self.purge_expired()
+        rows = conn.execute("SELECT key, size FROM cache ORDER BY accessed_at").fetchall()
+        total = sum(size for _, size in rows)
+        victims = []
+        for key, size in rows:
+            if total <= self.max_bytes:
+                break
+            victims.append((key,))
+            total -= size
+        conn.executemany("DELETE FROM cache WHERE key = ?", victims)
+        with self._stats_lock:
+            self.evictions += len(victims)
+
+    def _count(self, field: str):
+        with self._stats_lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+    def _conn(self) -> sqlite3.Connection:
+        # SQLite连接不能跨线程共享，每个线程持有自己的连接
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+class TieredCache:
+    """内存LRU + 磁盘的两级缓存，磁盘命中时回填内存层"""
+
+    def __init__(self, memory: MemoryLRUCache, disk: Optional[SQLiteCache] = None):
+        self.memory = memory
+        self.disk = disk
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: str):
+        value = self.memory.get(key)
+        if value is None and self.disk is not None:
+            try:
+                value = self.disk.get(key)
+            except sqlite3.Error:
+                value = None
+            if value is not None:
+                self.memory.set(key, value)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def set(self, key: str, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except sqlite3.Error:
+                # 磁盘层失败不影响内存层使用
+                pass
+
+    def delete(self, key: str):
+        self.memory.delete(key)
+        if self.disk is not None:
+            self.disk.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            total = self.hits + self.misses
+            data = {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / total, 4) if total else 0.0,
+                'memory': self.memory.stats(),
+            }
+        if self.disk is not None:
+            try:
+                data['disk'] = self.disk.stats()
+            except sqlite3.Error:
+                data['disk'] = None
+        return data
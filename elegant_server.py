@@ -1,13 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-from flask import Flask, request, jsonify, send_from_directory, make_response
+from flask import Flask, request, jsonify, make_response, Response, stream_with_context, g
 from flask_cors import CORS
+from werkzeug.datastructures import FileStorage
 import html_report
+import pdf_pipeline
 import os
-import pdfplumber
 from PIL import Image
-import pytesseract
 import numpy as np
 import requests
 import io
@@ -16,6 +16,8 @@ import time
 import uuid
 import tempfile
 import functools
+import json
+import math
 
 # 加载环境变量
 from dotenv import load_dotenv
@@ -24,8 +26,47 @@ load_dotenv()
 # 导入大模型API代理层
 from llm_proxy import llm_proxy
 
-# 文件存储管理
-temp_files = {}
+# 导入分析任务队列
+from analysis_jobs import job_manager, JobQueueFullError, JOB_FAILED
+
+# 导入文件内容提取缓存
+from extraction_cache import extraction_cache, PartialContent
+
+# 导入OCR引擎管理器与OCR识别入口（识别入口在轻量模块中，PDF扫描页的OCR进程池子进程只需导入该模块）
+from ocr_engines import ocr_engines, ocr_image as ocr_olmocr, OCR_LANGUAGES, OCR_WARMUP
+
+# 导入请求限流器
+from rate_limiter import rate_limiter
+
+# 导入批量筛选管理器
+from batch_screening import batch_manager, BatchLimitError, BatchQueueFullError, CANDIDATE_FAILED, CANDIDATE_SUCCEEDED, normalize_material
+
+# 导入词法预排序
+from lexical_ranker import rank_texts
+
+# 导入分析记录存储（增量重新分析）
+from incremental_analysis import analysis_history
+
+# 导入报告存储（按报告ID持久化、预压缩的HTML报告）
+from report_store import report_store
+
+# 导入HTTP内容分发（压缩编码协商、ETag与预压缩静态资源）
+from http_delivery import static_assets, gzip_body
+
+# 导入延迟与用量指标（/metrics）
+import metrics
+
+# 导入请求级追踪（span以OTLP/JSON lines格式导出）
+import tracing
+
+# 文件存储管理：有字节上限、LRU + TTL淘汰的临时存储，后台线程定期清理过期文件
+from temp_store import temp_store
+temp_store.start_sweeper(interval=float(os.getenv('TEMP_STORE_SWEEP_INTERVAL', 60)))
+
+# 提取器版本，修改提取逻辑时需同步递增，使旧的提取缓存失效
+EXTRACTOR_VERSION = '3'
+# 必须落盘的临时文件（如.doc转换）优先放在内存文件系统中
+SCRATCH_DIR = '/dev/shm' if os.access('/dev/shm', os.W_OK) else None
 
 # 解决paddleocr中的langchain导入问题
 # 在新版本的langchain中，许多模块已经被移动到langchain-community或独立的包中
@@ -63,102 +104,73 @@ CORS(app)  # 添加CORS支持
 # 设置静态文件目录
 app.static_folder = '.'
 
-# 频率限流配置
-REQUEST_LIMIT = 3  # 每分钟最大请求数
-request_history = {}
+# 频率限流配置：配额按请求成本扣减（RATE_LIMIT_PER_MINUTE，默认每分钟6个单位）
+# 需要OCR的文件上传比文本分析消耗更多配额
+OCR_UPLOAD_COST = float(os.getenv('RATE_LIMIT_OCR_COST', 2))
+OCR_EXTENSIONS = ('.pdf', '.png', '.jpg', '.jpeg', '.bmp', '.gif')
+
+# 批量筛选发起请求的成本（批次内的候选人数另受 BATCH_MAX_CANDIDATES 约束）
+BATCH_RATE_COST = float(os.getenv('RATE_LIMIT_BATCH_COST', 2))
+
+# 请求成本超过限流配额时这类请求永远无法通过，启动时直接报错，而不是运行时返回可重试的429
+for _cost in (OCR_UPLOAD_COST, BATCH_RATE_COST):
+    rate_limiter.validate_cost(_cost)
+
+# 批量筛选默认只将词法预排序前K名交给大模型，0表示全部分析（请求可通过top_k覆盖）
+BATCH_TOP_K = int(os.getenv('BATCH_TOP_K', 0))
+
+def upload_cost():
+    """根据上传文件类型计算请求成本，图片和PDF可能触发OCR"""
+    file = request.files.get('file')
+    if file and os.path.splitext(file.filename or '')[1].lower() in OCR_EXTENSIONS:
+        return OCR_UPLOAD_COST
+    return 1
+
+# 频率限流装饰器，支持 @rate_limit 与 @rate_limit(cost=...)，cost可以是数值或返回数值的函数
+def rate_limit(func=None, cost=1):
+    if func is None:
+        return functools.partial(rate_limit, cost=cost)
 
-# 频率限流装饰器
-def rate_limit(func):
     @functools.wraps(func)
     def wrapper(*args, **kwargs):
         # 获取客户端IP
         client_ip = request.remote_addr
-        current_time = int(time.time() / 60)  # 按分钟计数
-        
-        # 初始化请求历史
-        if client_ip not in request_history:
-            request_history[client_ip] = {}
-        
-        # 清理过期记录
-        expired_times = [t for t in request_history[client_ip] if t < current_time - 1]
-        for t in expired_times:
-            del request_history[client_ip][t]
-        
-        # 检查请求频率
-        if current_time in request_history[client_ip]:
-            if request_history[client_ip][current_time] >= REQUEST_LIMIT:
-                return jsonify({'error': '请求过于频繁，请稍后重试'}), 429
-        else:
-            request_history[client_ip][current_time] = 0
-        
-        # 增加请求计数
-        request_history[client_ip][current_time] += 1
-        
+        result = rate_limiter.check(client_ip, cost() if callable(cost) else cost)
+        if not result.allowed:
+            response = jsonify({'error': '请求过于频繁，请稍后重试'})
+            response.headers['Retry-After'] = str(max(1, math.ceil(result.retry_after)))
+            return response, 429
         return func(*args, **kwargs)
     return wrapper
 
-def ocr_olmocr(image):
-    """
-    使用OCR技术进行文字识别，优先使用pytesseract（CPU友好）
-    """
-    # 保存图像到临时文件
-    import tempfile
-    import os
-    
-    with tempfile.NamedTemporaryFile(delete=False, suffix='.png') as tmp:
-        image.save(tmp, format="PNG")
-        tmp_path = tmp.name
-    
-    try:
-        # 优先使用pytesseract（CPU友好的OCR技术）
+def extractor_name(filename):
+    """按扩展名返回文件提取器名称，用作指标标签"""
+    extension = os.path.splitext(filename or '')[1].lower()
+    if extension == '.pdf':
+        return 'pdf'
+    if extension in ('.png', '.jpg', '.jpeg', '.bmp', '.gif'):
+        return 'image'
+    if extension in ('.docx', '.doc'):
+        return extension[1:]
+    return 'text'
+
+def observe_extraction(func):
+    """记录各类文件提取器的耗时与追踪span（只在提取缓存未命中、实际解析文件时调用）"""
+    @functools.wraps(func)
+    def wrapper(file):
+        if not file:
+            return func(file)
+        start = time.perf_counter()
         try:
-            result = pytesseract.image_to_string(image, lang='chi_sim+eng')
-            if result.strip():
-                return result.strip()
-            else:
-                return "（OCR识别成功，但未提取到文本）"
-        except ImportError:
-            print("pytesseract库未安装，无法使用OCR功能")
-            return "（OCR识别失败，请先安装tesseract和pytesseract库）"
-        except Exception as e:
-            print(f"pytesseract识别失败: {e}")
-            
-            # 尝试使用EasyOCR作为备用方案（也是CPU友好的）
-            try:
-                import easyocr
-                
-                # 创建EasyOCR实例（指定语言：中文和英文）
-                # 指定临时目录存储模型文件，解决权限问题
-                reader = easyocr.Reader(
-                    ['ch_sim', 'en'], 
-                    gpu=False,  # 禁用GPU，使用CPU
-                    download_enabled=False,  # 禁用自动下载
-                    user_network_directory='/tmp/EasyOCR'  # 指定可写的临时目录
-                )
-                
-                # 调用readtext方法，传递图像路径
-                result = reader.readtext(tmp_path)
-                
-                # 处理返回结果
-                text = ""
-                for detection in result:
-                    if len(detection) >= 2:
-                        text += detection[1] + "\n"
-                
-                if text.strip():
-                    return text.strip()
-                else:
-                    return "（OCR识别成功，但未提取到文本）"
-            except ImportError:
-                print("easyocr库未安装，无法使用备用OCR功能")
-                return "（OCR识别失败，请先安装tesseract和pytesseract库或easyocr库）"
-            except Exception as e:
-                print(f"easyocr识别失败: {e}")
-                return "（OCR识别失败，请安装并配置好OCR环境）"
-    finally:
-        # 删除临时文件
-        os.remove(tmp_path)
+            with tracing.span('extract_file_content', {'file.extractor': extractor_name(file.filename)}):
+                return func(file)
+        finally:
+            elapsed = time.perf_counter() - start
+            metrics.EXTRACTION_SECONDS.observe(elapsed, extractor=extractor_name(file.filename))
+            metrics.observe_stage('extraction', elapsed)
+    return wrapper
 
+@observe_extraction
 def extract_file_content(file):
     """
     提取不同类型文件的内容
@@ -174,20 +186,10 @@ def extract_file_content(file):
         file_extension = os.path.splitext(file.filename)[1].lower()
         
         if file_extension == '.pdf':
-            import pdfplumber
-            text = ""
-            with pdfplumber.open(file) as pdf:
-                for page in pdf.pages:
-                    page_text = page.extract_text()
-                    if page_text:
-                        text += page_text
-                    else:
-                        # 如果文本提取失败，尝试OCR
-                        ocr_result = ocr_olmocr(page.to_image().original)
-                        # 无论OCR结果如何，都将其添加到文本中
-                        text += ocr_result
-            # 返回提取的文本，即使为空
-            return text
+            # 逐页提取文本层，无文本层的扫描页分发到进程池并行OCR，结果按页码顺序拼接
+            text, complete = pdf_pipeline.extract_pdf_text(file.read(), ocr_olmocr)
+            # 返回提取的文本，即使为空；部分页OCR超时或失败时标记为不完整，不写入提取缓存
+            return text if complete else PartialContent(text)
         elif file_extension in ['.png', '.jpg', '.jpeg', '.bmp', '.gif']:
             from PIL import Image
             image = Image.open(file)
@@ -204,7 +206,7 @@ def extract_file_content(file):
             
             # 保存临时文件
             file_content = file.read()  # 读取文件内容
-            with tempfile.NamedTemporaryFile(delete=False, suffix='.doc') as tmp:
+            with tempfile.NamedTemporaryFile(delete=False, suffix='.doc', dir=SCRATCH_DIR) as tmp:
                 tmp.write(file_content)
                 tmp_path = tmp.name
             
@@ -265,6 +267,19 @@ def extract_file_content(file):
         print(f"读取文件时出错: {e}")
         return "（文件读取失败，请检查文件格式和内容）"  # 返回错误信息
 
+def extract_file_content_cached(file):
+    """
+    提取文件内容，相同文件（按字节内容判定）重复上传时直接复用缓存的提取结果
+    :param file: 上传的文件对象
+    :return: (文件内容文本, 缓存条目)，结果不可缓存时缓存条目为None
+    """
+    if not file:
+        return None, None
+    
+    content, entry, hit = extraction_cache.extract(file, extract_file_content, EXTRACTOR_VERSION, OCR_LANGUAGES)
+    tracing.set_attribute('extraction_cache.hit', hit)
+    return content, entry
+
 def analyze_resume_with_AI(resume_text: str, jd_text: str, target_position: str) -> str:
     """
     使用AI分析简历内容
@@ -285,9 +300,95 @@ def analyze_resume_with_AI(resume_text: str, jd_text: str, target_position: str)
         print(f"大模型API调用失败：{str(e)}")
         return "服务暂时不可用，请稍后重试"
 
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.before_request
+def start_request_trace():
+    """沿用客户端传入的追踪ID（traceparent或X-Trace-Id）开始请求span，请求内的各环节记录为其子span"""
+    span = tracing.start_request(request.method, request.path, request.headers, request.remote_addr)
+    if span is not None:
+        g.trace_span = span
+        g.trace_token = tracing.activate(span)
+
+@app.after_request
+def attach_trace_id(response):
+    span = g.get('trace_span')
+    if span is None:
+        return response
+    response.headers[tracing.TRACE_HEADER] = span.trace_id
+    tracing.finish_request(span, response.status_code, request.url_rule.rule if request.url_rule else None)
+    if response.is_streamed:
+        # 流式响应体在视图返回后才被迭代（其间请求上下文的teardown已经执行），
+        # 请求span改为随响应体迭代结束，迭代期间仍作为当前span
+        g.pop('trace_span')
+        tracing.deactivate(g.pop('trace_token'))
+        response.response = tracing.iterate_in_span(span, response.response)
+    return response
+
+@app.teardown_request
+def end_request_trace(exc):
+    """请求结束时结束请求span（流式响应除外）"""
+    span = g.pop('trace_span', None)
+    if span is None:
+        return
+    if exc is not None:
+        span.record_exception(exc)
+    tracing.deactivate(g.pop('trace_token'))
+    span.end()
+
+@app.after_request
+def record_request_metrics(response):
+    """记录HTTP请求耗时（流式响应只统计到响应头发出）"""
+    started = g.pop('request_started', None)
+    if started is not None:
+        metrics.observe_request(request.endpoint, request.method, response.status_code,
+                                time.perf_counter() - started)
+    return response
+
+@app.after_request
+def compress_response(response):
+    """
+    动态响应（JSON接口、HTML报告）按Accept-Encoding进行gzip压缩；
+    已编码、流式（SSE）、文件直传与非2xx响应保持原样
+    """
+    if (response.direct_passthrough or response.is_streamed or not 200 <= response.status_code < 300
+            or 'Content-Encoding' in response.headers):
+        return response
+    body = gzip_body(response.get_data(), request.headers)
+    if body is not None:
+        response.set_data(body)
+        response.headers['Content-Encoding'] = 'gzip'
+        response.vary.add('Accept-Encoding')
+    return response
+
+def asset_response(asset):
+    """
+    返回静态资源：按Accept-Encoding直接返回预压缩内容，带强ETag与缓存头
+    :param asset: 静态资源
+    :return: Flask响应
+    """
+    status, headers, body = asset.response(request.headers)
+    return Response(body, status=status, headers=headers)
+
 @app.route('/')
 def index():
-    return send_from_directory('.', 'elegant_app.html')
+    asset = static_assets.get('index.html')
+    if not asset:
+        return jsonify({'code': 404, 'msg': '页面不存在'}), 404
+    return asset_response(asset)
+
+@app.route('/assets/<name>', methods=['GET'])
+def get_asset(name):
+    """
+    静态资源接口
+    返回带内容指纹的共享资源（如报告样式表），可被浏览器长期缓存
+    """
+    asset = static_assets.get(name)
+    if not asset:
+        return jsonify({'code': 404, 'msg': '资源不存在'}), 404
+    return asset_response(asset)
 
 @app.route('/analyze', methods=['POST'])
 @rate_limit
@@ -302,7 +403,7 @@ def analyze():
         jd_content = jd_text
         
         if jd_file:
-            jd_content = extract_file_content(jd_file)
+            jd_content, _ = extract_file_content_cached(jd_file)
         
         # 获取简历内容
         resume_text = request.form.get('resume_text', '')
@@ -310,20 +411,14 @@ def analyze():
         resume_content = resume_text
         
         if resume_file:
-            resume_content = extract_file_content(resume_file)
+            resume_content, _ = extract_file_content_cached(resume_file)
         
         # 验证数据
-        if not target_position:
-            return jsonify({'error': '请选择目标岗位'}), 400
-        if not jd_text and not jd_file:
-            return jsonify({'error': '请输入职位JD内容或上传有效的JD文件'}), 400
-        if not resume_text and not resume_file:
-            return jsonify({'error': '请输入简历内容或上传有效的简历文件'}), 400
-        # 允许OCR识别失败的情况通过验证，让AI分析来处理这些情况
-        if not jd_content:
-            jd_content = "（OCR识别失败，无法提取JD图像中的文字内容）"
-        if not resume_content:
-            resume_content = "（OCR识别失败，无法提取简历图像中的文字内容）"
+        inputs, error = validate_form_inputs(target_position, jd_text, jd_file, jd_content,
+                                             resume_text, resume_file, resume_content)
+        if error:
+            return jsonify({'error': error}), 400
+        resume_content, jd_content, target_position = inputs
         
         # 调用AI分析
         analysis_result = analyze_resume_with_AI(resume_content, jd_content, target_position)
@@ -336,7 +431,9 @@ def analyze():
         return jsonify({'error': '服务暂时不可用，请稍后重试'}), 500
 
 @app.route('/upload', methods=['POST'])
-@rate_limit
+@rate_limit(cost=upload_cost)
+@metrics.timed('upload')
+@tracing.traced('handle_file_upload')
 def handle_file_upload():
     """
     文件上传接口
@@ -347,85 +444,624 @@ def handle_file_upload():
         if not file:
             return jsonify({'error': '请选择要上传的文件'}), 400
         
-        # 生成唯一文件ID
-        file_id = str(uuid.uuid4())
-        
-        # 提取文件内容
-        file_content = extract_file_content(file)
+        # 提取文件内容（相同文件命中缓存时跳过解析与OCR）
+        file_content, cache_entry = extract_file_content_cached(file)
         
-        # 存储文件内容
-        temp_files[file_id] = {
-            'content': file_content,
-            'filename': file.filename,
-            'timestamp': time.time()
-        }
+        # 相同内容的临时文件仍有效时直接复用其文件ID（同时续期）
+        if cache_entry and cache_entry['file_id'] and temp_store.touch(cache_entry['file_id']):
+            return jsonify({'file_id': cache_entry['file_id']})
         
-        # 清理过期文件（超过1小时的文件）
-        current_time = time.time()
-        expired_files = [fid for fid, data in temp_files.items() if current_time - data['timestamp'] > 3600]
-        for fid in expired_files:
-            del temp_files[fid]
+        # 存储文件内容并生成唯一文件ID
+        file_id = temp_store.put(file_content, file.filename)
+        if cache_entry:
+            cache_entry['file_id'] = file_id
         
         return jsonify({'file_id': file_id})
     except Exception as e:
         print(f"文件上传失败：{str(e)}")
         return jsonify({'error': '文件上传失败，请稍后重试'}), 500
 
+def analyze_and_record(resume_content, jd_content, target_position, previous=None, analysis_id=None):
+    """
+    分析简历并保存分析记录；提供上次的分析记录时做增量重新分析
+    :param previous: 上次的分析记录，为None时完整分析
+    :param analysis_id: 本次分析的ID，为None时自动生成
+    :return: (Markdown分析结果, 分析ID)，分析失败时分析ID为None
+    """
+    if not llm_proxy:
+        return "服务暂时不可用，请稍后重试", None
+    
+    try:
+        if previous:
+            result = llm_proxy.reanalyze_resume(previous, resume_content, jd_content, target_position, raise_errors=True)
+        else:
+            result = llm_proxy.analyze_resume(resume_content, jd_content, target_position, raise_errors=True)
+    except ValueError as e:
+        return str(e), None
+    except Exception as e:
+        # 避免泄露密钥相关错误信息
+        print(f"大模型API调用失败：{str(e)}")
+        return "服务暂时不可用，请稍后重试", None
+    
+    return result, analysis_history.save(result, resume_content, jd_content, target_position, analysis_id)
+
+def load_previous_analysis(data):
+    """
+    读取请求中previous_analysis_id对应的上次分析记录（与Web框架无关，Flask与ASGI模式共用）
+    :return: 分析记录；未提供ID或记录已过期时返回None，此时做完整分析
+    """
+    previous_id = (data or {}).get('previous_analysis_id')
+    if not previous_id:
+        return None
+    previous = analysis_history.get(previous_id)
+    if not previous:
+        print(f"上次分析记录不存在或已过期（{previous_id}），改为完整分析")
+    return previous
+
+@tracing.traced('run_analysis_job')
+def run_analysis_job(job, resume_content, jd_content, target_position, previous=None):
+    """
+    后台执行的分析任务：大模型分析 → 报告渲染
+    :param job: 分析任务对象，用于上报进度
+    :param resume_content: 简历文本内容
+    :param jd_content: 职位JD文本内容
+    :param target_position: 目标岗位
+    :param previous: 上次的分析记录，提供时只重新生成受简历修改影响的部分
+    :return: 任务结果（分析ID、报告ID与报告查看地址）
+    """
+    job.update(stage='analyzing', progress=10)
+    analysis_result, analysis_id = analyze_and_record(
+        resume_content, jd_content, target_position, previous, analysis_id=job.job_id
+    )
+    
+    job.update(stage='rendering', progress=90)
+    return dict(publish_report(job.job_id, analysis_result, target_position), analysis_id=analysis_id)
+
+def publish_report(report_id, analysis_result, target_position, html_content=None):
+    """
+    渲染并保存报告，之后通过 /reports/<报告ID> 查看，不再重复渲染
+    :param report_id: 报告ID
+    :param analysis_result: Markdown分析结果
+    :param target_position: 目标岗位
+    :param html_content: 已渲染的HTML报告，为None时在此渲染
+    :return: 报告ID与查看地址
+    """
+    report = report_store.save(report_id, analysis_result, target_position, html_content)
+    return {'report_id': report.report_id, 'report_url': f'/reports/{report.report_id}'}
+
+def report_response(report, inline=False):
+    """
+    返回已保存的报告：按Accept-Encoding直接返回预压缩内容，支持ETag/Last-Modified条件请求
+    :param report: 已保存的报告
+    :param inline: 是否返回内联样式的独立HTML（用于下载、打印）
+    :return: Flask响应
+    """
+    status, headers, body = report.response(request.headers, inline)
+    return Response(body, status=status, headers=headers)
+
+def parse_analysis_inputs(data):
+    """
+    解析分析请求中的JD、简历内容和目标岗位（与Web框架无关，Flask与ASGI模式共用）
+    :param data: 请求JSON数据
+    :return: ((简历内容, JD内容, 目标岗位), None)，校验失败时返回 (None, 错误提示)
+    """
+    if not data:
+        return None, '请求数据不能为空'
+    
+    target_position = data.get('target_position')
+    jd_file_id = data.get('jd_file_id')
+    resume_file_id = data.get('resume_file_id')
+    jd_text = data.get('jd_text', '')
+    resume_text = data.get('resume_text', '')
+    
+    # 验证数据
+    if not target_position:
+        return None, '请选择目标岗位'
+    
+    # 获取JD内容
+    jd_content = jd_text
+    if jd_file_id:
+        jd_record = temp_store.get(jd_file_id)
+        if not jd_record:
+            return None, 'JD文件ID无效或已过期'
+        jd_content = jd_record['content']
+    
+    # 获取简历内容
+    resume_content = resume_text
+    if resume_file_id:
+        resume_record = temp_store.get(resume_file_id)
+        if not resume_record:
+            return None, '简历文件ID无效或已过期'
+        resume_content = resume_record['content']
+    
+    # 验证内容
+    if not jd_content:
+        return None, '请输入职位JD内容或上传有效的JD文件'
+    if not resume_content:
+        return None, '请输入简历内容或上传有效的简历文件'
+    
+    return (resume_content, jd_content, target_position), None
+
+def resolve_analysis_inputs(data):
+    """
+    解析分析请求中的JD、简历内容和目标岗位
+    :param data: 请求JSON数据
+    :return: ((简历内容, JD内容, 目标岗位), None)，校验失败时返回 (None, 错误响应)
+    """
+    inputs, error = parse_analysis_inputs(data)
+    if error:
+        return None, (jsonify({'error': error}), 400)
+    return inputs, None
+
+def validate_form_inputs(target_position, jd_text, jd_file, jd_content, resume_text, resume_file, resume_content):
+    """
+    校验表单方式提交的分析请求（与Web框架无关，Flask与ASGI模式共用）
+    :param target_position: 目标岗位
+    :param jd_text: 表单中的JD文本
+    :param jd_file: 上传的JD文件（可为None）
+    :param jd_content: JD文件提取出的内容
+    :param resume_text: 表单中的简历文本
+    :param resume_file: 上传的简历文件（可为None）
+    :param resume_content: 简历文件提取出的内容
+    :return: ((简历内容, JD内容, 目标岗位), None)，校验失败时返回 (None, 错误提示)
+    """
+    if not target_position:
+        return None, '请选择目标岗位'
+    if not jd_text and not jd_file:
+        return None, '请输入职位JD内容或上传有效的JD文件'
+    if not resume_text and not resume_file:
+        return None, '请输入简历内容或上传有效的简历文件'
+    # 允许OCR识别失败的情况通过验证，让AI分析来处理这些情况
+    if not jd_content:
+        jd_content = "（OCR识别失败，无法提取JD图像中的文字内容）"
+    if not resume_content:
+        resume_content = "（OCR识别失败，无法提取简历图像中的文字内容）"
+    return (resume_content, jd_content, target_position), None
+
 @app.route('/api/analysis/start', methods=['POST'])
 @rate_limit
 def start_analysis():
     """
     分析初始化接口
-    接收JD文件ID、简历文件ID和目标岗位，启动分析流程
+    接收JD文件ID、简历文件ID和目标岗位，将分析任务入队后立即返回任务ID；
+    提供previous_analysis_id时，只重新生成受简历修改影响的部分
     """
     try:
-        # 获取请求数据
-        data = request.json
-        if not data:
-            return jsonify({'error': '请求数据不能为空'}), 400
-        
-        target_position = data.get('target_position')
-        jd_file_id = data.get('jd_file_id')
-        resume_file_id = data.get('resume_file_id')
-        jd_text = data.get('jd_text', '')
-        resume_text = data.get('resume_text', '')
-        
-        # 验证数据
-        if not target_position:
-            return jsonify({'error': '请选择目标岗位'}), 400
-        
-        # 获取JD内容
-        jd_content = jd_text
-        if jd_file_id:
-            if jd_file_id not in temp_files:
-                return jsonify({'error': 'JD文件ID无效或已过期'}), 400
-            jd_content = temp_files[jd_file_id]['content']
-        
-        # 获取简历内容
-        resume_content = resume_text
-        if resume_file_id:
-            if resume_file_id not in temp_files:
-                return jsonify({'error': '简历文件ID无效或已过期'}), 400
-            resume_content = temp_files[resume_file_id]['content']
+        inputs, error_response = resolve_analysis_inputs(request.json)
+        if error_response:
+            return error_response
+        previous = load_previous_analysis(request.json)
         
-        # 验证内容
-        if not jd_content:
-            return jsonify({'error': '请输入职位JD内容或上传有效的JD文件'}), 400
-        if not resume_content:
-            return jsonify({'error': '请输入简历内容或上传有效的简历文件'}), 400
+        # 分析任务入队，由后台线程池执行
+        try:
+            job = job_manager.submit(run_analysis_job, *inputs, previous=previous)
+        except JobQueueFullError:
+            return jsonify({'code': 503, 'msg': '当前分析任务较多，请稍后重试'}), 503
         
-        # 调用AI分析
-        analysis_result = analyze_resume_with_AI(resume_content, jd_content, target_position)
+        return jsonify({'code': 200, 'data': {'job_id': job.job_id, 'status': job.status}}), 202
+    except Exception as e:
+        # 避免泄露详细错误信息
+        print(f"分析初始化失败：{str(e)}")
+        return jsonify({'code': 500, 'msg': '服务暂时不可用，请稍后重试'})
+
+def sse_event(event, data, event_id=None):
+    """
+    格式化一条Server-Sent Events消息
+    :param event: 事件类型
+    :param data: 事件数据（可JSON序列化）
+    :param event_id: 事件ID，客户端断线重连时通过Last-Event-ID续传
+    :return: SSE消息文本
+    """
+    message = f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+    if event_id is not None:
+        message = f"id: {event_id}\n" + message
+    return message
+
+@app.route('/api/analysis/stream', methods=['POST'])
+@rate_limit
+def stream_analysis():
+    """
+    流式分析接口
+    以Server-Sent Events逐段推送大模型生成的内容（delta事件）及已完成部分渲染出的带样式HTML片段（fragment事件），
+    生成结束后推送分析ID与报告查看地址（done事件）；提供previous_analysis_id时做增量重新分析，结果以单个delta事件推送
+    """
+    try:
+        inputs, error_response = resolve_analysis_inputs(request.json)
+        if error_response:
+            return error_response
+        previous = load_previous_analysis(request.json)
+        if not llm_proxy:
+            return jsonify({'code': 503, 'msg': '服务暂时不可用，请稍后重试'}), 503
+    except Exception as e:
+        print(f"流式分析初始化失败：{str(e)}")
+        return jsonify({'code': 500, 'msg': '服务暂时不可用，请稍后重试'}), 500
+    
+    resume_content, jd_content, target_position = inputs
+    
+    def generate():
+        chunks = []
+        renderer = html_report.IncrementalHTMLRenderer()
+        try:
+            if previous:
+                analysis_result, analysis_id = analyze_and_record(resume_content, jd_content, target_position, previous)
+                yield sse_event('delta', {'text': analysis_result})
+                fragment = renderer.feed(analysis_result)
+                if fragment:
+                    yield sse_event('fragment', {'html': fragment})
+            else:
+                for delta in llm_proxy.analyze_resume_stream(resume_content, jd_content, target_position):
+                    chunks.append(delta)
+                    yield sse_event('delta', {'text': delta})
+                    fragment = renderer.feed(delta)
+                    if fragment:
+                        yield sse_event('fragment', {'html': fragment})
+                analysis_result = ''.join(chunks)
+                analysis_id = analysis_history.save(analysis_result, resume_content, jd_content, target_position)
+            yield sse_event('fragment', {'html': renderer.finish()})
+            
+            report = publish_report(analysis_id or uuid.uuid4().hex, analysis_result, target_position)
+            yield sse_event('done', dict(report, analysis_id=analysis_id))
+        except Exception as e:
+            # 避免泄露详细错误信息
+            print(f"流式分析失败：{str(e)}")
+            yield sse_event('error', {'msg': '服务暂时不可用，请稍后重试'})
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # 禁止反向代理缓冲，保证增量内容及时送达
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+def prepare_batch_inputs(target_position, jd_text, jd_file_id, jd_file, candidates):
+    """
+    解析批量筛选请求：JD整批只提取、规整一次，候选人的文件ID在入队前解析为文本
+    （与Web框架无关，Flask与ASGI模式共用）
+    :param target_position: 目标岗位
+    :param jd_text: JD文本
+    :param jd_file_id: 已上传的JD文件ID
+    :param jd_file: 上传的JD文件（可为None）
+    :param candidates: 候选人列表，每项为包含 file_id / text / file 之一的字典，可附带name
+    :return: ((目标岗位, JD内容, 候选人列表), None)，校验失败时返回 (None, 错误提示)
+    """
+    if not target_position:
+        return None, '请选择目标岗位'
+    
+    # JD只提取和规整一次，整批共用
+    jd_content = jd_text
+    if jd_file_id:
+        jd_record = temp_store.get(jd_file_id)
+        if not jd_record:
+            return None, 'JD文件ID无效或已过期'
+        jd_content = jd_record['content']
+    elif jd_file:
+        jd_content, _ = extract_file_content_cached(jd_file)
+    jd_content = normalize_material(jd_content)
+    if not jd_content:
+        return None, '请输入职位JD内容或上传有效的JD文件'
+    
+    if not candidates:
+        return None, '请至少提供一份简历'
+    if len(candidates) > batch_manager.max_candidates:
+        return None, f'单个批次最多{batch_manager.max_candidates}份简历'
+    
+    resolved = []
+    for index, candidate in enumerate(candidates):
+        if not isinstance(candidate, dict):
+            return None, f'第{index + 1}份简历格式无效'
+        name = candidate.get('name')
+        if candidate.get('file_id'):
+            record = temp_store.get(candidate['file_id'])
+            if not record:
+                return None, f'第{index + 1}份简历的文件ID无效或已过期'
+            resolved.append({'name': name or record.get('filename'), 'text': record['content']})
+        elif candidate.get('file') is not None:
+            resolved.append({'name': name or candidate['file'].filename, 'file': candidate['file']})
+        elif candidate.get('text'):
+            resolved.append({'name': name, 'text': candidate['text']})
+        else:
+            return None, f'第{index + 1}份简历内容为空'
+    
+    return (target_position, jd_content, resolved), None
+
+def load_batch_candidate(candidate):
+    """
+    读取批量筛选中单个候选人的简历文本：上传的文件在此处提取（各候选人并行）
+    :param candidate: 候选人（包含 text 或 file）
+    :return: 规整后的简历文本
+    """
+    if candidate.get('file') is not None:
+        resume_content, _ = extract_file_content_cached(candidate['file'])
+    else:
+        resume_content = candidate.get('text')
+    resume_content = normalize_material(resume_content)
+    if not resume_content:
+        raise ValueError('简历内容为空或无法识别')
+    return resume_content
+
+def analyze_batch_candidate(resume_content, jd_content, target_position):
+    """
+    批量筛选中调用大模型分析单个候选人
+    :param resume_content: 简历文本
+    :param jd_content: 整批共用的JD内容
+    :param target_position: 目标岗位
+    :return: Markdown格式的分析报告
+    """
+    if not llm_proxy:
+        raise RuntimeError("服务暂时不可用，请稍后重试")
+    return llm_proxy.analyze_resume(resume_content, jd_content, target_position, raise_errors=True)
+
+def parse_top_k(value):
+    """
+    解析批量筛选的top_k参数，未提供时使用 BATCH_TOP_K 配置
+    :return: (top_k, None)，top_k为None表示全部分析；参数无效时返回 (None, 错误提示)
+    """
+    if value in (None, ''):
+        return (BATCH_TOP_K or None), None
+    try:
+        top_k = int(value)
+    except (TypeError, ValueError):
+        return None, 'top_k必须为正整数'
+    if top_k < 1:
+        return None, 'top_k必须为正整数'
+    return top_k, None
+
+def rank_batch_candidates(target_position, jd_content, candidates, top_k=None):
+    """
+    仅用本地词法预排序（BM25）对候选人排序，不调用大模型
+    :return: 排名结果与索引延迟统计
+    """
+    names, texts, errors = [], [], []
+    for index, candidate in enumerate(candidates):
+        try:
+            texts.append(load_batch_candidate(candidate))
+            names.append((index, candidate.get('name') or f"候选人{index + 1}"))
+        except Exception as e:
+            # ValueError为输入问题，提示可直接展示；其余异常避免暴露内部细节
+            errors.append({'index': index, 'error': str(e) if isinstance(e, ValueError) else '简历读取失败'})
+    ranked, lexical = rank_texts(jd_content, texts, top_k)
+    ranking = [
+        {'rank': rank, 'index': names[i][0], 'name': names[i][1], 'lexical_score': round(score, 4)}
+        for rank, (i, score) in enumerate(ranked, start=1)
+    ]
+    return {'target_position': target_position, 'total': len(candidates), 'ranking': ranking,
+            'failed': errors, 'lexical': lexical}
+
+def buffer_upload(file):
+    """将上传文件读入内存，使其在请求结束后仍可被后台任务读取"""
+    return FileStorage(stream=io.BytesIO(file.read()), filename=file.filename, content_type=file.content_type)
+
+def read_batch_request():
+    """
+    读取Flask批量筛选请求（JSON或表单）
+    :return: ((目标岗位, JD内容, 候选人列表), top_k, None)，校验失败时返回 (None, None, 错误提示)
+    """
+    if request.mimetype == 'multipart/form-data':
+        fields, jd_file = request.form, request.files.get('jd_file')
+        candidates = [{'file': buffer_upload(f)} for f in request.files.getlist('resume_files') if f and f.filename]
+        candidates += [{'text': text} for text in request.form.getlist('resume_texts') if text.strip()]
+    else:
+        fields, jd_file = request.get_json(silent=True) or {}, None
+        # JSON请求只接受文件ID和文本
+        candidates = [
+            {key: c.get(key) for key in ('name', 'file_id', 'text')} if isinstance(c, dict) else c
+            for c in (fields.get('candidates') or [])
+        ]
+    top_k, error = parse_top_k(fields.get('top_k'))
+    if error:
+        return None, None, error
+    inputs, error = prepare_batch_inputs(
+        fields.get('target_position'), fields.get('jd_text', ''), fields.get('jd_file_id'), jd_file, candidates
+    )
+    return inputs, top_k, error
+
+@app.route('/api/batch/start', methods=['POST'])
+@rate_limit(cost=BATCH_RATE_COST)
+def start_batch():
+    """
+    批量筛选接口
+    接收一个JD和多份简历（JSON：candidates为文件ID/文本列表；表单：resume_files为多个文件），
+    入队后立即返回批次ID，结果通过批次查询接口或事件流获取；指定top_k时只分析词法预排序的前K名
+    """
+    try:
+        inputs, top_k, error = read_batch_request()
+        if error:
+            return jsonify({'error': error}), 400
         
-        # 生成HTML报告
-        html_content = html_report.markdown_to_html(analysis_result, target_position)
+        try:
+            batch = batch_manager.submit(*inputs, load_batch_candidate, analyze_batch_candidate, top_k=top_k)
+        except BatchLimitError as e:
+            return jsonify({'error': str(e)}), 400
+        except BatchQueueFullError:
+            return jsonify({'code': 503, 'msg': '当前批量筛选任务较多，请稍后重试'}), 503
         
-        return jsonify({'code': 200, 'data': {'report': html_content}})
+        return jsonify({'code': 200, 'data': {
+            'batch_id': batch.batch_id, 'status': batch.status, 'total': len(batch.candidates)
+        }}), 202
     except Exception as e:
         # 避免泄露详细错误信息
-        print(f"分析初始化失败：{str(e)}")
+        print(f"批量筛选初始化失败：{str(e)}")
+        return jsonify({'code': 500, 'msg': '服务暂时不可用，请稍后重试'})
+
+@app.route('/api/batch/rank', methods=['POST'])
+@rate_limit
+def rank_batch():
+    """
+    批量预排序接口
+    参数与批量筛选接口相同，仅用本地BM25打分同步返回排名（可用top_k截取前K名），不调用大模型
+    """
+    try:
+        inputs, top_k, error = read_batch_request()
+        if error:
+            return jsonify({'error': error}), 400
+        return jsonify({'code': 200, 'data': rank_batch_candidates(*inputs, top_k=top_k)})
+    except Exception as e:
+        # 避免泄露详细错误信息
+        print(f"批量预排序失败：{str(e)}")
         return jsonify({'code': 500, 'msg': '服务暂时不可用，请稍后重试'})
 
+@app.route('/api/batch/<batch_id>', methods=['GET'])
+def get_batch(batch_id):
+    """
+    批量筛选查询接口
+    返回批次进度、各候选人状态与评分，以及按整体评分排序的排名
+    """
+    batch = batch_manager.get(batch_id)
+    if not batch:
+        return jsonify({'code': 404, 'msg': '批量筛选任务不存在或已过期'}), 404
+    return jsonify({'code': 200, 'data': batch.to_dict()})
+
+def last_event_id(default=-1):
+    """读取SSE续传位置（Last-Event-ID请求头或after参数）"""
+    value = request.headers.get('Last-Event-ID') or request.args.get('after')
+    try:
+        return int(value) if value is not None else default
+    except ValueError:
+        return default
+
+@app.route('/api/batch/<batch_id>/stream', methods=['GET'])
+def stream_batch(batch_id):
+    """
+    批量筛选事件流
+    每完成一位候选人推送一条candidate事件，全部完成后推送summary事件（包含排名）；支持断线续传
+    """
+    batch = batch_manager.get(batch_id)
+    if not batch:
+        return jsonify({'code': 404, 'msg': '批量筛选任务不存在或已过期'}), 404
+    after = last_event_id()
+    
+    def generate():
+        last = after
+        while True:
+            events = batch.wait_events(last, timeout=15)
+            if not events:
+                if batch.finished:
+                    return
+                # 保持连接，避免代理因空闲断开
+                yield ": keep-alive\n\n"
+                continue
+            for event_id, event, data in events:
+                last = event_id
+                yield sse_event(event, data, event_id)
+                if event == 'summary':
+                    return
+    
+    response = Response(stream_with_context(generate()), mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # 禁止反向代理缓冲，保证增量内容及时送达
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/api/batch/<batch_id>/candidates/<int:index>', methods=['GET'])
+def get_batch_candidate(batch_id, index):
+    """
+    批量筛选单个候选人报告接口
+    返回该候选人的HTML分析报告，首次查看时渲染并保存，之后直接返回已保存的报告
+    """
+    batch = batch_manager.get(batch_id)
+    candidate = batch.candidate(index) if batch else None
+    if not candidate:
+        return jsonify({'code': 404, 'msg': '候选人不存在或批量筛选任务已过期'}), 404
+    if candidate['status'] == CANDIDATE_FAILED:
+        return jsonify({'code': 500, 'msg': candidate['error']}), 500
+    if candidate['status'] != CANDIDATE_SUCCEEDED:
+        candidate.pop('report', None)
+        return jsonify({'code': 202, 'data': candidate}), 202
+    
+    report_id = f"{batch_id}-{index}"
+    report = report_store.get(report_id) or report_store.save(report_id, candidate['report'], batch.target_position)
+    return report_response(report, inline=True)
+
+@app.route('/api/analysis/<job_id>', methods=['GET'])
+def get_analysis(job_id):
+    """
+    分析任务查询接口
+    返回任务状态、进度，任务完成后一并返回分析结果
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'code': 404, 'msg': '分析任务不存在或已过期'}), 404
+    return jsonify({'code': 200, 'data': job.to_dict()})
+
+@app.route('/api/analysis/<job_id>/result', methods=['GET'])
+def get_analysis_result(job_id):
+    """
+    分析结果接口
+    任务完成后直接返回HTML报告
+    """
+    job = job_manager.get(job_id)
+    if not job:
+        return jsonify({'code': 404, 'msg': '分析任务不存在或已过期'}), 404
+    if job.status == JOB_FAILED:
+        return jsonify({'code': 500, 'msg': job.error}), 500
+    if not job.finished:
+        return jsonify({'code': 202, 'data': job.to_dict(include_result=False)}), 202
+    
+    report = report_store.get(job.result['report_id'])
+    if not report:
+        return jsonify({'code': 404, 'msg': '报告不存在或已过期'}), 404
+    return report_response(report, inline=True)
+
+@app.route('/reports/<report_id>', methods=['GET'])
+def view_report(report_id):
+    """
+    报告查看接口
+    按报告ID返回已保存的HTML报告，可作为分享链接反复打开；?inline=1 时返回内联样式的独立HTML
+    """
+    report = report_store.get(report_id)
+    if not report:
+        return jsonify({'code': 404, 'msg': '报告不存在或已过期'}), 404
+    return report_response(report, inline=request.args.get('inline') == '1')
+
+@app.route('/api/cache/stats', methods=['GET'])
+def cache_stats():
+    """
+    缓存统计接口
+    返回分析结果缓存、文件提取缓存的命中/未命中与容量信息
+    """
+    stats = {}
+    if llm_proxy and llm_proxy.cache is not None:
+        stats['llm_results'] = llm_proxy.cache.stats()
+    stats['extraction'] = extraction_cache.stats()
+    stats['temp_files'] = temp_store.stats()
+    stats['analysis_history'] = analysis_history.stats()
+    stats['reports'] = report_store.stats()
+    return jsonify({'code': 200, 'data': stats})
+
+@app.route('/api/ocr/stats', methods=['GET'])
+def ocr_stats():
+    """
+    OCR引擎统计接口
+    返回各OCR后端的模型加载耗时与识别调用耗时
+    """
+    return jsonify({'code': 200, 'data': ocr_engines.stats()})
+
+@app.route('/api/llm/stats', methods=['GET'])
+def llm_stats():
+    """
+    大模型调用统计接口
+    返回并发上限、重试次数、超时次数与熔断器状态
+    """
+    if not llm_proxy:
+        return jsonify({'code': 503, 'msg': '服务暂时不可用，请稍后重试'}), 503
+    return jsonify({'code': 200, 'data': llm_proxy.llm.stats()})
+
+@app.route('/api/ratelimit/stats', methods=['GET'])
+def rate_limit_stats():
+    """
+    限流统计接口
+    返回限流器的配额配置、放行/拒绝次数与当前跟踪的客户端数
+    """
+    return jsonify({'code': 200, 'data': rate_limiter.stats()})
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """
+    指标接口
+    以Prometheus文本格式返回各阶段耗时直方图、大模型token用量与SLO超限计数
+    """
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
 @app.route('/analyze/html', methods=['POST'])
 @rate_limit
 def analyze_html():
@@ -439,7 +1075,7 @@ def analyze_html():
         jd_content = jd_text
         
         if jd_file:
-            jd_content = extract_file_content(jd_file)
+            jd_content, _ = extract_file_content_cached(jd_file)
         
         # 获取简历内容
         resume_text = request.form.get('resume_text', '')
@@ -447,20 +1083,14 @@ def analyze_html():
         resume_content = resume_text
         
         if resume_file:
-            resume_content = extract_file_content(resume_file)
+            resume_content, _ = extract_file_content_cached(resume_file)
         
         # 验证数据
-        if not target_position:
-            return jsonify({'error': '请选择目标岗位'}), 400
-        if not jd_text and not jd_file:
-            return jsonify({'error': '请输入职位JD内容或上传有效的JD文件'}), 400
-        if not resume_text and not resume_file:
-            return jsonify({'error': '请输入简历内容或上传有效的简历文件'}), 400
-        # 允许OCR识别失败的情况通过验证，让AI分析来处理这些情况
-        if not jd_content:
-            jd_content = "（OCR识别失败，无法提取JD图像中的文字内容）"
-        if not resume_content:
-            resume_content = "（OCR识别失败，无法提取简历图像中的文字内容）"
+        inputs, error = validate_form_inputs(target_position, jd_text, jd_file, jd_content,
+                                             resume_text, resume_file, resume_content)
+        if error:
+            return jsonify({'error': error}), 400
+        resume_content, jd_content, target_position = inputs
         
         # 调用AI分析
         analysis_result = analyze_resume_with_AI(resume_content, jd_content, target_position)
@@ -485,4 +1115,9 @@ if __name__ == '__main__':
     print(f"\n请在浏览器中访问: http://localhost:{port}")
     print(f"\n按 Ctrl+C 停止服务器")
     print(f"================================\n")
+    
+    # 后台预热OCR模型，避免首个请求承担模型加载耗时
+    if OCR_WARMUP:
+        ocr_engines.warmup_in_background(OCR_WARMUP)
+    
     app.run(host='0.0.0.0', port=port, debug=False)
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+文件内容提取缓存
+以上传文件字节的SHA-256（结合提取器版本与OCR语言）为键缓存提取出的文本，
+重复上传同一文件时跳过PDF解析与OCR，并统计节省的字节数与提取耗时
+"""
+
+import os
+import time
+import hashlib
+import threading
+from typing import Optional, Dict, Any, Callable, Tuple
+
+from cache_store import MemoryLRUCache, make_cache_key
+
+
+class PartialContent(str):
+    """不完整的提取结果（如PDF部分扫描页OCR超时或失败），可以正常使用，但不写入缓存"""
+
+
+def _is_status_message(content) -> bool:
+    # 提取失败时返回的是形如「（...）」的提示信息，这类结果依赖运行环境，不做缓存
+    return isinstance(content, str) and content.startswith('（') and content.endswith('）')
+
+
+class ExtractionCache:
+    """内容寻址的提取结果缓存"""
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024, ttl: Optional[float] = None):
+        """
+        初始化缓存
+
+        Args:
+            max_bytes: 缓存文本的总字节数上限
+            ttl: 条目存活时间（秒），None表示永不过期
+        """
+        self._entries = MemoryLRUCache(
+            max_entries=None,
+            max_bytes=max_bytes,
+            ttl=ttl,
+            sizeof=lambda entry: len(entry['content'].encode('utf-8'))
+        )
+        self._lock = threading.Lock()
+        self.bytes_saved = 0
+        self.seconds_saved = 0.0
+
+    @staticmethod
+    def make_key(data: bytes, filename: str, extractor_version: str, ocr_languages: str) -> str:
+        """
+        计算缓存键
+
+        Args:
+            data: 文件字节内容
+            filename: 文件名（提取方式取决于扩展名）
+            extractor_version: 提取器版本
+            ocr_languages: OCR识别语言
+
+        Returns:
+            缓存键
+        """
+        extension = os.path.splitext(filename or '')[1].lower()
+        return make_cache_key(
+            hashlib.sha256(data).hexdigest(),
+            extension,
+            extractor_version,
+            ocr_languages
+        )
+
+    def extract(self, file, extractor: Callable, extractor_version: str,
+                ocr_languages: str) -> Tuple[Optional[str], Optional[Dict[str, Any]], bool]:
+        """
+        读取文件内容，命中缓存时直接返回，否则调用提取函数并写入缓存
+
+        Args:
+            file: 上传的文件对象
+            extractor: 实际的内容提取函数
+            extractor_version: 提取器版本
+            ocr_languages: OCR识别语言
+
+        Returns:
+            (提取的文本, 缓存条目（结果不可缓存时为None）, 是否命中缓存)
+        """
+        data = file.read()
+        file.seek(0)
+        key = self.make_key(data, file.filename, extractor_version, ocr_languages)
+
+        entry = self._entries.get(key)
+        if entry is not None:
+            with self._lock:
+                self.bytes_saved += len(data)
+                self.seconds_saved += entry['elapsed']
+            return entry['content'], entry, True
+
+        start = time.perf_counter()
+        content = extractor(file)
+        elapsed = time.perf_counter() - start
+
+        if not isinstance(content, str) or isinstance(content, PartialContent) or _is_status_message(content):
+            return content, None, False
+
+        # file_id 记录该内容最近一次签发的临时文件ID，重复上传时可直接复用
+        entry = {'content': content, 'elapsed': elapsed, 'file_id': None}
+        self._entries.set(key, entry)
+        return content, entry, False
+
+    def stats(self) -> Dict[str, Any]:
+        data = self._entries.stats()
+        with self._lock:
+            data['bytes_saved'] = self.bytes_saved
+            data['seconds_saved'] = round(self.seconds_saved, 3)
+        return data
+
+
+# 创建全局提取缓存
+extraction_cache = ExtractionCache(
+    max_bytes=int(os.getenv('EXTRACTION_CACHE_MAX_BYTES', 64 * 1024 * 1024)),
+    ttl=float(os.getenv('EXTRACTION_CACHE_TTL', 24 * 3600))
+)
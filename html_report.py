@@ -1,6 +1,16 @@
+import os
+import re
+import uuid
+import hashlib
+import threading
 import markdown
+from markdown.treeprocessors import Treeprocessor
+from markdown.util import AtomicString
 from datetime import datetime
 
+import metrics
+import tracing
+
 # 定义语义化、简洁高级的HTML模板
 HTML_TEMPLATE = """
 <!DOCTYPE html>
@@ -378,120 +388,449 @@ HTML_TEMPLATE = """
 </html>
 """
 
-def markdown_to_html(markdown_content, target_position):
+# Markdown扩展，使用更全面的扩展集
+MARKDOWN_EXTENSIONS = [
+    'tables',
+    'fenced_code',
+    'nl2br',
+    'attr_list',
+    'codehilite',
+    'sane_lists',
+    'md_in_html'
+]
+
+# 主要板块标题，渲染时添加语义化section标签
+REPORT_SECTIONS = [
+    "一、评分与分析理由板块",
+    "二、对照岗位 JD 逐条修改简历板块",
+    "三、面试可能问的问题板块",
+    "四、职业发展路径板块",
+    "五、结语建议板块"
+]
+
+# 职业发展路径的时间阶段
+CAREER_PHASES = [
+    '短期 (1-3年)',
+    '中期 (3-5年)',
+    '长期 (5年以上)'
+]
+
+_SCORE_HEADING = '<h3>1. 整体评分</h3>'
+_EVALUATION_HEADING = '<h3>2. 综合评价</h3>'
+_GAP_HEADING = '<h3>4. 主要差距总结</h3>'
+_HIGHLIGHT_OPEN = '<div class="highlight">'
+
+# 固定的替换项：标记符号、板块标题、评分/差距标题与职业阶段标题
+_REPLACEMENTS = {
+    '⚠️': '<span class="warning">⚠️</span>',
+    '✅': '<span class="checkmark">✅</span>',
+    _SCORE_HEADING: '<div class="score-section"><h3 class="score-label">1. 整体评分</h3>',
+    _GAP_HEADING: '<div class="alert-warning"><h3 style="margin-top: 0;">4. 主要差距总结</h3>',
+}
+for _section in REPORT_SECTIONS:
+    _REPLACEMENTS[f'<h2>{_section}</h2>'] = f'<section><h2>{_section}</h2>'
+for _phase in CAREER_PHASES:
+    _REPLACEMENTS[f'<h3>{_phase}</h3>'] = (
+        f'<h3 style="color: #667eea; border-left: 4px solid #667eea; padding-left: 16px;">{_phase}</h3>'
+    )
+
+# 单次扫描的后处理模式：先匹配完整标题，再匹配综合评价之后的第一个 <h3> 或 <h2>
+_POSTPROCESS_PATTERN = re.compile('|'.join(
+    re.escape(token) for token in sorted(list(_REPLACEMENTS) + [_EVALUATION_HEADING], key=len, reverse=True)
+) + '|<h3>|<h2>')
+
+# 预先拆分HTML模板，渲染时只做一次拼接
+_TEMPLATE_HEAD, _rest = HTML_TEMPLATE.split('{target_position}', 1)
+_TEMPLATE_SUBTITLE, _rest = _rest.split('{{ date }}', 1)
+_TEMPLATE_DATE, _TEMPLATE_TAIL = _rest.split('{{ content }}', 1)
+
+# 报告样式表；外链模式下作为共享的静态资源提供，文件名带内容指纹，样式修改后自动使用新地址
+_TEMPLATE_BEFORE_STYLE, _rest = _TEMPLATE_HEAD.split('<style>', 1)
+REPORT_CSS, _TEMPLATE_AFTER_STYLE = _rest.split('</style>', 1)
+REPORT_CSS_NAME = f"report.{hashlib.sha256(REPORT_CSS.encode('utf-8')).hexdigest()[:12]}.css"
+
+# 可能触发行内语法（强调、代码、链接、HTML、实体、换行、转义及占位符）的字符
+_INLINE_TRIGGERS = re.compile(r'[\\`*_\[\]!<>&\n\x02\x03]')
+
+
+class _PlainTextTreeprocessor(Treeprocessor):
+    """
+    行内处理前运行：不含任何行内语法字符的文本（如大部分表格单元格）标记为AtomicString，
+    跳过逐个行内模式的匹配，输出与完整处理相同
+    """
+
+    def run(self, root):
+        for element in root.iter():
+            text = element.text
+            if text and not isinstance(text, AtomicString) and not _INLINE_TRIGGERS.search(text):
+                element.text = AtomicString(text)
+
+
+# 每个线程复用一个Markdown转换器，避免每次渲染重新加载扩展
+_local = threading.local()
+
+
+def _markdown_converter() -> markdown.Markdown:
+    converter = getattr(_local, 'converter', None)
+    if converter is None:
+        converter = _local.converter = markdown.Markdown(extensions=MARKDOWN_EXTENSIONS)
+        # 优先级高于行内处理器（20）
+        converter.treeprocessors.register(_PlainTextTreeprocessor(converter), 'plain_text', 25)
+    return converter
+
+
+class _Postprocessor:
+    """
+    报告的格式后处理：标记符号样式、板块section标签、评分与差距总结样式、
+    综合评价高亮（包裹到其后第一个三级标题或下一个板块标题之前，不跨越section）以及职业发展阶段标题样式。
+    高亮状态跨多次调用保留，流式渲染时可逐段处理HTML片段
+    """
+
+    def __init__(self):
+        self.highlight_open = False
+        self.highlight_done = False
+
+    def feed(self, html_content):
+        return _POSTPROCESS_PATTERN.sub(self._replace, html_content)
+
+    def _replace(self, match):
+        token = match.group()
+        if token == _EVALUATION_HEADING and not self.highlight_open and not self.highlight_done:
+            self.highlight_open = True
+            return token + _HIGHLIGHT_OPEN
+        prefix = ''
+        if self.highlight_open and (token.startswith('<h2>') or token.startswith('<h3>') and token != _SCORE_HEADING):
+            prefix = '</div>'
+            self.highlight_open = False
+            self.highlight_done = True
+        return prefix + _REPLACEMENTS.get(token, token)
+
+
+def _drop_highlight(html_content):
+    # 综合评价之后没有任何标题时不添加高亮
+    return html_content.replace(_EVALUATION_HEADING + _HIGHLIGHT_OPEN, _EVALUATION_HEADING, 1)
+
+
+def _postprocess(html_content):
+    """单次扫描完成完整报告的格式后处理"""
+    processor = _Postprocessor()
+    html_content = processor.feed(html_content)
+    if processor.highlight_open:
+        html_content = _drop_highlight(html_content)
+    # 关闭所有section标签
+    return html_content + '</section>' * len(REPORT_SECTIONS)
+
+
+def _stylesheet_link(stylesheet_url):
+    return f'<link rel="stylesheet" href="{stylesheet_url}">'
+
+
+@metrics.timed('render')
+@tracing.traced('markdown_to_html')
+def markdown_to_html(markdown_content, target_position, stylesheet_url=None):
     """
     将Markdown格式的简历分析报告转换为HTML格式
     
     Args:
         markdown_content: 生成的Markdown格式分析报告
         target_position: 目标岗位，用于在报告标题中显示 
+        stylesheet_url: 共享样式表地址，提供时引用外部样式表而不内联样式（在线查看时浏览器只需下载一次样式表）
         
     Returns:
         html_content: 转换后的HTML格式分析报告
     """
-    # 配置Markdown扩展，使用更全面的扩展集
-    extensions = [
-        'tables',
-        'fenced_code',
-        'nl2br',
-        'attr_list',
-        'codehilite',
-        'sane_lists',
-        'md_in_html'
-    ]
-    
     # 转换Markdown到HTML
-    html_content = markdown.markdown(markdown_content, extensions=extensions)
+    html_content = _markdown_converter().reset().convert(markdown_content)
     
     # 自定义处理特定的格式标记
-    html_content = html_content.replace('⚠️', '<span class="warning">⚠️</span>')
-    html_content = html_content.replace('✅', '<span class="checkmark">✅</span>')
-    
-    # 为主要板块添加语义化section标签
-    sections = [
-        "一、评分与分析理由板块",
-        "二、对照岗位 JD 逐条修改简历板块",
-        "三、面试可能问的问题板块",
-        "四、职业发展路径板块",
-        "五、结语建议板块"
-    ]
-    
-    for section in sections:
-        html_content = html_content.replace(
-            f'<h2>{section}</h2>', 
-            f'<section><h2>{section}</h2>'
-        )
-    
-    # 关闭所有section标签
-    html_content = html_content + '</section>' * len(sections)
-    
-    # 为评分部分添加特殊样式
-    html_content = html_content.replace(
-        '<h3>1. 整体评分</h3>',
-        '<div class="score-section"><h3 class="score-label">1. 整体评分</h3>'
-    )
-    html_content = html_content.replace(
-        '</div>',
-        '</div>',
-        1  # 只替换第一个匹配项
-    )
-    
-    # 为综合评价添加高亮样式
-    if '<h3>2. 综合评价</h3>' in html_content:
-        # 找到综合评价的起始和结束位置
-        start_idx = html_content.find('<h3>2. 综合评价</h3>') + len('<h3>2. 综合评价</h3>')
-        next_h3_idx = html_content.find('<h3>', start_idx)
-        if next_h3_idx != -1:
-            # 提取综合评价内容
-            eval_content = html_content[start_idx:next_h3_idx]
-            # 包裹高亮样式
-            highlighted_eval = f'<div class="highlight">{eval_content}</div>'
-            # 替换原内容
-            html_content = html_content[:start_idx] + highlighted_eval + html_content[next_h3_idx:]
-    
-    # 处理差距总结部分，添加警告样式
-    html_content = html_content.replace(
-        '<h3>4. 主要差距总结</h3>',
-        '<div class="alert-warning"><h3 style="margin-top: 0;">4. 主要差距总结</h3>'
-    )
-    html_content = html_content.replace(
-        '</div>',
-        '</div>',
-        1  # 只替换第一个匹配项
-    )
-    
-    # 为职业发展路径的时间阶段添加特殊样式
-    career_phases = [
-        '短期 (1-3年)',
-        '中期 (3-5年)',
-        '长期 (5年以上)'
-    ]
-    
-    for phase in career_phases:
-        html_content = html_content.replace(
-            f'<h3>{phase}</h3>',
-            f'<h3 style="color: #667eea; border-left: 4px solid #667eea; padding-left: 16px;">{phase}</h3>'
-        )
+    html_content = _postprocess(html_content)
     
     # 填充HTML模板
     today = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-    final_html = HTML_TEMPLATE.replace('{target_position}', target_position)
-    final_html = final_html.replace('{{ content }}', html_content)
-    final_html = final_html.replace('{{ date }}', today)
+    if '{{ date }}' in html_content:
+        html_content = html_content.replace('{{ date }}', today)
+    if stylesheet_url:
+        head = _TEMPLATE_BEFORE_STYLE + _stylesheet_link(stylesheet_url) + _TEMPLATE_AFTER_STYLE
+    else:
+        head = _TEMPLATE_HEAD
+    return ''.join((
+        head, target_position.replace('{{ date }}', today), _TEMPLATE_SUBTITLE, today,
+        _TEMPLATE_DATE, html_content, _TEMPLATE_TAIL
+    ))
+
+
+def inline_stylesheet(html_content, stylesheet_url):
+    """
+    将引用外部样式表的报告转换为内联样式的独立HTML（用于下载、打印等离线场景）
     
-    return final_html
+    Args:
+        html_content: 以 stylesheet_url 渲染的HTML报告
+        stylesheet_url: 报告引用的样式表地址
+        
+    Returns:
+        内联样式的HTML报告；报告未引用该样式表时原样返回
+    """
+    return html_content.replace(_stylesheet_link(stylesheet_url), f'<style>{REPORT_CSS}</style>', 1)
+
+# 流式渲染时的行类型判断（与Python-Markdown块处理器的判定规则一致）
+_HEADING_LINE = re.compile(r'^#{1,6}')
+_SETEXT_LINE = re.compile(r'^[=-]+[ ]*$')
+_HR_LINE = re.compile(r'^[ ]{0,3}(?:(?:-[ ]{0,2}){3,}|(?:_[ ]{0,2}){3,}|(?:\*[ ]{0,2}){3,})$')
+_FENCE_LINE = re.compile(r'^(`{3,}|~{3,})')
+_LIST_LINE = re.compile(r'^[ ]{0,3}(?:[*+-]|\d+\.)[ ]+')
+
+
+class IncrementalHTMLRenderer:
+    """
+    流式Markdown渲染器：逐段接收大模型生成的Markdown，只输出已经完整、后续内容不会再改变其渲染结果的块
+    （标题、段落、列表、代码块及表格的逐行），未完成的块留在缓冲区中。
+    输出的HTML片段依次拼接后与 markdown_to_html 的正文部分一致（包括板块、评分、高亮与警告样式），
+    前端可以边生成边展示带样式的报告，而不必在每个token到达时重新渲染整份报告。
+    综合评价之后的内容要等到下一个标题出现（确定是否添加高亮）后才一并输出
+    """
+
+    def __init__(self):
+        self._postprocessor = _Postprocessor()
+        self._today = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        # 尚未构成完整行的文本
+        self._partial = ''
+        # 当前块的行、块类型（paragraph / list / quote / code / fence / table / rule）、块后连续空行数、
+        # 最后一个空行之后的行数及是否处于列表项的缩进续行中
+        self._lines = []
+        self._kind = None
+        self._blank = 0
+        self._chunk = 0
+        self._nested = False
+        self._fence = None
+        # 表格的表头与分隔行（用于逐行渲染数据行）、已输出的数据行数及标题行是否属于表格
+        self._table_header = None
+        self._table_rows = 0
+        self._table_headings = False
+        # 最后一个空行或标题之后的行数
+        self._raw = 0
+        self._fragments = []
+        # 综合评价高亮尚未闭合时暂缓输出的片段
+        self._held = []
+
+    @property
+    def html(self):
+        """到目前为止已输出的HTML"""
+        return '\n'.join(self._fragments)
+
+    def feed(self, chunk):
+        """
+        追加一段Markdown文本
+
+        Args:
+            chunk: 新生成的Markdown文本
+
+        Returns:
+            新完成部分的HTML片段，没有新完成的块时为空字符串
+        """
+        self._partial += chunk.replace('\r\n', '\n').replace('\r', '\n')
+        if '\n' not in self._partial:
+            return ''
+        *lines, self._partial = self._partial.split('\n')
+        start = len(self._fragments)
+        for line in lines:
+            self._feed_line(line)
+        return '\n'.join(self._fragments[start:])
+
+    def finish(self):
+        """
+        输入结束，输出缓冲区中剩余的内容并闭合section标签
+
+        Returns:
+            剩余部分的HTML片段
+        """
+        start = len(self._fragments)
+        if self._partial:
+            self._feed_line(self._partial)
+            self._partial = ''
+        self._flush()
+        if self._postprocessor.highlight_open:
+            # 与完整渲染一致：综合评价之后没有任何标题时去掉暂缓输出部分中的高亮
+            self._postprocessor.highlight_open = False
+            self._fragments.append(_drop_highlight('\n'.join(self._held)))
+            self._held = []
+        self._fragments.append('</section>' * len(REPORT_SECTIONS))
+        return '\n'.join(self._fragments[start:])
+
+    def _feed_line(self, line):
+        if self._kind == 'fence':
+            self._append(line)
+            if line.rstrip(' ') == self._fence:
+                self._flush()
+            return
+
+        if self._kind == 'table':
+            # 表格持续到空行为止，其间每一行（包括从段落开头开始的表格中的标题行）都是数据行
+            if line.strip() and (self._table_headings or not _HEADING_LINE.match(line)):
+                self._table_rows += 1
+                self._emit(self._table_row(line))
+                return
+            self._flush()
+
+        if not line.strip():
+            self._raw = 0
+            if self._kind in ('list', 'quote', 'code'):
+                # 空行后的内容仍可能并入当前列表/引用/代码块，等看到下一行再决定
+                self._blank += 1
+                self._chunk = 0
+                self._nested = False
+            else:
+                self._flush()
+            return
+
+        if self._blank:
+            if not self._continues(line):
+                self._flush()
+            else:
+                self._lines.extend([''] * self._blank)
+                self._blank = 0
+                # 空行后缩进的行属于列表项，其中的标题、分隔线等都在列表项内部解析
+                self._nested = self._kind == 'list' and line.startswith(('    ', '\t'))
+        elif self._kind == 'rule' and not _SETEXT_LINE.match(line):
+            self._flush()
+        elif self._kind == 'code' and not line.startswith(('    ', '\t')):
+            # 缩进代码块在第一个非缩进行处结束，位于段落开头的代码块之后的内容按新段落解析
+            fresh = self._raw == self._chunk
+            self._flush()
+            if fresh:
+                self._raw = 0
+
+        self._raw += 1
+        if self._nested:
+            self._append(line)
+            return
+
+        fence = _FENCE_LINE.match(line)
+        if fence:
+            self._flush()
+            self._kind, self._fence = 'fence', fence.group(1)
+            self._append(line)
+        elif _HEADING_LINE.match(line):
+            self._flush()
+            self._emit(self._render(line))
+            self._raw = 0
+        elif _SETEXT_LINE.match(line) and self._chunk == 1 and self._kind != 'code':
+            # 段落首行加下划线构成标题
+            self._append(line)
+            self._flush()
+        elif _HR_LINE.match(line):
+            inside = self._chunk
+            self._flush()
+            if inside:
+                self._emit(self._render(line))
+            else:
+                # 位于段落开头的分隔线与下一行的下划线合起来构成标题，等看到下一行再输出
+                self._kind = 'rule'
+                self._append(line)
+        elif not self._lines:
+            self._kind = self._line_kind(line)
+            self._append(line)
+        elif self._chunk == 1 and self._kind == 'paragraph' and '|' in self._lines[0] and self._start_table(line):
+            pass
+        else:
+            if self._kind == 'paragraph' and self._line_kind(line) == 'quote':
+                # 引用会吞并其后的所有行，块的结尾变为引用，空行后的引用还会并入其中
+                self._kind = 'quote'
+            self._append(line)
+
+    def _append(self, line):
+        self._lines.append(line)
+        self._chunk += 1
+
+    def _continues(self, line):
+        """空行后的行是否仍属于当前块"""
+        if self._kind in ('list', 'code') and line.startswith(('    ', '\t')):
+            return True
+        return self._kind != 'code' and self._line_kind(line) == self._kind
+
+    @staticmethod
+    def _line_kind(line):
+        if line[:1] in (' ', '\t') and not _LIST_LINE.match(line):
+            return 'code' if line.startswith(('    ', '\t')) else 'paragraph'
+        if _LIST_LINE.match(line):
+            return 'list'
+        if line.lstrip().startswith('>'):
+            return 'quote'
+        return 'paragraph'
+
+    def _start_table(self, separator):
+        """第二行为分隔行时进入表格模式并输出表头"""
+        header = self._lines[0]
+        html_content = self._render(f'{header}\n{separator}')
+        if not html_content.startswith('<table>'):
+            return False
+        self._kind = 'table'
+        self._table_header = f'{header}\n{separator}'
+        self._table_rows = 0
+        # 表头位于段落开头（空行或标题之后）时，表格优先于标题解析，其后的标题行也是数据行
+        self._table_headings = self._raw == 2
+        self._emit(html_content[:html_content.index('<tbody>') + len('<tbody>')])
+        return True
+
+    def _table_row(self, line):
+        html_content = self._render(self._table_header if line is None else f'{self._table_header}\n{line}')
+        start = html_content.index('<tbody>') + len('<tbody>')
+        end = html_content.rindex('</tbody>')
+        return html_content[start:end].strip('\n')
+
+    def _flush(self):
+        """输出当前块并清空缓冲区"""
+        if self._kind == 'table':
+            if not self._table_rows:
+                # 没有数据行的表格渲染为一个空行
+                self._emit(self._table_row(None))
+            self._emit('</tbody>\n</table>')
+        elif self._lines:
+            self._emit(self._render('\n'.join(self._lines)))
+        self._lines = []
+        self._kind = None
+        self._blank = 0
+        self._chunk = 0
+        self._nested = False
+        self._fence = None
+        self._table_header = None
+
+    def _emit(self, html_content):
+        html_content = html_content.strip('\n')
+        if not html_content:
+            return
+        html_content = self._postprocessor.feed(html_content)
+        if '{{ date }}' in html_content:
+            html_content = html_content.replace('{{ date }}', self._today)
+        if self._postprocessor.highlight_open:
+            self._held.append(html_content)
+            return
+        if self._held:
+            html_content = '\n'.join(self._held + [html_content])
+            self._held = []
+        self._fragments.append(html_content)
+
+    @staticmethod
+    def _render(text):
+        return _markdown_converter().reset().convert(text)
+
 
-def save_html_report(html_content, filename="resume_analysis_report.html"):
+def save_html_report(html_content, filename=None):
     """
     将HTML内容保存为文件
     
     Args:
         html_content: HTML格式的分析报告
-        filename: 保存的文件名，默认为resume_analysis_report.html
+        filename: 保存的文件名，默认按时间和随机后缀生成 resume_analysis_report_<时间>_<后缀>.html，
+            避免并发保存时互相覆盖
         
     Returns:
         filename: 保存的文件名
     """
-    with open(filename, 'w', encoding='utf-8') as f:
+    if filename is None:
+        filename = f"resume_analysis_report_{datetime.now().strftime('%Y%m%d%H%M%S')}_{uuid.uuid4().hex[:8]}.html"
+    # 先写入临时文件再替换，读取方不会看到写了一半的报告
+    temp_name = f"{filename}.{uuid.uuid4().hex}.tmp"
+    with open(temp_name, 'w', encoding='utf-8') as f:
         f.write(html_content)
+    os.replace(temp_name, filename)
     return filename
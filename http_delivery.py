@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+HTTP内容分发
+压缩编码协商、ETag/Last-Modified条件请求与缓存头，以及预压缩的静态资源：
+静态资源只在内容变化时压缩一次（或直接使用构建时生成的 .br/.gz 文件），按内容摘要生成强ETag，
+带内容指纹的资源（如报告样式表）可被浏览器长期缓存
+
+用法（构建时预压缩静态文件）：
+    python http_delivery.py index.html
+"""
+
+import os
+import sys
+import gzip
+import hashlib
+import threading
+from email.utils import formatdate, parsedate_to_datetime
+from typing import Optional, Dict, Tuple
+
+import html_report
+
+# 小于该字节数的动态响应不压缩
+COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))
+# 动态响应的gzip压缩级别（静态资源预压缩时使用最高级别）
+COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))
+# 带内容指纹的静态资源的缓存时间（一年）
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+# 无指纹的静态资源每次都需凭ETag重新验证
+REVALIDATE_CACHE_CONTROL = 'no-cache'
+
+# 协商时的编码优先级
+ENCODING_PREFERENCE = ('br', 'zstd', 'gzip')
+# 预压缩文件的扩展名
+ENCODING_SUFFIXES = {'br': '.br', 'gzip': '.gz'}
+
+CONTENT_TYPES = {
+    '.html': 'text/html; charset=utf-8',
+    '.css': 'text/css; charset=utf-8',
+    '.js': 'application/javascript; charset=utf-8',
+}
+
+
+def accepted_encodings(accept_encoding: Optional[str]) -> set:
+    """解析Accept-Encoding请求头，返回客户端可接受的编码（忽略q=0的编码）"""
+    encodings = set()
+    for item in (accept_encoding or '').lower().split(','):
+        name, _, params = item.strip().partition(';')
+        if not name:
+            continue
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        encodings.add(name.strip())
+    return encodings
+
+
+def compress_variants(data: bytes, gzip_level: int = 9) -> Dict[str, bytes]:
+    """
+    生成各编码的压缩内容：gzip总是生成，brotli与zstd在安装了对应库时生成
+
+    Args:
+        data: 原始内容
+        gzip_level: gzip压缩级别
+
+    Returns:
+        编码 -> 压缩后的内容
+    """
+    bodies = {'gzip': gzip.compress(data, gzip_level, mtime=0)}
+    try:
+        import brotli
+        bodies['br'] = brotli.compress(data, quality=11)
+    except ImportError:
+        pass
+    try:
+        import zstandard
+        bodies['zstd'] = zstandard.ZstdCompressor(level=19).compress(data)
+    except ImportError:
+        pass
+    return bodies
+
+
+def _strip_encoding(tag: str) -> str:
+    """去掉ETag的弱标记、引号与编码后缀"""
+    tag = tag.strip()
+    if tag.startswith('W/'):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    base, _, suffix = tag.rpartition('-')
+    return base if base and suffix in ENCODING_PREFERENCE else tag
+
+
+def is_not_modified(etag: str, modified_at: Optional[float], headers) -> bool:
+    """
+    根据条件请求头判断客户端缓存是否仍然有效（同时提供时以If-None-Match为准）
+
+    Args:
+        etag: 不含引号与编码后缀的ETag
+        modified_at: 最后修改时间戳
+        headers: 请求头（支持 .get 的映射）
+    """
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match:
+        # 同一内容不同编码的ETag视为相同
+        return any(tag.strip() == '*' or _strip_encoding(tag) == etag for tag in if_none_match.split(','))
+    if_modified_since = headers.get('If-Modified-Since')
+    if if_modified_since and modified_at is not None:
+        try:
+            return int(modified_at) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def negotiated_response(headers, etag: str, bodies: Dict[str, bytes], identity, content_type: str,
+                        cache_control: str, modified_at: Optional[float] = None) -> Tuple[int, Dict[str, str], bytes]:
+    """
+    生成内容协商后的响应（与Web框架无关，Flask与ASGI模式共用）
+
+    Args:
+        headers: 请求头（支持 .get 的映射）
+        etag: 内容的ETag（不含引号），压缩内容的ETag会附加编码后缀
+        bodies: 编码 -> 预压缩的内容
+        identity: 未压缩的内容，或在需要时返回未压缩内容的函数
+        content_type: Content-Type
+        cache_control: Cache-Control
+        modified_at: 最后修改时间戳，None时不返回Last-Modified
+
+    Returns:
+        (状态码, 响应头, 响应体)；客户端缓存有效时返回304与空响应体
+    """
+    accepted = accepted_encodings(headers.get('Accept-Encoding'))
+    encoding = next((name for name in ENCODING_PREFERENCE if name in bodies and name in accepted), None)
+    response_headers = {
+        'Content-Type': content_type,
+        'ETag': f'"{etag}-{encoding}"' if encoding else f'"{etag}"',
+        'Cache-Control': cache_control,
+        'Vary': 'Accept-Encoding',
+    }
+    if modified_at is not None:
+        response_headers['Last-Modified'] = formatdate(modified_at, usegmt=True)
+    if is_not_modified(etag, modified_at, headers):
+        return 304, response_headers, b''
+    if encoding:
+        response_headers['Content-Encoding'] = encoding
+        return 200, response_headers, bodies[encoding]
+    return 200, response_headers, identity() if callable(identity) else identity
+
+
+def gzip_body(data: bytes, headers) -> Optional[bytes]:
+    """客户端接受gzip且内容足够大时返回压缩后的动态响应体，否则返回None"""
+    if len(data) < COMPRESS_MIN_SIZE or 'gzip' not in accepted_encodings(headers.get('Accept-Encoding')):
+        return None
+    return gzip.compress(data, COMPRESS_LEVEL)
+
+
+class StaticAsset:
+    """一个静态资源：原始内容、预压缩内容与缓存元数据"""
+
+    __slots__ = ('name', 'data', 'bodies', 'etag', 'modified_at', 'content_type', 'cache_control')
+
+    def __init__(self, name: str, data: bytes, bodies: Dict[str, bytes], modified_at: float,
+                 content_type: str, cache_control: str):
+        self.name = name
+        self.data = data
+        self.bodies = bodies
+        self.etag = hashlib.sha256(data).hexdigest()[:32]
+        self.modified_at = modified_at
+        self.content_type = content_type
+        self.cache_control = cache_control
+
+    def response(self, headers) -> Tuple[int, Dict[str, str], bytes]:
+        return negotiated_response(headers, self.etag, self.bodies, self.data, self.content_type,
+                                   self.cache_control, self.modified_at)
+
+
+class StaticAssets:
+    """
+    静态资源注册表：只提供显式注册的文件与内存资源，文件修改后在下次请求时重新加载并压缩，
+    存在不旧于原文件的 .br/.gz 预压缩文件时直接使用
+    """
+
+    def __init__(self, root: str):
+        """
+        Args:
+            root: 文件资源的根目录
+        """
+        self.root = root
+        self._files = {}
+        self._assets = {}
+        self._lock = threading.Lock()
+
+    def add_file(self, name: str, filename: Optional[str] = None, cache_control: str = REVALIDATE_CACHE_CONTROL):
+        """
+        注册文件资源
+
+        Args:
+            name: 资源名
+            filename: 相对于根目录的文件名，默认与资源名相同
+            cache_control: Cache-Control
+        """
+        self._files[name] = (os.path.join(self.root, filename or name), cache_control)
+
+    def add_content(self, name: str, data: bytes, content_type: Optional[str] = None,
+                    cache_control: str = IMMUTABLE_CACHE_CONTROL):
+        """注册内存中的资源（如由代码生成、带内容指纹的样式表），注册时即完成压缩"""
+        content_type = content_type or CONTENT_TYPES.get(os.path.splitext(name)[1], 'application/octet-stream')
+        with self._lock:
+            self._assets[name] = StaticAsset(name, data, compress_variants(data), 0, content_type, cache_control)
+
+    def get(self, name: str) -> Optional[StaticAsset]:
+        """读取资源，未注册或文件不存在时返回None"""
+        if name not in self._files:
+            return self._assets.get(name)
+        path, cache_control = self._files[name]
+        try:
+            modified_at = os.path.getmtime(path)
+        except OSError:
+            return None
+        asset = self._assets.get(name)
+        if asset is not None and asset.modified_at == modified_at:
+            return asset
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        bodies = {}
+        for encoding, suffix in ENCODING_SUFFIXES.items():
+            # 构建时生成的预压缩文件不旧于原文件时才使用
+            if os.path.exists(path + suffix) and os.path.getmtime(path + suffix) >= modified_at:
+                with open(path + suffix, 'rb') as f:
+                    bodies[encoding] = f.read()
+        if 'gzip' not in bodies:
+            bodies = dict(compress_variants(data), **bodies)
+        content_type = CONTENT_TYPES.get(os.path.splitext(path)[1], 'application/octet-stream')
+        asset = StaticAsset(name, data, bodies, modified_at, content_type, cache_control)
+        with self._lock:
+            self._assets[name] = asset
+        return asset
+
+
+def precompress(path: str) -> Dict[str, str]:
+    """在文件旁生成 .gz（及安装brotli时的 .br）预压缩文件，返回 编码 -> 文件名"""
+    with open(path, 'rb') as f:
+        bodies = compress_variants(f.read())
+    written = {}
+    for encoding, suffix in ENCODING_SUFFIXES.items():
+        if encoding in bodies:
+            with open(path + suffix, 'wb') as f:
+                f.write(bodies[encoding])
+            written[encoding] = path + suffix
+    return written
+
+
+# 报告共享样式表的访问路径，文件名带内容指纹
+REPORT_STYLESHEET_URL = f'/assets/{html_report.REPORT_CSS_NAME}'
+
+# 创建全局静态资源注册表
+static_assets = StaticAssets(os.path.dirname(os.path.abspath(__file__)))
+static_assets.add_file('index.html')
+static_assets.add_content(html_report.REPORT_CSS_NAME, html_report.REPORT_CSS.encode('utf-8'))
+
+
+if __name__ == '__main__':
+    for filename in sys.argv[1:]:
+        for encoding, output in precompress(filename).items():
+            print(f"{filename} -> {output} ({encoding}, {os.path.getsize(output)} 字节)")
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+增量重新分析
+用户按修改建议调整简历后重新提交时，与上次分析的简历逐行对比：未受修改影响的板块与「逐条修改」表格行直接复用，
+只对修改涉及的部分调用大模型，使大多数重新提交变为小范围的局部生成
+"""
+
+import os
+import re
+import json
+import time
+import uuid
+import difflib
+import logging
+from typing import Optional, Dict, Any, List, Tuple
+
+from cache_store import MemoryLRUCache, SQLiteCache, TieredCache
+from prompts import REPORT_SECTIONS, SECTION_PLACEHOLDER
+
+logger = logging.getLogger(__name__)
+
+# 简历逐行相似度不低于该值时，面试问题、职业发展、结语板块沿用上次的结果
+INCREMENTAL_REUSE_RATIO = float(os.getenv('INCREMENTAL_REUSE_RATIO', 0.85))
+# 表格行的「简历现有内容」与被删改的简历行相似度达到该值时，视为受修改影响
+INCREMENTAL_ROW_MATCH_RATIO = float(os.getenv('INCREMENTAL_ROW_MATCH_RATIO', 0.6))
+
+# 评分板块与「逐条修改」板块在 REPORT_SECTIONS 中的下标
+SCORE_SECTION = 0
+REVISION_SECTION = 1
+
+
+def normalize_line(line: str) -> str:
+    """去除Markdown标记与空白后的行内容，用于比较"""
+    line = re.sub(r'[*_`>#「」“”"\'|]', '', line)
+    return re.sub(r'\s+', '', line)
+
+
+def same_material(a: Optional[str], b: Optional[str]) -> bool:
+    """两段材料在忽略空白差异后是否相同"""
+    return re.sub(r'\s+', ' ', a or '').strip() == re.sub(r'\s+', ' ', b or '').strip()
+
+
+class ResumeDiff:
+    """两版简历的逐行差异"""
+
+    def __init__(self, old_text: str, new_text: str):
+        old_lines = [line.strip() for line in (old_text or '').splitlines() if normalize_line(line)]
+        new_lines = [line.strip() for line in (new_text or '').splitlines() if normalize_line(line)]
+        matcher = difflib.SequenceMatcher(
+            None, [normalize_line(l) for l in old_lines], [normalize_line(l) for l in new_lines], autojunk=False
+        )
+        self.removed = []
+        self.added = []
+        for tag, i1, i2, j1, j2 in matcher.get_opcodes():
+            if tag in ('replace', 'delete'):
+                self.removed.extend(old_lines[i1:i2])
+            if tag in ('replace', 'insert'):
+                self.added.extend(new_lines[j1:j2])
+        self.ratio = matcher.ratio()
+
+    @property
+    def unchanged(self) -> bool:
+        return not self.removed and not self.added
+
+
+def split_sections(report: str) -> List[Optional[str]]:
+    """
+    将报告按板块拆分（merge_sections 的逆过程）
+
+    Args:
+        report: Markdown格式的完整报告
+
+    Returns:
+        各板块内容（含「## 标题」），缺失或为占位内容的板块为None
+    """
+    positions = []
+    for title in REPORT_SECTIONS:
+        match = re.search(rf'^#{{1,3}}\s*{re.escape(title)}\s*$', report or '', re.MULTILINE)
+        positions.append(match.start() if match else None)
+
+    sections = []
+    for index, start in enumerate(positions):
+        if start is None:
+            sections.append(None)
+            continue
+        following = [p for p in positions if p is not None and p > start]
+        end = min(following) if following else len(report)
+        content = re.sub(r'(?:\n\s*-{3,}\s*)+$', '', report[start:end].rstrip()).strip()
+        sections.append(None if SECTION_PLACEHOLDER in content else content)
+    return sections
+
+
+def split_table(section: str) -> Optional[Tuple[List[str], List[str], List[str], List[str]]]:
+    """
+    拆分板块中的第一个Markdown表格
+
+    Returns:
+        (表格前的行, 表头与分隔行, 数据行, 表格后的行)，板块中没有表格时返回None
+    """
+    lines = section.split('\n')
+    start = next((i for i, line in enumerate(lines) if line.lstrip().startswith('|')), None)
+    if start is None or start + 1 >= len(lines) or not re.match(r'^\s*\|?[\s:|-]+\|?\s*$', lines[start + 1]):
+        return None
+    end = start + 2
+    while end < len(lines) and lines[end].lstrip().startswith('|'):
+        end += 1
+    return lines[:start], lines[start:start + 2], lines[start + 2:end], lines[end:]
+
+
+def table_rows(text: str) -> List[str]:
+    """提取文本中的表格数据行（忽略表头分隔行）"""
+    rows = []
+    for line in (text or '').split('\n'):
+        line = line.strip()
+        if line.startswith('|') and not re.match(r'^\|?[\s:|-]+\|?$', line):
+            rows.append(line)
+    return rows
+
+
+def row_affected(row: str, removed_lines: List[str]) -> bool:
+    """表格行的「简历现有内容」是否对应被删除或改写的简历行"""
+    cells = [cell.strip() for cell in row.strip().strip('|').split('|')]
+    content = normalize_line(cells[0]) if cells else ''
+    if not content:
+        return False
+    for line in removed_lines:
+        line = normalize_line(line)
+        if not line:
+            continue
+        if content in line or line in content:
+            return True
+        matcher = difflib.SequenceMatcher(None, content, line, autojunk=False)
+        if matcher.quick_ratio() >= INCREMENTAL_ROW_MATCH_RATIO and matcher.ratio() >= INCREMENTAL_ROW_MATCH_RATIO:
+            return True
+    return False
+
+
+class ReanalysisPlan:
+    """增量重新分析计划：需要重新生成的板块、「逐条修改」表格中保留的行及需补充的简历行"""
+
+    def __init__(self, previous_report: str, diff: ResumeDiff, reuse_ratio: float = INCREMENTAL_REUSE_RATIO):
+        """
+        根据上次的报告与简历差异制定计划
+
+        Args:
+            previous_report: 上次的Markdown报告
+            diff: 两版简历的差异
+            reuse_ratio: 沿用面试问题、职业发展、结语板块所需的最低相似度
+        """
+        self.sections = split_sections(previous_report)
+        self.regenerate = []
+        self.table = None
+        self.added_lines = []
+
+        for index, content in enumerate(self.sections):
+            if content is None or index == SCORE_SECTION:
+                # 评分反映整份简历，只要简历有改动就重新生成
+                self.regenerate.append(index)
+            elif index == REVISION_SECTION:
+                table = split_table(content)
+                if table is None:
+                    self.regenerate.append(index)
+                    continue
+                before, header, rows, after = table
+                kept = [row for row in rows if not row_affected(row, diff.removed)]
+                self.table = (before, header, kept, after)
+                self.added_lines = list(diff.added)
+            elif diff.ratio < reuse_ratio:
+                self.regenerate.append(index)
+
+    @property
+    def reused(self) -> List[int]:
+        """沿用上次结果的板块"""
+        return [i for i in range(len(REPORT_SECTIONS)) if i not in self.regenerate]
+
+    def merge(self, generated: Dict[int, Optional[str]], new_rows: Optional[str]) -> Tuple[List[Optional[str]], bool]:
+        """
+        合并复用内容与新生成内容
+
+        Args:
+            generated: 重新生成的板块内容，失败的板块为None
+            new_rows: 为修改内容补充的表格行，失败时为None
+
+        Returns:
+            (各板块内容, 是否全部生成成功)；重新生成失败的其他板块沿用上次的内容
+
+        Raises:
+            RuntimeError: 评分板块或修改内容的表格行生成失败（沿用上次的评分与表格会得到与修改后简历不符的报告）
+        """
+        if SCORE_SECTION in self.regenerate and not generated.get(SCORE_SECTION):
+            raise RuntimeError("评分板块重新生成失败")
+        if self.table is not None and self.added_lines and new_rows is None:
+            raise RuntimeError("修改内容的表格行生成失败")
+
+        complete = True
+        contents = list(self.sections)
+        for index in self.regenerate:
+            if generated.get(index):
+                contents[index] = generated[index]
+            else:
+                complete = False
+                if contents[index]:
+                    logger.warning(f"板块「{REPORT_SECTIONS[index]}」重新生成失败，沿用上次的内容")
+
+        if self.table is not None:
+            before, header, kept, after = self.table
+            rows = kept + table_rows(new_rows)
+            contents[REVISION_SECTION] = '\n'.join(before + header + rows + after).strip()
+        return contents, complete
+
+
+class AnalysisHistory:
+    """按分析ID保存的分析记录（简历、JD、目标岗位与报告），供增量重新分析使用"""
+
+    def __init__(self, cache: TieredCache):
+        """
+        初始化分析记录存储
+
+        Args:
+            cache: 底层缓存（内存LRU + 可选的SQLite磁盘层）
+        """
+        self.cache = cache
+
+    def save(self, report: str, resume_text: str, jd_text: str, target_position: str,
+             analysis_id: Optional[str] = None) -> str:
+        """
+        保存分析记录
+
+        Returns:
+            分析ID
+        """
+        analysis_id = analysis_id or uuid.uuid4().hex
+        self.cache.set(self._key(analysis_id), json.dumps({
+            'analysis_id': analysis_id,
+            'resume': resume_text,
+            'jd': jd_text,
+            'target_position': target_position,
+            'report': report,
+            'created_at': time.time(),
+        }, ensure_ascii=False))
+        return analysis_id
+
+    def get(self, analysis_id: str) -> Optional[Dict[str, Any]]:
+        """读取分析记录，不存在或已过期时返回None"""
+        if not analysis_id:
+            return None
+        value = self.cache.get(self._key(analysis_id))
+        if value is None:
+            return None
+        if isinstance(value, bytes):
+            value = value.decode('utf-8')
+        return json.loads(value)
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
+
+    @staticmethod
+    def _key(analysis_id: str) -> str:
+        return f"analysis:{analysis_id}"
+
+
+def build_analysis_history() -> AnalysisHistory:
+    """根据环境变量构建分析记录存储，磁盘层初始化失败时仅使用内存"""
+    ttl = float(os.getenv('ANALYSIS_HISTORY_TTL', 7 * 24 * 3600))
+    memory = MemoryLRUCache(max_entries=int(os.getenv('ANALYSIS_HISTORY_MAX_ENTRIES', 1024)), ttl=ttl)
+
+    disk = None
+    path = os.getenv('ANALYSIS_HISTORY_PATH', os.path.join('.cache', 'analysis_history.sqlite3'))
+    if path:
+        try:
+            disk = SQLiteCache(path, ttl=ttl, max_bytes=int(os.getenv('ANALYSIS_HISTORY_MAX_BYTES', 200 * 1024 * 1024)))
+        except Exception as e:
+            logger.error(f"分析记录磁盘存储初始化失败，仅使用内存：{str(e)}")
+    return AnalysisHistory(TieredCache(memory, disk))
+
+
+# 创建全局分析记录存储
+analysis_history = build_analysis_history()
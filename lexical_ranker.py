@@ -0,0 +1,280 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+本地词法预排序
+基于BM25的简历-JD相关度打分：中文按字二元组（bigram）切分、英文按单词切分，倒排索引支持增量添加与删除，
+查询时用NumPy向量化计算全部文档得分，毫秒级返回排名，用于在调用大模型前筛掉明显不相关的简历
+"""
+
+import re
+import time
+import threading
+from collections import deque, Counter
+from typing import Optional, Dict, Any, List, Tuple, Hashable, Iterable
+
+import numpy as np
+
+# 英文单词/数字，保留 c++、c#、node.js 这类技术名词
+_WORD_PATTERN = re.compile(r'[a-z0-9][a-z0-9+#.]*')
+# 连续的中文字符
+_CJK_PATTERN = re.compile(r'[\u4e00-\u9fff]+')
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    切分中英文混合文本：英文按单词（转小写），中文按相邻两字组成的bigram，单个汉字保持原样
+
+    Args:
+        text: 待切分文本
+
+    Returns:
+        词项列表
+    """
+    text = (text or '').lower()
+    tokens = [word.rstrip('.') for word in _WORD_PATTERN.findall(text)]
+    for run in _CJK_PATTERN.findall(text):
+        if len(run) == 1:
+            tokens.append(run)
+        else:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+class _Segment:
+    """不可变的倒排段：按词项ID排序的 (词项, 文档序号, 词频) 三元组数组"""
+
+    __slots__ = ('terms', 'docs', 'tfs', 'documents')
+
+    def __init__(self, terms: np.ndarray, docs: np.ndarray, tfs: np.ndarray, documents: int):
+        order = np.argsort(terms, kind='stable')
+        self.terms = terms[order]
+        self.docs = docs[order]
+        self.tfs = tfs[order]
+        self.documents = documents
+
+    def lookup(self, term_ids: np.ndarray) -> np.ndarray:
+        """返回命中给定词项的倒排记录下标"""
+        lo = np.searchsorted(self.terms, term_ids, side='left')
+        hi = np.searchsorted(self.terms, term_ids, side='right')
+        counts = hi - lo
+        total = int(counts.sum())
+        if not total:
+            return np.empty(0, dtype=np.int64)
+        # 将多个 [lo, hi) 区间展开为连续下标
+        offsets = np.repeat(lo - np.cumsum(counts) + counts, counts)
+        return offsets + np.arange(total)
+
+
+class LexicalIndex:
+    """BM25倒排索引，线程安全，支持增量添加、替换与删除文档"""
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        """
+        初始化索引
+
+        Args:
+            k1: 词频饱和参数
+            b: 文档长度归一化参数
+        """
+        self.k1 = k1
+        self.b = b
+        self._vocab = {}
+        # 倒排段：每次添加生成一个新段，相邻段规模接近时合并，段数保持在O(log N)
+        self._segments = []
+        self._df = np.zeros(1024, dtype=np.int64)
+        # 文档序号对应的键、长度、词项及是否有效；删除的文档仅标记无效，合并段时清理其倒排记录
+        self._keys = []
+        self._positions = {}
+        self._doc_terms = []
+        self._lengths = np.zeros(64, dtype=np.float64)
+        self._alive = np.zeros(64, dtype=bool)
+        self._live_count = 0
+        self._total_length = 0
+        self._lock = threading.Lock()
+        # 延迟统计
+        self._build_seconds = 0.0
+        self._built_documents = 0
+        self._query_seconds = deque(maxlen=1000)
+        self._query_count = 0
+
+    def __len__(self) -> int:
+        return self._live_count
+
+    def add(self, key: Hashable, text: str):
+        """添加文档，键已存在时替换原文档"""
+        self.add_many([(key, text)])
+
+    def add_many(self, documents: Iterable[Tuple[Hashable, str]]):
+        """
+        批量添加文档，一次调用生成一个倒排段，批量添加比逐个添加更快
+
+        Args:
+            documents: (键, 文本) 序列
+        """
+        start = time.perf_counter()
+        # 同一批中重复的键只保留最后一次出现的文档（与逐个添加时的替换语义一致）
+        latest = {}
+        for key, text in documents:
+            latest.pop(key, None)
+            latest[key] = text
+        # 分词不需要持有锁
+        tokenized = [(key, Counter(tokenize(text))) for key, text in latest.items()]
+        if not tokenized:
+            return
+        with self._lock:
+            for key, _ in tokenized:
+                if key in self._positions:
+                    self._remove(key)
+            self._add_segment(tokenized)
+            self._build_seconds += time.perf_counter() - start
+            self._built_documents += len(tokenized)
+
+    def remove(self, key: Hashable) -> bool:
+        """删除文档，返回文档是否存在"""
+        with self._lock:
+            if key not in self._positions:
+                return False
+            self._remove(key)
+            return True
+
+    def search(self, query: str, top_k: Optional[int] = None) -> List[Tuple[Hashable, float]]:
+        """
+        按BM25得分检索文档
+
+        Args:
+            query: 查询文本（如JD）
+            top_k: 返回的文档数，None表示返回全部
+
+        Returns:
+            按得分从高到低排列的 (键, 得分) 列表
+        """
+        start = time.perf_counter()
+        # 查询词去重，避免JD中反复出现的套话主导得分
+        terms = set(tokenize(query))
+        with self._lock:
+            size = len(self._keys)
+            if not self._live_count:
+                return []
+            term_ids = np.array(sorted(self._vocab[t] for t in terms if t in self._vocab), dtype=np.int64)
+            df = self._df[term_ids]
+            idf = np.zeros(len(self._vocab), dtype=np.float64)
+            idf[term_ids] = np.log(1 + (self._live_count - df + 0.5) / (df + 0.5))
+            norms = self.k1 * (1 - self.b + self.b * self._lengths[:size] / (self._total_length / self._live_count))
+
+            scores = np.zeros(size, dtype=np.float64)
+            for segment in self._segments:
+                hits = segment.lookup(term_ids)
+                if not len(hits):
+                    continue
+                docs = segment.docs[hits]
+                tfs = segment.tfs[hits].astype(np.float64)
+                weights = idf[segment.terms[hits]] * tfs * (self.k1 + 1) / (tfs + norms[docs])
+                scores += np.bincount(docs, weights=weights, minlength=size)
+            scores[~self._alive[:size]] = -np.inf
+
+            count = self._live_count if top_k is None else max(0, min(top_k, self._live_count))
+            if count < size:
+                order = np.argpartition(-scores, count - 1)[:count] if count else np.empty(0, dtype=np.int64)
+            else:
+                order = np.arange(size)
+            order = order[np.argsort(-scores[order], kind='stable')]
+            results = [(self._keys[i], float(scores[i])) for i in order if self._alive[i]]
+
+            self._query_seconds.append(time.perf_counter() - start)
+            self._query_count += 1
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """索引规模与建索引/查询延迟"""
+        with self._lock:
+            queries = np.array(self._query_seconds) * 1000
+            return {
+                'documents': self._live_count,
+                'terms': len(self._vocab),
+                'segments': len(self._segments),
+                'build': {
+                    'documents': self._built_documents,
+                    'total_ms': round(self._build_seconds * 1000, 3),
+                    'per_document_ms': round(self._build_seconds * 1000 / self._built_documents, 4)
+                    if self._built_documents else None,
+                },
+                'query': {
+                    'count': self._query_count,
+                    'last_ms': round(float(queries[-1]), 3) if len(queries) else None,
+                    'avg_ms': round(float(queries.mean()), 3) if len(queries) else None,
+                    'p95_ms': round(float(np.percentile(queries, 95)), 3) if len(queries) else None,
+                },
+            }
+
+    def _add_segment(self, tokenized: List[Tuple[Hashable, Counter]]):
+        # 调用方需持有 self._lock
+        vocab = self._vocab
+        first = len(self._keys)
+        needed = first + len(tokenized)
+        if needed > len(self._lengths):
+            capacity = max(needed, len(self._lengths) * 2)
+            self._lengths = np.concatenate([self._lengths, np.zeros(capacity - len(self._lengths))])
+            self._alive = np.concatenate([self._alive, np.zeros(capacity - len(self._alive), dtype=bool)])
+
+        term_ids, tfs, sizes = [], [], []
+        for position, (key, counts) in enumerate(tokenized, start=first):
+            ids = [vocab.setdefault(term, len(vocab)) for term in counts]
+            term_ids.extend(ids)
+            tfs.extend(counts.values())
+            sizes.append(len(ids))
+            length = sum(counts.values())
+            self._keys.append(key)
+            self._positions[key] = position
+            self._lengths[position] = length
+            self._alive[position] = True
+            self._live_count += 1
+            self._total_length += length
+
+        terms = np.array(term_ids, dtype=np.int64)
+        docs = np.repeat(np.arange(first, needed, dtype=np.int64), sizes)
+        self._doc_terms.extend(np.split(terms, np.cumsum(sizes)[:-1]))
+        if len(vocab) > len(self._df):
+            self._df = np.concatenate([self._df, np.zeros(max(len(vocab), len(self._df) * 2) - len(self._df), dtype=np.int64)])
+        self._df += np.bincount(terms, minlength=len(self._df))
+
+        self._segments.append(_Segment(terms, docs, np.array(tfs, dtype=np.int32), len(tokenized)))
+        # 末尾两段规模接近时合并，与二进制计数器类似，每条倒排记录最多被合并O(log N)次
+        while len(self._segments) > 1 and self._segments[-1].documents * 2 >= self._segments[-2].documents:
+            newer = self._segments.pop()
+            older = self._segments.pop()
+            self._segments.append(self._merge(older, newer))
+
+    def _merge(self, older: '_Segment', newer: '_Segment') -> '_Segment':
+        # 调用方需持有 self._lock；合并时丢弃已删除文档的倒排记录
+        terms = np.concatenate([older.terms, newer.terms])
+        docs = np.concatenate([older.docs, newer.docs])
+        tfs = np.concatenate([older.tfs, newer.tfs])
+        keep = self._alive[docs]
+        return _Segment(terms[keep], docs[keep], tfs[keep], older.documents + newer.documents)
+
+    def _remove(self, key: Hashable):
+        # 调用方需持有 self._lock；倒排段中的旧记录保留，查询时按有效标记过滤
+        position = self._positions.pop(key)
+        np.subtract.at(self._df, self._doc_terms[position], 1)
+        self._doc_terms[position] = None
+        self._keys[position] = None
+        self._alive[position] = False
+        self._live_count -= 1
+        self._total_length -= int(self._lengths[position])
+
+
+def rank_texts(query: str, texts: List[str], top_k: Optional[int] = None) -> Tuple[List[Tuple[int, float]], Dict[str, Any]]:
+    """
+    对一组文本按与查询的相关度排序
+
+    Args:
+        query: 查询文本（如JD）
+        texts: 待排序文本列表
+        top_k: 返回的文本数，None表示返回全部
+
+    Returns:
+        ([(文本序号, 得分)], 索引延迟统计)
+    """
+    index = LexicalIndex()
+    index.add_many(enumerate(texts))
+    return index.search(query, top_k), index.stats()
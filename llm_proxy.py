@@ -6,9 +6,21 @@
 """
 
 import os
+import re
+import asyncio
 import logging
-from openai import OpenAI
-from typing import Optional, Dict, Any
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Dict, Any, List, Iterator, AsyncIterator, Tuple
+
+from cache_store import MemoryLRUCache, SQLiteCache, TieredCache, make_cache_key
+from llm_resilience import ResilientLLMClient
+import metrics
+import tracing
+from prompts import (
+    PROMPT_VERSION, REPORT_SECTIONS, SECTION_PLACEHOLDER, build_messages, build_section_messages,
+    build_row_update_messages
+)
+from incremental_analysis import ResumeDiff, ReanalysisPlan, same_material
 
 # 配置日志
 logging.basicConfig(
@@ -17,11 +29,88 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+# 分板块并行生成：五个板块各自调用大模型（共享相同的消息前缀），完成后按顺序合并
+LLM_SECTION_PARALLEL = os.getenv('LLM_SECTION_PARALLEL', '0') == '1'
+# 单个板块的调用时限（秒），失败或超时的板块以占位内容代替
+LLM_SECTION_DEADLINE = float(os.getenv('LLM_SECTION_DEADLINE', 90))
+
+def normalize_section(title: str, content: str) -> str:
+    """
+    规整单个板块的生成内容：去除代码块包裹与首尾分隔线，统一板块标题为「## 标题」
+    
+    Args:
+        title: 板块标题
+        content: 模型生成的板块内容
+        
+    Returns:
+        规整后的板块Markdown
+    """
+    text = re.sub(r'^```(?:markdown|md)?\s*\n|\n```\s*$', '', content.strip()).strip()
+    text = re.sub(r'^(?:-{3,}\s*\n)+|(?:\n\s*-{3,})+$', '', text).strip()
+    lines = text.split('\n')
+    # 模型自带的一、二级标题替换为标准标题，否则补上标题
+    if re.match(r'^#{1,2}\s', lines[0]):
+        lines = lines[1:]
+    return f"## {title}\n" + '\n'.join(lines).strip()
+
+def merge_sections(contents: List[Optional[str]]) -> str:
+    """
+    按板块顺序合并各板块内容，生成与整体生成相同结构的报告
+    
+    Args:
+        contents: 各板块内容，失败的板块为None
+        
+    Returns:
+        完整的Markdown报告
+    """
+    parts = []
+    for title, content in zip(REPORT_SECTIONS, contents):
+        if content and content.strip():
+            parts.append(normalize_section(title, content))
+        else:
+            parts.append(f"## {title}\n{SECTION_PLACEHOLDER}")
+    return "---\n" + "\n\n---\n".join(parts)
+
+def build_result_cache() -> Optional[TieredCache]:
+    """
+    根据环境变量构建分析结果缓存
+    
+    Returns:
+        分层缓存实例，LLM_CACHE_ENABLED=0 时返回None
+    """
+    if os.getenv('LLM_CACHE_ENABLED', '1') == '0':
+        return None
+    
+    ttl = float(os.getenv('LLM_CACHE_TTL', 7 * 24 * 3600))
+    memory = MemoryLRUCache(
+        max_entries=int(os.getenv('LLM_CACHE_MAX_ENTRIES', 256)),
+        ttl=ttl
+    )
+    
+    disk = None
+    cache_path = os.getenv('LLM_CACHE_PATH', os.path.join('.cache', 'llm_results.sqlite3'))
+    if cache_path:
+        try:
+            disk = SQLiteCache(
+                cache_path,
+                ttl=ttl,
+                max_bytes=int(os.getenv('LLM_CACHE_MAX_BYTES', 200 * 1024 * 1024))
+            )
+        except Exception as e:
+            logger.error(f"分析结果磁盘缓存初始化失败，仅使用内存缓存：{str(e)}")
+    
+    return TieredCache(memory, disk)
+
 class LLMProxy:
     """大模型API代理类"""
     
-    def __init__(self):
-        """初始化代理"""
+    def __init__(self, cache: Optional[TieredCache] = None):
+        """
+        初始化代理
+        
+        Args:
+            cache: 分析结果缓存，为None时不缓存
+        """
         self.api_key = os.getenv('LLM_API_KEY')
         self.base_url = os.getenv('LLM_API_BASE_URL', 'https://dashscope.aliyuncs.com/compatible-mode/v1')
         self.model = os.getenv('LLM_MODEL', 'qwen-plus')
@@ -31,15 +120,17 @@ class LLMProxy:
             logger.error("大模型API密钥未配置，请设置LLM_API_KEY环境变量")
             raise ValueError("大模型API密钥未配置")
         
-        # 初始化OpenAI客户端
-        self.client = OpenAI(
+        # 初始化客户端：共享长连接池，带单次调用时限、退避重试、并发上限与熔断
+        self.llm = ResilientLLMClient(
             api_key=self.api_key,
             base_url=self.base_url,
         )
+        self.cache = cache
+        self.section_parallel = LLM_SECTION_PARALLEL
     
-    def analyze_resume(self, resume_text: str, jd_text: str, target_position: str) -> str:
+    def _cache_key(self, resume_text: str, jd_text: str, target_position: str) -> str:
         """
-        分析简历与岗位匹配度
+        计算分析结果的缓存键，空白差异不影响命中
         
         Args:
             resume_text: 简历文本内容
@@ -47,44 +138,465 @@ class LLMProxy:
             target_position: 目标岗位
             
         Returns:
-            分析结果文本
+            缓存键
+        """
+        normalize = lambda text: re.sub(r'\s+', ' ', text).strip()
+        return make_cache_key(
+            PROMPT_VERSION,
+            self.model,
+            normalize(resume_text),
+            normalize(jd_text),
+            normalize(target_position)
+        )
+    
+    def _build_messages(self, resume_text: str, jd_text: str, target_position: str) -> List[Dict[str, str]]:
         """
+        构建分析请求的消息列表
+        
+        Args:
+            resume_text: 简历文本内容
+            jd_text: 职位JD文本内容
+            target_position: 目标岗位
+            
+        Returns:
+            chat.completions 所需的消息列表
+        """
+        return build_messages(resume_text, jd_text, target_position)
+    
+    def _lookup_cache(self, resume_text: str, jd_text: str, target_position: str) -> Tuple[Optional[str], Optional[str]]:
+        """
+        查询分析结果缓存
+        
+        Returns:
+            (缓存键, 缓存结果)，未启用缓存时缓存键为None，未命中时缓存结果为None
+        """
+        if self.cache is None:
+            return None, None
+        cache_key = self._cache_key(resume_text, jd_text, target_position)
+        cached = self.cache.get(cache_key)
+        tracing.set_attribute('analysis_cache.hit', cached is not None)
+        if cached is not None:
+            logger.info(f"命中分析结果缓存，目标岗位：{target_position}")
+        return cache_key, cached
+    
+    async def _alookup_cache(self, resume_text: str, jd_text: str,
+                             target_position: str) -> Tuple[Optional[str], Optional[str]]:
+        """查询分析结果缓存（_lookup_cache 的异步版本，SQLite磁盘层的读取在线程池中执行，不阻塞事件循环）"""
+        if self.cache is None:
+            return None, None
+        return await asyncio.get_running_loop().run_in_executor(
+            None, tracing.propagate(self._lookup_cache), resume_text, jd_text, target_position
+        )
+    
+    async def _acache_set(self, cache_key: str, content: str):
+        """写入分析结果缓存（在线程池中执行，不阻塞事件循环）"""
+        await asyncio.get_running_loop().run_in_executor(None, self.cache.set, cache_key, content)
+    
+    def _validate(self, resume_text: str, jd_text: str, target_position: str) -> Optional[str]:
+        """校验输入，返回提示信息；输入完整时返回None"""
         if not resume_text:
             return "请输入简历内容"
         if not jd_text:
             return "请输入JD内容"
         if not target_position:
             return "请输入目标岗位"
+        return None
+    
+    def _complete_all(self, message_lists: List[List[Dict[str, str]]]) -> List[Any]:
+        """
+        并行发起多个调用（每个调用使用 LLM_SECTION_DEADLINE 时限）
+        
+        Returns:
+            按顺序排列的生成内容，失败的调用对应异常对象
+        """
+        def complete(messages: List[Dict[str, str]]) -> str:
+            response = self.llm.create(deadline=LLM_SECTION_DEADLINE, model=self.model, messages=messages)
+            return response.choices[0].message.content
+        
+        with ThreadPoolExecutor(max_workers=max(1, len(message_lists)), thread_name_prefix='llm-section') as pool:
+            futures = [pool.submit(tracing.propagate(complete), messages) for messages in message_lists]
+            results = []
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    results.append(e)
+        return results
+    
+    async def _acomplete_all(self, message_lists: List[List[Dict[str, str]]]) -> List[Any]:
+        """并行发起多个调用（_complete_all 的异步版本）"""
+        responses = await asyncio.gather(*[
+            self.llm.acreate(deadline=LLM_SECTION_DEADLINE, model=self.model, messages=messages)
+            for messages in message_lists
+        ], return_exceptions=True)
+        return [r if isinstance(r, BaseException) else r.choices[0].message.content for r in responses]
+    
+    def _section_calls(self, resume_text: str, jd_text: str, target_position: str) -> List[List[Dict[str, str]]]:
+        return [
+            build_section_messages(resume_text, jd_text, target_position, section)
+            for section in range(len(REPORT_SECTIONS))
+        ]
+    
+    def _generate_sections(self, resume_text: str, jd_text: str, target_position: str) -> Tuple[str, bool]:
+        """
+        分板块并行生成报告
+        
+        Returns:
+            (合并后的报告, 是否全部板块生成成功)
+            
+        Raises:
+            RuntimeError: 全部板块生成失败
+        """
+        return self._merge_results(self._complete_all(self._section_calls(resume_text, jd_text, target_position)))
+    
+    async def _agenerate_sections(self, resume_text: str, jd_text: str, target_position: str) -> Tuple[str, bool]:
+        """分板块并行生成报告（_generate_sections 的异步版本）"""
+        return self._merge_results(await self._acomplete_all(self._section_calls(resume_text, jd_text, target_position)))
+    
+    def _merge_results(self, results: List[Any]) -> Tuple[str, bool]:
+        """合并各板块结果，失败的板块记录日志并以占位内容代替"""
+        contents = []
+        for title, result in zip(REPORT_SECTIONS, results):
+            if isinstance(result, BaseException):
+                logger.error(f"板块「{title}」生成失败：{str(result)}")
+                result = None
+            contents.append(result)
+        if not any(contents):
+            raise RuntimeError("全部板块生成失败")
+        return merge_sections(contents), all(contents)
+    
+    @metrics.timed('analysis')
+    @tracing.traced('LLMProxy.analyze_resume')
+    def analyze_resume(self, resume_text: str, jd_text: str, target_position: str, raise_errors: bool = False) -> str:
+        """
+        分析简历与岗位匹配度
+        
+        Args:
+            resume_text: 简历文本内容
+            jd_text: 职位JD文本内容
+            target_position: 目标岗位
+            raise_errors: 为True时输入不完整或调用失败抛出异常，而不是返回提示文本
+            
+        Returns:
+            分析结果文本
+            
+        Raises:
+            ValueError: 输入不完整（仅raise_errors=True时）
+            RuntimeError: 大模型API调用失败（仅raise_errors=True时，不包含原始错误信息）
+        """
+        message = self._validate(resume_text, jd_text, target_position)
+        if message:
+            if raise_errors:
+                raise ValueError(message)
+            return message
+        
+        cache_key, cached = self._lookup_cache(resume_text, jd_text, target_position)
+        if cached is not None:
+            return cached
         
         try:
-            prompt = f"请基于以下候选人简历文本、目标岗位和JD文本，生成一份结构清晰、核心信息用表格呈现的岗位匹配度分析报告，严格遵循以下模块和格式要求：\n\n### 输入材料\n1. 候选人简历文本：{resume_text}\n2. 目标岗位：{target_position}\n3. 目标岗位 JD 文本：{jd_text}\n\n### 输出格式要求\n---\n## 一、评分与分析理由板块\n1. **整体评分**：给出0-10分的综合得分\n2. **综合评价**：150字左右的总述，突出匹配亮点与核心短板\n3. **维度拆解分析**：必须用表格呈现，表格列固定为「维度|评分 (/10)|分析理由」，维度包含：\n   - 岗位匹配度\n   - 工作经验相关性\n   - 技能掌握程度\n   - 教育背景契合度\n   - 软技能与岗位适配性\n4. **主要差距总结**：用项目符号列出3-5条最核心的不匹配点\n\n---\n## 二、对照岗位 JD 逐条修改简历板块\n必须用表格呈现，表格列固定为「简历现有内容|岗位 JD 要求|差异分析|修改建议」，需将简历中所有与 JD 相关的条目逐一对应分析，并给出可直接替换的改写话术。\n\n---\n## 三、面试可能问的问题板块\n列出8-10个高针对性问题，每个问题后用「⚠️」标注考察点，例如：\n1. 你在实习中提到「构建多维度测评体系」，能否详细说明你是如何定义「准确性」和「逻辑性」的？⚠️ 考察数据质量把控能力和标准化思维\n\n---\n## 四、职业发展路径板块\n分「短期 (1-3年)」「中期 (3-5年)」「长期 (5年以上)」三个阶段，每个阶段包含：\n- 目标职位\n- 核心任务 / 能力升级重点\n- 行动建议（用「✅」标注具体动作）\n\n---\n## 五、结语建议板块\n给候选人的投递/面试策略总结，3-4条可落地的行动建议。\n\n---\n### 格式约束\n- 所有对比类、评分类内容必须用表格呈现，禁止纯文本堆砌\n- 每个板块用「---」分隔，标题用「#」「##」分级，保持视觉清晰\n- 语言需专业、简洁，避免冗余表述\n\n要求分析全面、具体，避免模板化回复，完全基于提供的JD和简历内容"
-
             # 记录调用开始
             logger.info(f"开始分析简历，目标岗位：{target_position}")
             
             # 调用大模型API
-            response = self.client.chat.completions.create(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": "你是专业简历分析助手，具有5年以上招聘经验，对AI产品经理等岗位有深入理解"},
-                    {"role": "user", "content": prompt}
-                ]
-            )
+            if self.section_parallel:
+                content, complete = self._generate_sections(resume_text, jd_text, target_position)
+            else:
+                response = self.llm.create(
+                    model=self.model,
+                    messages=self._build_messages(resume_text, jd_text, target_position)
+                )
+                content, complete = response.choices[0].message.content, True
             
             # 记录调用成功
             logger.info(f"简历分析完成，目标岗位：{target_position}")
             
-            return response.choices[0].message.content
+            # 含占位板块的报告不缓存，下次请求重新生成
+            if cache_key and content and complete:
+                self.cache.set(cache_key, content)
+            return content
             
         except Exception as e:
             # 避免泄露密钥相关错误信息
             logger.error(f"大模型API调用失败：{str(e)}")
+            if raise_errors:
+                raise RuntimeError("服务暂时不可用，请稍后重试") from None
             return "服务暂时不可用，请稍后重试"
+    
+    @metrics.timed('analysis')
+    @tracing.traced('LLMProxy.analyze_resume_stream')
+    def analyze_resume_stream(self, resume_text: str, jd_text: str, target_position: str) -> Iterator[str]:
+        """
+        流式分析简历与岗位匹配度，逐段产出模型生成的文本增量
+        
+        Args:
+            resume_text: 简历文本内容
+            jd_text: 职位JD文本内容
+            target_position: 目标岗位
+            
+        Yields:
+            分析结果文本增量
+            
+        Raises:
+            RuntimeError: 大模型API调用失败（不包含原始错误信息）
+        """
+        message = self._validate(resume_text, jd_text, target_position)
+        if message:
+            yield message
+            return
+        
+        cache_key, cached = self._lookup_cache(resume_text, jd_text, target_position)
+        if cached is not None:
+            yield cached
+            return
+        
+        try:
+            logger.info(f"开始流式分析简历，目标岗位：{target_position}")
+            
+            chunks = []
+            for delta in self.llm.stream(
+                model=self.model,
+                messages=self._build_messages(resume_text, jd_text, target_position)
+            ):
+                chunks.append(delta)
+                yield delta
+            
+            if cache_key and chunks:
+                self.cache.set(cache_key, ''.join(chunks))
+            
+            logger.info(f"流式简历分析完成，目标岗位：{target_position}")
+        except Exception as e:
+            # 避免泄露密钥相关错误信息
+            logger.error(f"大模型API流式调用失败：{str(e)}")
+            raise RuntimeError("服务暂时不可用，请稍后重试") from None
+    
+    def _plan_reanalysis(self, previous: Dict[str, Any], resume_text: str, jd_text: str,
+                         target_position: str) -> Tuple[Optional[ReanalysisPlan], List[Any]]:
+        """
+        制定增量重新分析计划
+        
+        Returns:
+            (计划, 需要发起的调用)；JD或目标岗位有变化、简历未修改时计划为None
+        """
+        if not same_material(previous.get('jd'), jd_text) or \
+                not same_material(previous.get('target_position'), target_position):
+            return None, []
+        diff = ResumeDiff(previous.get('resume'), resume_text)
+        if diff.unchanged:
+            return None, []
+        plan = ReanalysisPlan(previous.get('report'), diff)
+        calls = [
+            build_section_messages(resume_text, jd_text, target_position, section)
+            for section in plan.regenerate
+        ]
+        if plan.table is not None and plan.added_lines:
+            calls.append(build_row_update_messages(resume_text, jd_text, target_position, plan.added_lines))
+        logger.info(f"增量重新分析：简历相似度{diff.ratio:.2f}，重新生成{len(plan.regenerate)}个板块，"
+                    f"补充{len(plan.added_lines)}行修改内容，沿用{len(plan.reused)}个板块")
+        return plan, calls
+    
+    def _merge_reanalysis(self, plan: ReanalysisPlan, results: List[Any]) -> Tuple[str, bool]:
+        generated = {}
+        for section, result in zip(plan.regenerate, results):
+            if isinstance(result, BaseException):
+                logger.error(f"板块「{REPORT_SECTIONS[section]}」重新生成失败：{str(result)}")
+                result = None
+            generated[section] = result
+        new_rows = None
+        if len(results) > len(plan.regenerate):
+            new_rows = results[-1]
+            if isinstance(new_rows, BaseException):
+                logger.error(f"修改内容的表格行生成失败：{str(new_rows)}")
+                new_rows = None
+        contents, complete = plan.merge(generated, new_rows)
+        return merge_sections(contents), complete
+    
+    @staticmethod
+    def _reanalysis_failed(error: Exception, raise_errors: bool) -> str:
+        """评分板块或修改内容的表格行生成失败时，不返回沿用旧评分的报告"""
+        logger.error(f"增量重新分析失败：{str(error)}")
+        if raise_errors:
+            raise RuntimeError("服务暂时不可用，请稍后重试") from None
+        return "服务暂时不可用，请稍后重试"
+    
+    @metrics.timed('analysis')
+    @tracing.traced('LLMProxy.reanalyze_resume')
+    def reanalyze_resume(self, previous: Dict[str, Any], resume_text: str, jd_text: str, target_position: str,
+                         raise_errors: bool = False) -> str:
+        """
+        增量重新分析修改后的简历：与上次分析的简历逐行对比，只重新生成受修改影响的板块和表格行
+        JD或目标岗位有变化时退化为完整分析，简历未修改时直接返回上次的报告
+        
+        Args:
+            previous: 上次的分析记录（包含 resume、jd、target_position、report）
+            resume_text: 修改后的简历文本
+            jd_text: 职位JD文本内容
+            target_position: 目标岗位
+            raise_errors: 为True时输入不完整或调用失败抛出异常，而不是返回提示文本
+            
+        Returns:
+            分析结果文本
+            
+        Raises:
+            ValueError: 输入不完整（仅raise_errors=True时）
+            RuntimeError: 大模型API调用失败，或评分板块、修改内容的表格行生成失败（仅raise_errors=True时）
+        """
+        message = self._validate(resume_text, jd_text, target_position)
+        if message:
+            if raise_errors:
+                raise ValueError(message)
+            return message
+        
+        plan, calls = self._plan_reanalysis(previous, resume_text, jd_text, target_position)
+        if plan is None:
+            if same_material(previous.get('resume'), resume_text) and previous.get('report'):
+                return previous['report']
+            return self.analyze_resume(resume_text, jd_text, target_position, raise_errors=raise_errors)
+        
+        cache_key, cached = self._lookup_cache(resume_text, jd_text, target_position)
+        if cached is not None:
+            return cached
+        
+        try:
+            content, complete = self._merge_reanalysis(plan, self._complete_all(calls))
+        except RuntimeError as e:
+            return self._reanalysis_failed(e, raise_errors)
+        if cache_key and complete:
+            self.cache.set(cache_key, content)
+        return content
+    
+    @metrics.timed('analysis')
+    @tracing.traced('LLMProxy.areanalyze_resume')
+    async def areanalyze_resume(self, previous: Dict[str, Any], resume_text: str, jd_text: str,
+                                target_position: str, raise_errors: bool = False) -> str:
+        """增量重新分析修改后的简历（reanalyze_resume 的异步版本）"""
+        message = self._validate(resume_text, jd_text, target_position)
+        if message:
+            if raise_errors:
+                raise ValueError(message)
+            return message
+        
+        plan, calls = self._plan_reanalysis(previous, resume_text, jd_text, target_position)
+        if plan is None:
+            if same_material(previous.get('resume'), resume_text) and previous.get('report'):
+                return previous['report']
+            return await self.aanalyze_resume(resume_text, jd_text, target_position, raise_errors=raise_errors)
+        
+        cache_key, cached = await self._alookup_cache(resume_text, jd_text, target_position)
+        if cached is not None:
+            return cached
+        
+        try:
+            content, complete = self._merge_reanalysis(plan, await self._acomplete_all(calls))
+        except RuntimeError as e:
+            return self._reanalysis_failed(e, raise_errors)
+        if cache_key and complete:
+            await self._acache_set(cache_key, content)
+        return content
+    
+    @metrics.timed('analysis')
+    @tracing.traced('LLMProxy.aanalyze_resume')
+    async def aanalyze_resume(self, resume_text: str, jd_text: str, target_position: str,
+                              raise_errors: bool = False) -> str:
+        """
+        异步分析简历与岗位匹配度（analyze_resume 的异步版本，等待模型响应期间不占用线程）
+        
+        Args:
+            resume_text: 简历文本内容
+            jd_text: 职位JD文本内容
+            target_position: 目标岗位
+            raise_errors: 为True时输入不完整或调用失败抛出异常，而不是返回提示文本
+            
+        Returns:
+            分析结果文本
+        """
+        message = self._validate(resume_text, jd_text, target_position)
+        if message:
+            if raise_errors:
+                raise ValueError(message)
+            return message
+        
+        cache_key, cached = await self._alookup_cache(resume_text, jd_text, target_position)
+        if cached is not None:
+            return cached
+        
+        try:
+            logger.info(f"开始分析简历，目标岗位：{target_position}")
+            
+            if self.section_parallel:
+                content, complete = await self._agenerate_sections(resume_text, jd_text, target_position)
+            else:
+                response = await self.llm.acreate(
+                    model=self.model,
+                    messages=self._build_messages(resume_text, jd_text, target_position)
+                )
+                content, complete = response.choices[0].message.content, True
+            
+            logger.info(f"简历分析完成，目标岗位：{target_position}")
+            
+            # 含占位板块的报告不缓存，下次请求重新生成
+            if cache_key and content and complete:
+                await self._acache_set(cache_key, content)
+            return content
+            
+        except Exception as e:
+            # 避免泄露密钥相关错误信息
+            logger.error(f"大模型API调用失败：{str(e)}")
+            if raise_errors:
+                raise RuntimeError("服务暂时不可用，请稍后重试") from None
+            return "服务暂时不可用，请稍后重试"
+    
+    @metrics.timed('analysis')
+    @tracing.traced('LLMProxy.aanalyze_resume_stream')
+    async def aanalyze_resume_stream(self, resume_text: str, jd_text: str, target_position: str) -> AsyncIterator[str]:
+        """
+        异步流式分析简历与岗位匹配度（analyze_resume_stream 的异步版本）
+        
+        Args:
+            resume_text: 简历文本内容
+            jd_text: 职位JD文本内容
+            target_position: 目标岗位
+            
+        Yields:
+            分析结果文本增量
+            
+        Raises:
+            RuntimeError: 大模型API调用失败（不包含原始错误信息）
+        """
+        message = self._validate(resume_text, jd_text, target_position)
+        if message:
+            yield message
+            return
+        
+        cache_key, cached = await self._alookup_cache(resume_text, jd_text, target_position)
+        if cached is not None:
+            yield cached
+            return
+        
+        try:
+            logger.info(f"开始流式分析简历，目标岗位：{target_position}")
+            
+            chunks = []
+            async for delta in self.llm.astream(
+                model=self.model,
+                messages=self._build_messages(resume_text, jd_text, target_position)
+            ):
+                chunks.append(delta)
+                yield delta
+            
+            if cache_key and chunks:
+                await self._acache_set(cache_key, ''.join(chunks))
+            
+            logger.info(f"流式简历分析完成，目标岗位：{target_position}")
+        except Exception as e:
+            # 避免泄露密钥相关错误信息
+            logger.error(f"大模型API流式调用失败：{str(e)}")
+            raise RuntimeError("服务暂时不可用，请稍后重试") from None
 
 # 创建全局代理实例
 llm_proxy = None
 try:
-    llm_proxy = LLMProxy()
+    llm_proxy = LLMProxy(cache=build_result_cache())
     logger.info("大模型API代理初始化成功")
 except Exception as e:
     logger.error(f"大模型API代理初始化失败：{str(e)}")
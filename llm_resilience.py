@@ -0,0 +1,633 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+大模型调用的弹性控制
+为OpenAI兼容接口的调用提供共享的长连接客户端、单次调用总时限、429/5xx的指数退避重试（带随机抖动）、
+与服务商配额匹配的并发上限，以及上游故障时快速失败的熔断器；同步与异步调用共用同一套策略
+"""
+
+import os
+import time
+import random
+import asyncio
+import logging
+import threading
+import itertools
+import weakref
+import inspect
+import functools
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Iterator, AsyncIterator
+
+import openai
+from openai import OpenAI, AsyncOpenAI
+
+import metrics
+import tracing
+
+logger = logging.getLogger(__name__)
+
+# 单次尝试的连接超时与读取超时（秒）
+LLM_CONNECT_TIMEOUT = float(os.getenv('LLM_CONNECT_TIMEOUT', 10))
+LLM_READ_TIMEOUT = float(os.getenv('LLM_READ_TIMEOUT', 120))
+# 单次调用（含排队与全部重试）的总时限（秒）
+LLM_DEADLINE = float(os.getenv('LLM_DEADLINE', 180))
+# 最大重试次数与退避参数（秒）
+LLM_MAX_RETRIES = int(os.getenv('LLM_MAX_RETRIES', 3))
+LLM_BACKOFF_BASE = float(os.getenv('LLM_BACKOFF_BASE', 0.5))
+LLM_BACKOFF_MAX = float(os.getenv('LLM_BACKOFF_MAX', 8))
+# 同时进行的大模型调用数上限，应与服务商的并发配额一致
+LLM_MAX_CONCURRENCY = int(os.getenv('LLM_MAX_CONCURRENCY', 16))
+# 熔断器：连续失败多少次后熔断，熔断后多久（秒）放行试探请求
+LLM_BREAKER_THRESHOLD = int(os.getenv('LLM_BREAKER_THRESHOLD', 5))
+LLM_BREAKER_RECOVERY = float(os.getenv('LLM_BREAKER_RECOVERY', 30))
+# 异步客户端连接池分片数：httpx连接池分配连接的开销随排队请求数线性增长，
+# 数百个并发请求集中在同一个连接池时会明显增加延迟，分散到多个连接池可避免
+LLM_ASYNC_POOLS = max(1, int(os.getenv('LLM_ASYNC_POOLS', 8)))
+
+# 流式调用时是否请求服务端在最后一个分片中返回token用量（stream_options.include_usage）
+LLM_STREAM_USAGE = os.getenv('LLM_STREAM_USAGE', '1') == '1'
+
+# 熔断器状态
+BREAKER_CLOSED = 'closed'
+BREAKER_OPEN = 'open'
+BREAKER_HALF_OPEN = 'half_open'
+
+
+class CircuitOpenError(RuntimeError):
+    """熔断器处于打开状态，调用被直接拒绝"""
+
+
+class DeadlineExceededError(TimeoutError):
+    """调用超过总时限"""
+
+
+class CircuitBreaker:
+    """连续失败计数熔断器，线程安全"""
+
+    def __init__(self, failure_threshold: int = LLM_BREAKER_THRESHOLD,
+                 recovery_timeout: float = LLM_BREAKER_RECOVERY):
+        """
+        初始化熔断器
+
+        Args:
+            failure_threshold: 连续失败多少次后熔断
+            recovery_timeout: 熔断后多久进入半开状态，放行一个试探请求
+        """
+        self.failure_threshold = failure_threshold
+        self.recovery_timeout = recovery_timeout
+        self.state = BREAKER_CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.rejected = 0
+        self._probing = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        """判断是否放行本次调用"""
+        with self._lock:
+            if self.state == BREAKER_OPEN and time.monotonic() - self.opened_at >= self.recovery_timeout:
+                self.state = BREAKER_HALF_OPEN
+                self._probing = False
+            if self.state == BREAKER_CLOSED:
+                return True
+            if self.state == BREAKER_HALF_OPEN and not self._probing:
+                # 半开状态只放行一个试探请求，其余请求继续快速失败
+                self._probing = True
+                return True
+            self.rejected += 1
+            return False
+
+    def allow_retry(self) -> bool:
+        """
+        已放行的调用在重试前检查（不占用试探名额、不计入拒绝数）：只有关闭状态下才继续重试，
+        熔断打开或半开（试探请求本身失败）时应放弃重试
+        """
+        with self._lock:
+            return self.state == BREAKER_CLOSED
+
+    def release_probe(self):
+        """试探请求未得出结论（如被调用方放弃）时释放试探名额，允许下一个请求继续试探"""
+        with self._lock:
+            if self.state == BREAKER_HALF_OPEN:
+                self._probing = False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != BREAKER_CLOSED:
+                logger.info("大模型服务恢复，熔断器关闭")
+            self.state = BREAKER_CLOSED
+            self.failures = 0
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == BREAKER_HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != BREAKER_OPEN:
+                    logger.warning(f"大模型服务连续失败{self.failures}次，熔断{self.recovery_timeout}秒")
+                self.state = BREAKER_OPEN
+                self.opened_at = time.monotonic()
+                self._probing = False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'state': self.state, 'failures': self.failures, 'rejected': self.rejected}
+
+
+class TokenUsage:
+    """累计token用量，区分命中服务商前缀缓存与未命中的输入token"""
+
+    def __init__(self):
+        self.calls = 0
+        self.prompt_tokens = 0
+        self.cached_prompt_tokens = 0
+        self.completion_tokens = 0
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _read(obj, name: str) -> int:
+        value = obj.get(name) if isinstance(obj, dict) else getattr(obj, name, None)
+        return int(value or 0)
+
+    def record(self, usage) -> Optional[Dict[str, int]]:
+        """
+        记录一次调用的用量
+
+        Args:
+            usage: 响应中的usage对象，为None时忽略
+
+        Returns:
+            本次调用的 {'prompt_tokens', 'cached_prompt_tokens', 'completion_tokens'}
+        """
+        if usage is None:
+            return None
+        details = usage.get('prompt_tokens_details') if isinstance(usage, dict) else getattr(usage, 'prompt_tokens_details', None)
+        current = {
+            'prompt_tokens': self._read(usage, 'prompt_tokens'),
+            'cached_prompt_tokens': self._read(details, 'cached_tokens') if details else 0,
+            'completion_tokens': self._read(usage, 'completion_tokens'),
+        }
+        metrics.LLM_TOKENS.inc(current['prompt_tokens'] - current['cached_prompt_tokens'], kind='prompt_uncached')
+        metrics.LLM_TOKENS.inc(current['cached_prompt_tokens'], kind='prompt_cached')
+        metrics.LLM_TOKENS.inc(current['completion_tokens'], kind='completion')
+        tracing.set_attribute('gen_ai.usage.input_tokens', current['prompt_tokens'])
+        tracing.set_attribute('gen_ai.usage.cached_input_tokens', current['cached_prompt_tokens'])
+        tracing.set_attribute('gen_ai.usage.output_tokens', current['completion_tokens'])
+        with self._lock:
+            self.calls += 1
+            self.prompt_tokens += current['prompt_tokens']
+            self.cached_prompt_tokens += current['cached_prompt_tokens']
+            self.completion_tokens += current['completion_tokens']
+        logger.info(
+            f"token用量：输入{current['prompt_tokens']}（缓存命中{current['cached_prompt_tokens']}），"
+            f"输出{current['completion_tokens']}"
+        )
+        return current
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'prompt_tokens': self.prompt_tokens,
+                'cached_prompt_tokens': self.cached_prompt_tokens,
+                'uncached_prompt_tokens': self.prompt_tokens - self.cached_prompt_tokens,
+                'completion_tokens': self.completion_tokens,
+                'prompt_cache_hit_rate': self.cached_prompt_tokens / self.prompt_tokens if self.prompt_tokens else 0.0,
+            }
+
+
+class RetryPolicy:
+    """429/5xx及网络错误的指数退避重试策略"""
+
+    def __init__(self, max_retries: int = LLM_MAX_RETRIES, base_delay: float = LLM_BACKOFF_BASE,
+                 max_delay: float = LLM_BACKOFF_MAX):
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    @staticmethod
+    def is_retryable(error: Exception) -> bool:
+        """限流、服务端错误、超时和连接错误可以重试，其余4xx错误重试也不会成功"""
+        if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError, openai.RateLimitError)):
+            return True
+        if isinstance(error, openai.APIStatusError):
+            return error.status_code >= 500
+        return False
+
+    @staticmethod
+    def counts_as_failure(error: Exception) -> bool:
+        """是否计入熔断器的失败次数，请求本身有误（4xx，限流除外）不代表上游故障"""
+        return RetryPolicy.is_retryable(error) and not isinstance(error, openai.RateLimitError)
+
+    def backoff(self, attempt: int, error: Optional[Exception] = None) -> float:
+        """
+        计算第attempt次重试前的等待时间：服务端给出Retry-After时优先遵循，否则使用全抖动指数退避
+
+        Args:
+            attempt: 重试序号（从0开始）
+            error: 触发重试的异常
+        """
+        response = getattr(error, 'response', None)
+        retry_after = response.headers.get('retry-after') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.max_delay)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+
+def _instrumented(mode: str):
+    """
+    记录调用总耗时（含排队与重试）与结果；流式调用另记录首个文本增量的延迟
+
+    Args:
+        mode: complete（非流式）或 stream（流式）
+    """
+    def observe(start: float, outcome: str):
+        metrics.LLM_REQUEST_SECONDS.observe(time.perf_counter() - start, mode=mode, outcome=outcome)
+
+    def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def async_gen_wrapper(*args, **kwargs):
+                start, outcome, first = time.perf_counter(), 'error', True
+                try:
+                    async for delta in func(*args, **kwargs):
+                        if first:
+                            metrics.LLM_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - start, mode=mode)
+                            first = False
+                        yield delta
+                    outcome = 'ok'
+                except GeneratorExit:
+                    outcome = 'cancelled'
+                    raise
+                finally:
+                    observe(start, outcome)
+            return async_gen_wrapper
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def gen_wrapper(*args, **kwargs):
+                start, outcome, first = time.perf_counter(), 'error', True
+                try:
+                    for delta in func(*args, **kwargs):
+                        if first:
+                            metrics.LLM_FIRST_TOKEN_SECONDS.observe(time.perf_counter() - start, mode=mode)
+                            first = False
+                        yield delta
+                    outcome = 'ok'
+                except GeneratorExit:
+                    outcome = 'cancelled'
+                    raise
+                finally:
+                    observe(start, outcome)
+            return gen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                start, outcome = time.perf_counter(), 'error'
+                try:
+                    result = await func(*args, **kwargs)
+                    outcome = 'ok'
+                    return result
+                finally:
+                    observe(start, outcome)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start, outcome = time.perf_counter(), 'error'
+            try:
+                result = func(*args, **kwargs)
+                outcome = 'ok'
+                return result
+            finally:
+                observe(start, outcome)
+        return wrapper
+    return decorator
+
+
+class ResilientLLMClient:
+    """带连接复用、时限、重试、并发上限与熔断的大模型客户端"""
+
+    def __init__(self, api_key: str, base_url: str, max_concurrency: int = LLM_MAX_CONCURRENCY,
+                 deadline: float = LLM_DEADLINE, retry_policy: Optional[RetryPolicy] = None,
+                 breaker: Optional[CircuitBreaker] = None):
+        """
+        初始化客户端
+
+        Args:
+            api_key: API密钥
+            base_url: 接口地址
+            max_concurrency: 同时进行的调用数上限
+            deadline: 单次调用的默认总时限（秒）
+            retry_policy: 重试策略
+            breaker: 熔断器
+        """
+        self.api_key = api_key
+        self.base_url = base_url
+        self.deadline = deadline
+        self.max_concurrency = max_concurrency
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        # 重试由本类统一控制，关闭SDK自带的重试
+        self.timeout = openai.Timeout(LLM_READ_TIMEOUT, connect=LLM_CONNECT_TIMEOUT)
+        self.client = OpenAI(api_key=api_key, base_url=base_url, timeout=self.timeout, max_retries=0)
+        self._async_clients = None
+        self._async_cursor = itertools.count()
+        self._semaphore = threading.BoundedSemaphore(max_concurrency)
+        # asyncio信号量与事件循环绑定，每个事件循环各持有一个
+        self._async_semaphores = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.usage = TokenUsage()
+        self.retries = 0
+        self.deadline_exceeded = 0
+
+    @property
+    def async_client(self) -> AsyncOpenAI:
+        """异步客户端，首次访问时创建，按轮询方式分散到各连接池"""
+        with self._lock:
+            if self._async_clients is None:
+                self._async_clients = [
+                    AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, timeout=self.timeout, max_retries=0)
+                    for _ in range(LLM_ASYNC_POOLS)
+                ]
+        return self._async_clients[next(self._async_cursor) % len(self._async_clients)]
+
+    @_instrumented('complete')
+    @tracing.traced('chat.completions', kind=tracing.KIND_CLIENT)
+    def create(self, deadline: Optional[float] = None, **kwargs):
+        """
+        同步调用 chat.completions.create
+
+        Args:
+            deadline: 本次调用的总时限（秒），默认取实例配置
+            **kwargs: 传给 chat.completions.create 的参数
+
+        Raises:
+            CircuitOpenError: 熔断中
+            DeadlineExceededError: 超过总时限
+        """
+        expires_at = time.monotonic() + (deadline or self.deadline)
+        self._check_breaker()
+        if not self._semaphore.acquire(timeout=self._remaining(expires_at)):
+            self.breaker.release_probe()
+            self._count_deadline()
+            raise DeadlineExceededError("等待大模型并发配额超时")
+        try:
+            for attempt in itertools.count():
+                try:
+                    client = self.client.with_options(timeout=self._attempt_timeout(expires_at))
+                    response = client.chat.completions.create(**self._traced_kwargs(kwargs))
+                    self.breaker.record_success()
+                    self.usage.record(getattr(response, 'usage', None))
+                    return response
+                except Exception as e:
+                    time.sleep(self._handle_error(e, attempt, expires_at))
+        finally:
+            self._semaphore.release()
+            self.breaker.release_probe()
+
+    @_instrumented('stream')
+    @tracing.traced('chat.completions', kind=tracing.KIND_CLIENT)
+    def stream(self, deadline: Optional[float] = None, **kwargs) -> Iterator[str]:
+        """
+        同步流式调用，逐段产出文本增量；只在尚未产出任何内容时重试，避免重复输出
+
+        Args:
+            deadline: 本次调用的总时限（秒），默认取实例配置
+            **kwargs: 传给 chat.completions.create 的参数（无需指定stream）
+        """
+        expires_at = time.monotonic() + (deadline or self.deadline)
+        self._check_breaker()
+        if not self._semaphore.acquire(timeout=self._remaining(expires_at)):
+            self.breaker.release_probe()
+            self._count_deadline()
+            raise DeadlineExceededError("等待大模型并发配额超时")
+        try:
+            for attempt in itertools.count():
+                emitted = False
+                try:
+                    client = self.client.with_options(timeout=self._attempt_timeout(expires_at))
+                    for chunk in client.chat.completions.create(stream=True, **self._stream_kwargs(kwargs)):
+                        self._record_chunk_usage(chunk)
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            if not emitted:
+                                tracing.add_event('first_token', {'attempt': attempt})
+                            emitted = True
+                            yield delta
+                        if time.monotonic() > expires_at:
+                            self._count_deadline()
+                            raise DeadlineExceededError("大模型调用超过总时限")
+                    self.breaker.record_success()
+                    return
+                except DeadlineExceededError as e:
+                    self._record_error(e)
+                    raise
+                except Exception as e:
+                    if emitted:
+                        self._record_error(e)
+                        raise
+                    time.sleep(self._handle_error(e, attempt, expires_at))
+        finally:
+            self._semaphore.release()
+            self.breaker.release_probe()
+
+    @_instrumented('complete')
+    @tracing.traced('chat.completions', kind=tracing.KIND_CLIENT)
+    async def acreate(self, deadline: Optional[float] = None, **kwargs):
+        """异步调用 chat.completions.create，参数与异常同 create"""
+        expires_at = time.monotonic() + (deadline or self.deadline)
+        self._check_breaker()
+        semaphore = self._async_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self._remaining(expires_at))
+        except asyncio.TimeoutError:
+            self.breaker.release_probe()
+            self._count_deadline()
+            raise DeadlineExceededError("等待大模型并发配额超时") from None
+        try:
+            for attempt in itertools.count():
+                try:
+                    client = self.async_client.with_options(timeout=self._attempt_timeout(expires_at))
+                    response = await client.chat.completions.create(**self._traced_kwargs(kwargs))
+                    self.breaker.record_success()
+                    self.usage.record(getattr(response, 'usage', None))
+                    return response
+                except Exception as e:
+                    await asyncio.sleep(self._handle_error(e, attempt, expires_at))
+        finally:
+            semaphore.release()
+            self.breaker.release_probe()
+
+    @_instrumented('stream')
+    @tracing.traced('chat.completions', kind=tracing.KIND_CLIENT)
+    async def astream(self, deadline: Optional[float] = None, **kwargs) -> AsyncIterator[str]:
+        """异步流式调用，参数与重试规则同 stream"""
+        expires_at = time.monotonic() + (deadline or self.deadline)
+        self._check_breaker()
+        semaphore = self._async_semaphore()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), timeout=self._remaining(expires_at))
+        except asyncio.TimeoutError:
+            self.breaker.release_probe()
+            self._count_deadline()
+            raise DeadlineExceededError("等待大模型并发配额超时") from None
+        try:
+            for attempt in itertools.count():
+                emitted = False
+                try:
+                    client = self.async_client.with_options(timeout=self._attempt_timeout(expires_at))
+                    stream = await client.chat.completions.create(stream=True, **self._stream_kwargs(kwargs))
+                    async for chunk in stream:
+                        self._record_chunk_usage(chunk)
+                        delta = chunk.choices[0].delta.content if chunk.choices else None
+                        if delta:
+                            if not emitted:
+                                tracing.add_event('first_token', {'attempt': attempt})
+                            emitted = True
+                            yield delta
+                        if time.monotonic() > expires_at:
+                            self._count_deadline()
+                            raise DeadlineExceededError("大模型调用超过总时限")
+                    self.breaker.record_success()
+                    return
+                except DeadlineExceededError as e:
+                    self._record_error(e)
+                    raise
+                except Exception as e:
+                    if emitted:
+                        self._record_error(e)
+                        raise
+                    await asyncio.sleep(self._handle_error(e, attempt, expires_at))
+        finally:
+            semaphore.release()
+            self.breaker.release_probe()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            data = {
+                'max_concurrency': self.max_concurrency,
+                'retries': self.retries,
+                'deadline_exceeded': self.deadline_exceeded,
+            }
+        data['breaker'] = self.breaker.stats()
+        data['usage'] = self.usage.stats()
+        return data
+
+    @classmethod
+    def _stream_kwargs(cls, kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        kwargs = cls._traced_kwargs(kwargs)
+        if LLM_STREAM_USAGE and 'stream_options' not in kwargs:
+            return dict(kwargs, stream_options={'include_usage': True})
+        return kwargs
+
+    @staticmethod
+    def _traced_kwargs(kwargs: Dict[str, Any]) -> Dict[str, Any]:
+        # 通过traceparent请求头向上游传递追踪上下文，并在当前span上记录请求的模型
+        span = tracing.current_span()
+        if span is None:
+            return kwargs
+        span.set_attribute('gen_ai.request.model', kwargs.get('model'))
+        return dict(kwargs, extra_headers=dict(kwargs.get('extra_headers') or {}, traceparent=span.traceparent))
+
+    def _record_chunk_usage(self, chunk):
+        # 开启include_usage后，用量只出现在最后一个（choices为空的）分片中
+        usage = getattr(chunk, 'usage', None)
+        if usage is not None:
+            self.usage.record(usage)
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            raise CircuitOpenError("大模型服务熔断中")
+
+    def _async_semaphore(self) -> asyncio.Semaphore:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            semaphore = self._async_semaphores.get(loop)
+            if semaphore is None:
+                semaphore = asyncio.Semaphore(self.max_concurrency)
+                self._async_semaphores[loop] = semaphore
+            return semaphore
+
+    @staticmethod
+    def _remaining(expires_at: float) -> float:
+        return max(0.0, expires_at - time.monotonic())
+
+    def _attempt_timeout(self, expires_at: float):
+        remaining = self._remaining(expires_at)
+        if remaining <= 0:
+            self._count_deadline()
+            raise DeadlineExceededError("大模型调用超过总时限")
+        return openai.Timeout(min(LLM_READ_TIMEOUT, remaining), connect=min(LLM_CONNECT_TIMEOUT, remaining))
+
+    def _record_error(self, error: Exception):
+        if RetryPolicy.counts_as_failure(error) or isinstance(error, DeadlineExceededError):
+            self.breaker.record_failure()
+        elif isinstance(error, openai.APIStatusError) and not isinstance(error, openai.RateLimitError):
+            # 上游返回了明确的4xx响应，说明服务本身可用
+            self.breaker.record_success()
+
+    def _handle_error(self, error: Exception, attempt: int, expires_at: float) -> float:
+        """
+        处理一次失败的尝试：不可重试、重试次数用尽或退避后会超过总时限时抛出异常，否则返回退避时间；
+        熔断器按调用计数，只在整次调用放弃时记录一次结果，中间重试的失败不计入
+        """
+        if isinstance(error, DeadlineExceededError) or \
+                not self.retry_policy.is_retryable(error) or attempt >= self.retry_policy.max_retries:
+            self._record_error(error)
+            raise error
+        delay = self.retry_policy.backoff(attempt, error)
+        if delay >= self._remaining(expires_at):
+            self._record_error(error)
+            self._count_deadline()
+            raise DeadlineExceededError("大模型调用超过总时限") from error
+        # 熔断后其余重试直接放弃，不再打到已经故障的上游；半开状态下失败的是试探请求本身，
+        # 先记录失败使熔断器重新打开，否则释放试探名额后熔断器会一直停留在半开状态
+        if not self.breaker.allow_retry():
+            self._record_error(error)
+            raise CircuitOpenError("大模型服务熔断中") from error
+        with self._lock:
+            self.retries += 1
+        tracing.add_event('retry', {'attempt': attempt + 1, 'delay_seconds': delay, 'error.type': type(error).__name__})
+        logger.warning(f"大模型调用失败，{delay:.2f}秒后第{attempt + 1}次重试：{type(error).__name__}")
+        return delay
+
+    def _count_deadline(self):
+        with self._lock:
+            self.deadline_exceeded += 1
+
+
+# 按（密钥, 接口地址）共享的客户端，避免每个请求新建连接池和TLS握手
+_shared_clients = OrderedDict()
+_shared_lock = threading.Lock()
+# 最多保留的共享客户端数（旧入口由用户自行填写密钥，需限制数量）
+SHARED_CLIENT_LIMIT = int(os.getenv('LLM_SHARED_CLIENT_LIMIT', 32))
+
+
+def get_shared_client(api_key: str, base_url: str) -> ResilientLLMClient:
+    """
+    获取进程内共享的客户端，相同密钥与接口地址的调用复用同一个长连接池
+
+    Args:
+        api_key: API密钥
+        base_url: 接口地址
+
+    Returns:
+        ResilientLLMClient实例
+    """
+    key = (api_key, base_url)
+    with _shared_lock:
+        client = _shared_clients.get(key)
+        if client is None:
+            client = ResilientLLMClient(api_key, base_url)
+            _shared_clients[key] = client
+            while len(_shared_clients) > SHARED_CLIENT_LIMIT:
+                _shared_clients.popitem(last=False)
+        else:
+            _shared_clients.move_to_end(key)
+        return client
@@ -0,0 +1,302 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+延迟与用量指标
+进程内的计数器、仪表与直方图，以Prometheus文本格式（0.0.4）在 /metrics 暴露，无需额外依赖；
+按阶段（上传解析、文件提取、OCR、AI分析、报告渲染）记录耗时，并按PRD 8.3的性能要求统计SLO超限次数：
+OCR单张图片≤10秒、AI分析≤30秒、报告生成≤5秒、页面加载≤2秒
+
+说明：
+    - 指标保存在各进程内，多worker部署时由Prometheus分别抓取各进程后聚合
+    - PDF扫描页在OCR进程池中识别，各页耗时由子进程测量后在主进程记录；OCR后端耗时只统计主进程内的调用
+"""
+
+import os
+import time
+import inspect
+import functools
+import threading
+import contextvars
+from typing import Optional, Dict, Tuple, Iterable
+
+# 默认直方图分桶（秒），包含各SLO阈值，便于按 le 直接计算达标率
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2, 5, 10, 15, 30, 60, 120)
+
+# PRD 8.3 性能要求（秒），可通过环境变量调整
+SLO_BUDGETS = {
+    'ocr': float(os.getenv('SLO_OCR_SECONDS', 10)),
+    'analysis': float(os.getenv('SLO_ANALYSIS_SECONDS', 30)),
+    'render': float(os.getenv('SLO_RENDER_SECONDS', 5)),
+    'page_load': float(os.getenv('SLO_PAGE_LOAD_SECONDS', 2)),
+}
+
+# 计入页面加载SLO的视图（Flask与ASGI模式的视图函数同名）
+PAGE_ENDPOINTS = ('index', 'view_report', 'get_asset')
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(names: Iterable[str], values: Iterable[str], extra: str = '') -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return '{' + ','.join(pairs) + '}' if pairs else ''
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) and not value.is_integer() else str(int(value))
+
+
+class _Metric:
+    """指标基类：按标签值分别保存，线程安全"""
+
+    kind = 'untyped'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.labelnames}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self):
+        raise NotImplementedError
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self._samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    """单调递增的计数器"""
+
+    kind = 'counter'
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        with self._lock:
+            return self._values.get(self._key(labels), 0)
+
+    def _samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    """可任意设置的仪表"""
+
+    kind = 'gauge'
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """累积分桶直方图"""
+
+    kind = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                 buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                # [各分桶计数..., 总和, 总数]
+                state = self._values[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    state[i] += 1
+                    break
+            state[-2] += value
+            state[-1] += 1
+
+    def _samples(self):
+        with self._lock:
+            items = sorted((key, list(state)) for key, state in self._values.items())
+        lines = []
+        for key, state in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), state[:len(self.buckets)] + [None]):
+                cumulative = state[-1] if count is None else cumulative + count
+                le = f'le="{_format_value(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(state[-2])}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {state[-1]}")
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表：同名指标只创建一次，按注册顺序输出"""
+
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def _register(self, cls, name: str, documentation: str, labelnames: Tuple[str, ...], **kwargs):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, tuple(labelnames), **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"指标 {name} 已以不同的类型或标签注册")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Counter:
+        return self._register(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Tuple[str, ...] = ()) -> Gauge:
+        return self._register(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram, name, documentation, labelnames, buckets=buckets)
+
+    def render(self) -> str:
+        """Prometheus文本格式"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+        return '\n'.join(metric.render() for metric in metrics) + '\n'
+
+
+# 创建全局指标注册表
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.histogram(
+    'aipm_stage_duration_seconds', '各处理阶段耗时（upload/extraction/ocr/analysis/render）', ('stage',))
+EXTRACTION_SECONDS = registry.histogram(
+    'aipm_extraction_duration_seconds', '各类文件提取器的耗时（不含提取缓存命中）', ('extractor',))
+OCR_BACKEND_SECONDS = registry.histogram(
+    'aipm_ocr_backend_duration_seconds', '各OCR后端单次识别耗时', ('backend', 'outcome'))
+LLM_REQUEST_SECONDS = registry.histogram(
+    'aipm_llm_request_duration_seconds', '单次大模型调用总耗时（含重试）', ('mode', 'outcome'))
+LLM_FIRST_TOKEN_SECONDS = registry.histogram(
+    'aipm_llm_time_to_first_token_seconds', '流式大模型调用的首token延迟', ('mode',))
+LLM_TOKENS = registry.counter(
+    'aipm_llm_tokens_total', '大模型token用量（来自response.usage）', ('kind',))
+HTTP_REQUEST_SECONDS = registry.histogram(
+    'aipm_http_request_duration_seconds', 'HTTP请求处理耗时（流式响应只统计到响应头发出）',
+    ('endpoint', 'method', 'status'))
+SLO_BUDGET = registry.gauge('aipm_slo_budget_seconds', 'PRD 8.3规定的耗时上限', ('slo',))
+SLO_EVENTS = registry.counter('aipm_slo_events_total', '计入SLO的事件数', ('slo',))
+SLO_VIOLATIONS = registry.counter('aipm_slo_violations_total', '超过SLO耗时上限的事件数', ('slo',))
+
+for _slo, _budget in SLO_BUDGETS.items():
+    SLO_BUDGET.set(_budget, slo=_slo)
+    SLO_EVENTS.inc(0, slo=_slo)
+    SLO_VIOLATIONS.inc(0, slo=_slo)
+
+
+def check_slo(slo: str, seconds: float):
+    """记录一次SLO事件，超过上限时计入超限次数"""
+    budget = SLO_BUDGETS.get(slo)
+    if budget is None:
+        return
+    SLO_EVENTS.inc(slo=slo)
+    if seconds > budget:
+        SLO_VIOLATIONS.inc(slo=slo)
+
+
+def observe_stage(stage: str, seconds: float):
+    """记录阶段耗时；阶段名与SLO同名时同时检查SLO"""
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    check_slo(stage, seconds)
+
+
+def observe_request(endpoint: Optional[str], method: str, status: int, seconds: float):
+    """记录HTTP请求耗时，页面类视图同时计入页面加载SLO"""
+    HTTP_REQUEST_SECONDS.observe(seconds, endpoint=endpoint or 'unmatched', method=method, status=status)
+    if endpoint in PAGE_ENDPOINTS and status < 500:
+        check_slo('page_load', seconds)
+
+
+# 当前调用链中正在计时的阶段，同一阶段嵌套调用（如增量重新分析退化为完整分析）时只记录最外层
+_active_stages = contextvars.ContextVar('active_stages', default=frozenset())
+
+
+def timed(stage: str):
+    """
+    记录函数耗时的装饰器，支持普通函数、协程、生成器与异步生成器（生成器从开始迭代计时到迭代结束）
+
+    Args:
+        stage: 阶段名
+    """
+    def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def async_gen_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    async for item in func(*args, **kwargs):
+                        yield item
+                finally:
+                    observe_stage(stage, time.perf_counter() - start)
+            return async_gen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                active = _active_stages.get()
+                if stage in active:
+                    return await func(*args, **kwargs)
+                token = _active_stages.set(active | {stage})
+                start = time.perf_counter()
+                try:
+                    return await func(*args, **kwargs)
+                finally:
+                    observe_stage(stage, time.perf_counter() - start)
+                    _active_stages.reset(token)
+            return async_wrapper
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def gen_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                try:
+                    yield from func(*args, **kwargs)
+                finally:
+                    observe_stage(stage, time.perf_counter() - start)
+            return gen_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            active = _active_stages.get()
+            if stage in active:
+                return func(*args, **kwargs)
+            token = _active_stages.set(active | {stage})
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                observe_stage(stage, time.perf_counter() - start)
+                _active_stages.reset(token)
+        return wrapper
+    return decorator
+
+
+def render() -> Tuple[str, str]:
+    """返回 (响应体, Content-Type)"""
+    return registry.render(), CONTENT_TYPE
@@ -1,4 +1,5 @@
-from openai import OpenAI
+from llm_resilience import get_shared_client
+from prompts import build_messages
 import pdfplumber
 from PIL import Image
 import pytesseract
@@ -6,13 +7,17 @@ import numpy as np
 import requests
 import io
 import base64
+import os
 from flask import Flask, render_template_string, request, redirect, url_for, flash, session
-from paddleocr import PaddleOCRVL
+from ocr_engines import ocr_engines
 
 # 创建Flask应用
 app = Flask(__name__)
 app.secret_key = 'supersecretkey'  # 用于session管理
 
+# OCR调试结果输出目录，为空时不输出
+OCR_DEBUG_OUTPUT_DIR = os.getenv('OCR_DEBUG_OUTPUT_DIR', '')
+
 # 目标岗位改为用户自定义输入
 
 def ocr_olmocr(image):
@@ -20,18 +25,15 @@ def ocr_olmocr(image):
     使用OCR OlmOCR进行文字识别
     """
     try:
-        # 将图像转换为base64
-        buffer = io.BytesIO()
-        image.save(buffer, format="PNG")
-        img_base64 = base64.b64encode(buffer.getvalue()).decode('utf-8')
-        
-        # 使用PaddleOCRVL进行OCR识别
-        pipeline = PaddleOCRVL()
-        output = pipeline.predict(img_base64)
-        for res in output:
-            res.print()
-            res.save_to_json(save_path="output")
-            res.save_to_markdown(save_path="output")
+        # 使用进程内共享的PaddleOCRVL流水线进行OCR识别，避免每次调用重新加载模型
+        # 图像以numpy数组直接传入，不再经过PNG编码和base64转换
+        output = ocr_engines.paddleocr_vl(image)
+        # 仅在显式配置调试目录时输出识别结果文件
+        if OCR_DEBUG_OUTPUT_DIR:
+            for res in output:
+                res.print()
+                res.save_to_json(save_path=OCR_DEBUG_OUTPUT_DIR)
+                res.save_to_markdown(save_path=OCR_DEBUG_OUTPUT_DIR)
 
         try:
             # 尝试直接调用API (这里暂时注释掉，因为api_url未定义)
@@ -46,11 +48,11 @@ def ocr_olmocr(image):
         except:
             # 如果直接API调用失败，尝试使用备用方案（如使用paddleocr本地库）
             # 这里使用pytesseract作为备用方案
-            return pytesseract.image_to_string(image, lang='chi_sim+eng')
+            return ocr_engines.tesseract(image, lang='chi_sim+eng')
     except Exception as e:
         print(f"OCR OlmOCR错误: {e}")
         # 出错时使用pytesseract作为备用
-        return pytesseract.image_to_string(image, lang='chi_sim+eng')
+        return ocr_engines.tesseract(image, lang='chi_sim+eng')
 
 def extract_file_content(uploaded_file): # 从上传的文件中提取内容
     if uploaded_file is None:
@@ -154,18 +156,12 @@ def analyze_resume_with_AI(resume_text: str, jd_text: str, target_position: str,
     if not api_key:
         return "请输入你的OpenAI API Key"
 
-    client = OpenAI(
-        api_key=api_key,
-        base_url="https://dashscope.aliyuncs.com/compatible-mode/v1",
-    )
-    prompt = f"请基于以下候选人简历文本和目标岗位JD文本，生成一份结构清晰、核心信息用表格呈现的岗位匹配度分析报告，严格遵循以下模块和格式要求：\n\n### 输入材料\n1. 候选人简历文本：{resume_text}\n2. 目标岗位 JD 文本：{jd_text}\n\n### 输出格式要求\n---\n## 一、评分与分析理由板块\n1. **整体评分**：给出0-10分的综合得分\n2. **综合评价**：150字左右的总述，突出匹配亮点与核心短板\n3. **维度拆解分析**：必须用表格呈现，表格列固定为「维度|评分 (/10)|分析理由」，维度包含：\n   - 岗位匹配度\n   - 工作经验相关性\n   - 技能掌握程度\n   - 教育背景契合度\n   - 软技能与岗位适配性\n4. **主要差距总结**：用项目符号列出3-5条最核心的不匹配点\n\n---\n## 二、对照岗位 JD 逐条修改简历板块\n必须用表格呈现，表格列固定为「简历现有内容|岗位 JD 要求|差异分析|修改建议」，需将简历中所有与 JD 相关的条目逐一对应分析，并给出可直接替换的改写话术。\n\n---\n## 三、面试可能问的问题板块\n列出8-10个高针对性问题，每个问题后用「⚠️」标注考察点，例如：\n1. 你在实习中提到「构建多维度测评体系」，能否详细说明你是如何定义「准确性」和「逻辑性」的？⚠️ 考察数据质量把控能力和标准化思维\n\n---\n## 四、职业发展路径板块\n分「短期 (1-3年)」「中期 (3-5年)」「长期 (5年以上)」三个阶段，每个阶段包含：\n- 目标职位\n- 核心任务 / 能力升级重点\n- 行动建议（用「✅」标注具体动作）\n\n---\n## 五、结语建议板块\n给候选人的投递/面试策略总结，3-4条可落地的行动建议。\n\n---\n### 格式约束\n- 所有对比类、评分类内容必须用表格呈现，禁止纯文本堆砌\n- 每个板块用「---」分隔，标题用「#」「##」分级，保持视觉清晰\n- 语言需专业、简洁，避免冗余表述\n\n要求分析全面、具体，避免模板化回复，完全基于提供的JD和简历内容"
+    # 复用按密钥共享的客户端（长连接池），并带超时、重试与熔断
+    client = get_shared_client(api_key, "https://dashscope.aliyuncs.com/compatible-mode/v1")
 
-    response = client.chat.completions.create(
+    response = client.create(
         model="qwen-plus",
-        messages=[
-            {"role": "system", "content": "你是一个专业的简历分析助手，根据简历内容给出专业的评分和分析建议"},
-            {"role": "user", "content": prompt}
-        ],
+        messages=build_messages(resume_text, jd_text, target_position),
         max_tokens=1500
     )
     return response.choices[0].message.content
@@ -391,4 +387,6 @@ def index():
 
 # 运行Flask应用
 if __name__ == '__main__':
+    # 后台预热PaddleOCRVL模型，避免首个请求承担模型加载耗时
+    ocr_engines.warmup_in_background(['paddleocr_vl'])
     app.run(debug=True, port=5000)
@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+OCR引擎管理
+每个进程内对每种OCR后端只加载一次模型并在请求间复用，支持启动预热、
+按后端限制并发，并记录模型加载耗时与每次识别耗时；
+识别入口 ocr_image 也在本模块中，PDF扫描页的OCR进程池子进程只需导入本模块，不会加载Web服务
+"""
+
+import io
+import os
+import time
+import logging
+import threading
+import subprocess
+from typing import Optional, Dict, Any, Callable, Iterable
+
+import metrics
+import tracing
+from image_preprocess import preprocess_for_ocr
+
+logger = logging.getLogger(__name__)
+
+# OCR识别语言
+OCR_LANGUAGES = os.getenv('OCR_LANGUAGES', 'chi_sim+eng')
+# 是否在OCR前进行图像预处理（分辨率归一化、二值化、倾斜校正等）
+OCR_PREPROCESS = os.getenv('OCR_PREPROCESS', '1') == '1'
+
+TESSERACT = 'tesseract'
+EASYOCR = 'easyocr'
+PADDLEOCR_VL = 'paddleocr_vl'
+
+# 服务启动时预热的后端，默认只预热首选的tesseract；easyocr仅作备用，
+# 每个工作进程都预加载会占用大量内存，需要时通过 OCR_WARMUP=tesseract,easyocr 开启
+OCR_WARMUP = [b.strip() for b in os.getenv('OCR_WARMUP', TESSERACT).split(',') if b.strip()]
+
+
+class OCRBackendUnavailable(Exception):
+    """OCR后端未安装或加载失败"""
+
+
+class OCRTimeout(Exception):
+    """识别超过时限，识别进程已被终止"""
+
+
+class _BackendStats:
+    """单个后端的加载与调用统计"""
+
+    def __init__(self):
+        self.load_seconds = None
+        self.calls = 0
+        self.errors = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'load_seconds': round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            'calls': self.calls,
+            'errors': self.errors,
+            'total_seconds': round(self.total_seconds, 3),
+            'avg_seconds': round(self.total_seconds / self.calls, 3) if self.calls else 0.0,
+            'max_seconds': round(self.max_seconds, 3),
+        }
+
+
+class OCREngineManager:
+    """OCR引擎管理器，进程内单例使用"""
+
+    def __init__(self, easyocr_languages: Iterable[str] = ('ch_sim', 'en'),
+                 concurrency: Optional[Dict[str, int]] = None):
+        """
+        初始化管理器（不会立即加载模型）
+
+        Args:
+            easyocr_languages: EasyOCR识别语言
+            concurrency: 各后端允许的最大并发调用数
+        """
+        self.easyocr_languages = list(easyocr_languages)
+        concurrency = concurrency or {}
+        self._semaphores = {
+            # tesseract每次调用是独立子进程，可按CPU核数并发
+            TESSERACT: threading.BoundedSemaphore(concurrency.get(TESSERACT, os.cpu_count() or 1)),
+            # 深度学习模型实例的线程安全性无保证，默认串行推理
+            EASYOCR: threading.BoundedSemaphore(concurrency.get(EASYOCR, 1)),
+            PADDLEOCR_VL: threading.BoundedSemaphore(concurrency.get(PADDLEOCR_VL, 1)),
+        }
+        self._engines = {}
+        self._load_errors = {}
+        self._load_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats = {name: _BackendStats() for name in self._semaphores}
+
+    def _load(self, backend: str, factory: Callable[[], Any]):
+        engine = self._engines.get(backend)
+        if engine is not None:
+            return engine
+        with self._load_lock:
+            engine = self._engines.get(backend)
+            if engine is not None:
+                return engine
+            if backend in self._load_errors:
+                raise OCRBackendUnavailable(self._load_errors[backend])
+
+            start = time.perf_counter()
+            try:
+                engine = factory()
+            except Exception as e:
+                # 记住加载失败的结果（未安装、模型文件缺失等），避免每次请求重复加载
+                logger.error(f"OCR后端 {backend} 加载失败：{e}")
+                self._load_errors[backend] = str(e)
+                raise OCRBackendUnavailable(str(e)) from e
+            elapsed = time.perf_counter() - start
+
+            self._engines[backend] = engine
+            with self._stats_lock:
+                self._stats[backend].load_seconds = elapsed
+            logger.info(f"OCR后端 {backend} 加载完成，耗时 {elapsed:.2f}s")
+            return engine
+
+    def _create_easyocr(self):
+        import easyocr
+        return easyocr.Reader(
+            self.easyocr_languages,
+            gpu=False,  # 禁用GPU，使用CPU
+            download_enabled=False,  # 禁用自动下载
+            user_network_directory='/tmp/EasyOCR'  # 指定可写的临时目录
+        )
+
+    def _create_paddleocr_vl(self):
+        from paddleocr import PaddleOCRVL
+        return PaddleOCRVL()
+
+    def get_easyocr(self):
+        """获取进程内共享的EasyOCR Reader"""
+        return self._load(EASYOCR, self._create_easyocr)
+
+    def get_paddleocr_vl(self):
+        """获取进程内共享的PaddleOCRVL流水线"""
+        return self._load(PADDLEOCR_VL, self._create_paddleocr_vl)
+
+    def run(self, backend: str, func: Callable[..., Any], *args, **kwargs):
+        """
+        在并发限制下执行一次识别调用，并记录耗时
+
+        Args:
+            backend: 后端名称
+            func: 实际执行识别的函数
+            *args, **kwargs: 传给识别函数的参数
+
+        Returns:
+            识别函数的返回值
+        """
+        with tracing.span(f'ocr.{backend}') as span, self._semaphores[backend]:
+            start = time.perf_counter()
+            # 等待并发配额的时间，慢请求排查时区分排队与识别本身
+            span.set_attribute('ocr.wait_seconds', round(span.duration, 6))
+            ok = False
+            try:
+                result = func(*args, **kwargs)
+                ok = True
+                return result
+            finally:
+                elapsed = time.perf_counter() - start
+                metrics.OCR_BACKEND_SECONDS.observe(elapsed, backend=backend, outcome='ok' if ok else 'error')
+                with self._stats_lock:
+                    stats = self._stats[backend]
+                    stats.calls += 1
+                    stats.total_seconds += elapsed
+                    stats.max_seconds = max(stats.max_seconds, elapsed)
+                    if not ok:
+                        stats.errors += 1
+
+    def tesseract(self, image, lang: str, timeout: Optional[float] = None) -> str:
+        """
+        使用tesseract识别图像
+        
+        图像以无压缩的PNM格式经标准输入传给tesseract，结果从标准输出读取，
+        不经过PNG编码，也不在磁盘上生成临时文件
+
+        Raises:
+            OCRTimeout: 超过timeout（秒）仍未完成，tesseract进程已被终止
+        """
+        import pytesseract
+
+        if image.mode not in ('RGB', 'L', '1'):
+            image = image.convert('RGB')
+        buffer = io.BytesIO()
+        image.save(buffer, format='PPM')
+
+        def _run(data: bytes) -> str:
+            try:
+                completed = subprocess.run(
+                    [pytesseract.pytesseract.tesseract_cmd, 'stdin', 'stdout', '-l', lang],
+                    input=data,
+                    stdout=subprocess.PIPE,
+                    stderr=subprocess.PIPE,
+                    timeout=timeout
+                )
+            except FileNotFoundError:
+                raise pytesseract.TesseractNotFoundError()
+            except subprocess.TimeoutExpired:
+                raise OCRTimeout(f"tesseract识别超过{timeout:.1f}秒") from None
+            if completed.returncode != 0:
+                raise pytesseract.TesseractError(
+                    completed.returncode, completed.stderr.decode('utf-8', errors='replace').strip()
+                )
+            return completed.stdout.decode('utf-8', errors='replace')
+
+        return self.run(TESSERACT, _run, buffer.getvalue())
+
+    def easyocr(self, image) -> str:
+        """使用共享的EasyOCR Reader识别图像（PIL图像以numpy数组传入），返回按行拼接的文本"""
+        import numpy as np
+
+        reader = self.get_easyocr()
+        if hasattr(image, 'convert'):
+            image = np.asarray(image.convert('RGB'))
+        result = self.run(EASYOCR, reader.readtext, image)
+        text = ""
+        for detection in result:
+            if len(detection) >= 2:
+                text += detection[1] + "\n"
+        return text
+
+    def paddleocr_vl(self, image):
+        """使用共享的PaddleOCRVL流水线识别图像（PIL图像以BGR数组传入），返回原始预测结果列表"""
+        import numpy as np
+
+        pipeline = self.get_paddleocr_vl()
+        if hasattr(image, 'convert'):
+            image = np.ascontiguousarray(np.asarray(image.convert('RGB'))[:, :, ::-1])
+        return self.run(PADDLEOCR_VL, lambda data: list(pipeline.predict(data)), image)
+
+    def warmup(self, backends: Iterable[str]):
+        """
+        预加载指定后端的模型，未安装的后端会被跳过
+
+        Args:
+            backends: 需要预热的后端名称
+        """
+        loaders = {
+            EASYOCR: self.get_easyocr,
+            PADDLEOCR_VL: self.get_paddleocr_vl,
+        }
+        for backend in backends:
+            if backend == TESSERACT:
+                # tesseract为命令行程序，预热只校验可执行文件是否可用
+                try:
+                    import pytesseract
+                    pytesseract.get_tesseract_version()
+                except Exception as e:
+                    logger.warning(f"tesseract不可用：{e}")
+                continue
+            loader = loaders.get(backend)
+            if loader is None:
+                logger.warning(f"未知的OCR后端：{backend}")
+                continue
+            try:
+                loader()
+            except Exception as e:
+                logger.warning(f"OCR后端 {backend} 预热失败：{e}")
+
+    def warmup_in_background(self, backends: Iterable[str]) -> threading.Thread:
+        """在后台线程中预热，避免阻塞服务启动"""
+        thread = threading.Thread(target=self.warmup, args=(list(backends),), name='ocr-warmup', daemon=True)
+        thread.start()
+        return thread
+
+    def stats(self) -> Dict[str, Any]:
+        """返回各后端的加载状态与调用统计"""
+        with self._stats_lock:
+            return {
+                name: dict(stats.to_dict(), loaded=name in self._engines)
+                for name, stats in self._stats.items()
+            }
+
+
+def _env_concurrency() -> Dict[str, int]:
+    concurrency = {}
+    for backend in (TESSERACT, EASYOCR, PADDLEOCR_VL):
+        value = os.getenv(f'OCR_{backend.upper()}_CONCURRENCY')
+        if value:
+            concurrency[backend] = int(value)
+    return concurrency
+
+
+# 创建全局OCR引擎管理器
+ocr_engines = OCREngineManager(concurrency=_env_concurrency())
+
+
+@metrics.timed('ocr')
+@tracing.traced('ocr_image')
+def ocr_image(image, deadline: Optional[float] = None) -> str:
+    """
+    识别图像中的文字：tesseract优先（CPU友好），失败时使用EasyOCR兜底；
+    图像全程在内存中传递给各OCR后端，不落盘。需为模块级函数，以便传递给OCR进程池
+
+    Args:
+        image: PIL图像
+        deadline: 识别截止时间（time.time()时间戳），超过后终止tesseract且不再尝试其他后端
+
+    Returns:
+        识别出的文本；失败时返回形如「（...）」的提示信息
+
+    Raises:
+        OCRTimeout: 超过截止时间
+    """
+    # 预处理：缩放到OCR最佳分辨率、灰度化、二值化、倾斜校正并裁剪空白边
+    if OCR_PREPROCESS:
+        try:
+            image = preprocess_for_ocr(image)
+        except Exception as e:
+            logger.warning(f"图像预处理失败，使用原图识别：{e}")
+
+    timeout = None
+    if deadline is not None:
+        timeout = deadline - time.time()
+        if timeout <= 0:
+            raise OCRTimeout("识别开始前已超过截止时间")
+
+    try:
+        result = ocr_engines.tesseract(image, lang=OCR_LANGUAGES, timeout=timeout)
+        if result.strip():
+            return result.strip()
+        return "（OCR识别成功，但未提取到文本）"
+    except OCRTimeout:
+        raise
+    except ImportError:
+        logger.error("pytesseract库未安装，无法使用OCR功能")
+        return "（OCR识别失败，请先安装tesseract和pytesseract库）"
+    except Exception as e:
+        logger.warning(f"pytesseract识别失败：{e}")
+
+    # EasyOCR无法中途终止，剩余时间不足时不再尝试
+    if deadline is not None and time.time() >= deadline:
+        raise OCRTimeout("tesseract识别失败后已超过截止时间")
+    try:
+        text = ocr_engines.easyocr(image)
+        if text.strip():
+            return text.strip()
+        return "（OCR识别成功，但未提取到文本）"
+    except OCRBackendUnavailable:
+        logger.error("easyocr库未安装或模型加载失败，无法使用备用OCR功能")
+        return "（OCR识别失败，请先安装tesseract和pytesseract库或easyocr库）"
+    except Exception as e:
+        logger.error(f"easyocr识别失败：{e}")
+        return "（OCR识别失败，请安装并配置好OCR环境）"
@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDF并行提取流水线
+先在当前进程中按页提取文本层，将无文本层的扫描页分发到进程池并行渲染与OCR，
+最后按页码顺序拼接结果；支持单次请求的页数上限与OCR总超时（截止时间同时传给子进程，
+超时页的识别进程会被终止，不会继续占用进程池）
+"""
+
+import io
+import os
+import time
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Callable, List, Optional, Tuple
+
+import metrics
+import tracing
+from image_preprocess import OCR_TARGET_DPI
+from ocr_engines import OCRTimeout
+
+logger = logging.getLogger(__name__)
+
+# 单个PDF最多处理的页数
+PDF_MAX_PAGES = int(os.getenv('PDF_MAX_PAGES', 30))
+# 单个PDF所有扫描页OCR的总超时（秒）
+PDF_OCR_TIMEOUT = float(os.getenv('PDF_OCR_TIMEOUT', 120))
+# 扫描页渲染分辨率，默认直接渲染到OCR最佳分辨率，避免低分辨率渲染后再放大
+PDF_RENDER_DPI = int(os.getenv('PDF_RENDER_DPI', OCR_TARGET_DPI))
+# OCR进程池大小，默认等于CPU核数
+PDF_OCR_WORKERS = int(os.getenv('PDF_OCR_WORKERS', os.cpu_count() or 1))
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_ocr_pool() -> ProcessPoolExecutor:
+    """获取进程内共享的OCR进程池（首次调用时创建）"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # 服务进程是多线程的，使用spawn避免fork时继承其他线程持有的锁；
+            # 子进程不导出追踪数据，各页耗时由主进程补记到请求的追踪中
+            _pool = ProcessPoolExecutor(
+                max_workers=PDF_OCR_WORKERS,
+                mp_context=multiprocessing.get_context('spawn'),
+                initializer=tracing.disable
+            )
+        return _pool
+
+
+def _reset_ocr_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def ocr_pdf_page(pdf_bytes: bytes, page_index: int, ocr_func: Callable, deadline: Optional[float] = None) -> str:
+    """
+    渲染PDF的指定页并进行OCR（在进程池子进程中执行）
+
+    Args:
+        pdf_bytes: PDF文件字节内容
+        page_index: 页码（从0开始）
+        ocr_func: OCR识别函数 ocr_func(image, deadline=...)，接收PIL图像返回文本
+        deadline: 识别截止时间（time.time()时间戳）
+
+    Returns:
+        该页识别出的文本
+
+    Raises:
+        OCRTimeout: 超过截止时间
+    """
+    import pdfplumber
+    if deadline is not None and time.time() >= deadline:
+        # 已在队列中等到超时的页直接放弃，尽快让出子进程
+        raise OCRTimeout("渲染前已超过截止时间")
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        image = pdf.pages[page_index].to_image(resolution=PDF_RENDER_DPI).original
+    return ocr_func(image, deadline=deadline)
+
+
+def _timed_ocr_pdf_page(pdf_bytes: bytes, page_index: int, ocr_func: Callable, deadline: Optional[float]):
+    """在子进程中识别一页并返回 (文本, 耗时)，耗时由主进程记录到指标（子进程中的指标不会被抓取）"""
+    start = time.perf_counter()
+    text = ocr_pdf_page(pdf_bytes, page_index, ocr_func, deadline)
+    return text, time.perf_counter() - start
+
+
+@tracing.traced('extract_pdf_text')
+def extract_pdf_text(pdf_bytes: bytes, ocr_func: Callable, max_pages: Optional[int] = None,
+                     timeout: Optional[float] = None) -> Tuple[str, bool]:
+    """
+    提取PDF文本，扫描页并行OCR
+
+    Args:
+        pdf_bytes: PDF文件字节内容
+        ocr_func: OCR识别函数 ocr_func(image, deadline=...)，超过截止时间时抛出OCRTimeout；
+            需为轻量模块中的模块级函数，子进程导入该模块时不应加载Web服务
+        max_pages: 最多处理的页数，默认取 PDF_MAX_PAGES
+        timeout: 所有扫描页OCR的总超时（秒），默认取 PDF_OCR_TIMEOUT
+
+    Returns:
+        (按页码顺序拼接的文本, 是否完整)；有扫描页OCR超时或失败时文本中带有该页的提示，
+        结果不完整，调用方不应缓存
+    """
+    import pdfplumber
+
+    max_pages = PDF_MAX_PAGES if max_pages is None else max_pages
+    timeout = PDF_OCR_TIMEOUT if timeout is None else timeout
+    deadline = time.time() + timeout
+
+    page_texts: List[Optional[str]] = []
+    image_pages: List[int] = []
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        total_pages = len(pdf.pages)
+        for index, page in enumerate(pdf.pages[:max_pages]):
+            page_text = page.extract_text()
+            if page_text:
+                page_texts.append(page_text)
+            else:
+                # 无文本层的扫描页，稍后统一OCR
+                page_texts.append(None)
+                image_pages.append(index)
+        tracing.set_attribute('pdf.pages', len(page_texts))
+        tracing.set_attribute('pdf.ocr_pages', len(image_pages))
+        ocr_pages = list(image_pages)
+
+        if len(image_pages) == 1:
+            # 只有一页需要OCR时直接在当前进程处理，省去进程间传输
+            index = image_pages[0]
+            try:
+                page_texts[index] = ocr_func(pdf.pages[index].to_image(resolution=PDF_RENDER_DPI).original,
+                                             deadline=deadline)
+            except OCRTimeout:
+                logger.warning(f"PDF第{index + 1}页OCR超时")
+                page_texts[index] = f"（第{index + 1}页OCR超时）"
+            image_pages = []
+
+    if image_pages:
+        _ocr_pages_parallel(pdf_bytes, image_pages, page_texts, ocr_func, deadline)
+
+    failed_pages = [index + 1 for index in ocr_pages if _is_failed_page(page_texts[index])]
+    if failed_pages:
+        tracing.set_attribute('pdf.failed_pages', len(failed_pages))
+
+    text = "".join(page_texts)
+    if total_pages > max_pages:
+        logger.warning(f"PDF共{total_pages}页，超过上限，仅处理前{max_pages}页")
+        text += f"（PDF页数超过上限，仅处理了前{max_pages}页）"
+    return text, not failed_pages
+
+
+def _is_failed_page(page_text: str) -> bool:
+    # 超时/失败提示由本模块写入；OCR环境不可用时识别入口返回「（OCR识别失败...）」
+    return page_text.startswith(('（第', '（OCR识别失败'))
+
+
+def _ocr_page_serial(pdf_bytes: bytes, index: int, page_texts: List[Optional[str]], ocr_func: Callable,
+                     deadline: float):
+    try:
+        page_texts[index] = ocr_pdf_page(pdf_bytes, index, ocr_func, deadline)
+    except OCRTimeout:
+        logger.warning(f"PDF第{index + 1}页OCR超时")
+        page_texts[index] = f"（第{index + 1}页OCR超时）"
+
+
+def _ocr_pages_parallel(pdf_bytes: bytes, image_pages: List[int], page_texts: List[Optional[str]],
+                        ocr_func: Callable, deadline: float):
+    try:
+        pool = get_ocr_pool()
+        futures = {index: pool.submit(_timed_ocr_pdf_page, pdf_bytes, index, ocr_func, deadline)
+                   for index in image_pages}
+    except (BrokenProcessPool, RuntimeError) as e:
+        logger.error(f"OCR进程池不可用，改为串行处理：{e}")
+        _reset_ocr_pool()
+        for index in image_pages:
+            _ocr_page_serial(pdf_bytes, index, page_texts, ocr_func, deadline)
+        return
+
+    for index, future in futures.items():
+        try:
+            # 子进程按同一截止时间自行终止识别，这里多等片刻以取回其结果
+            page_texts[index], seconds = future.result(timeout=max(0.0, deadline - time.time()) + 1)
+            metrics.observe_stage('ocr', seconds)
+            tracing.record_span('ocr_pdf_page', seconds, {'pdf.page': index + 1})
+        except (FutureTimeoutError, OCRTimeout):
+            # 尚未开始的页直接取消；已开始的页由子进程在截止时间终止识别并让出进程
+            future.cancel()
+            logger.warning(f"PDF第{index + 1}页OCR超时")
+            page_texts[index] = f"（第{index + 1}页OCR超时）"
+        except BrokenProcessPool as e:
+            # 子进程异常退出时重建进程池，本页改在当前进程中处理
+            logger.error(f"OCR进程池异常退出，第{index + 1}页改为串行处理：{e}")
+            _reset_ocr_pool()
+            _ocr_page_serial(pdf_bytes, index, page_texts, ocr_func, deadline)
+        except Exception as e:
+            logger.error(f"PDF第{index + 1}页OCR失败：{e}")
+            page_texts[index] = f"（第{index + 1}页OCR失败）"
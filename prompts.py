@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+简历分析提示词
+所有入口共用的版本化提示词。全部静态指令放在固定的system消息中，候选人材料放在最后的user消息里，
+使每次请求的前缀完全一致，可以命中服务商的前缀缓存（prompt/KV cache），降低首字延迟与输入成本
+"""
+
+from typing import Dict, List, Optional
+
+# 提示词版本，修改提示词时需同步递增，使旧的分析结果缓存失效
+PROMPT_VERSION = '2'
+
+SYSTEM_PROMPT = """你是专业简历分析助手，具有5年以上招聘经验，对AI产品经理等岗位有深入理解。
+
+请基于用户提供的候选人简历文本、目标岗位和JD文本，生成一份结构清晰、核心信息用表格呈现的岗位匹配度分析报告，严格遵循以下模块和格式要求：
+
+### 输出格式要求
+---
+## 一、评分与分析理由板块
+1. **整体评分**：给出0-10分的综合得分
+2. **综合评价**：150字左右的总述，突出匹配亮点与核心短板
+3. **维度拆解分析**：必须用表格呈现，表格列固定为「维度|评分 (/10)|分析理由」，维度包含：
+   - 岗位匹配度
+   - 工作经验相关性
+   - 技能掌握程度
+   - 教育背景契合度
+   - 软技能与岗位适配性
+4. **主要差距总结**：用项目符号列出3-5条最核心的不匹配点
+
+---
+## 二、对照岗位 JD 逐条修改简历板块
+必须用表格呈现，表格列固定为「简历现有内容|岗位 JD 要求|差异分析|修改建议」，需将简历中所有与 JD 相关的条目逐一对应分析，并给出可直接替换的改写话术。
+
+---
+## 三、面试可能问的问题板块
+列出8-10个高针对性问题，每个问题后用「⚠️」标注考察点，例如：
+1. 你在实习中提到「构建多维度测评体系」，能否详细说明你是如何定义「准确性」和「逻辑性」的？⚠️ 考察数据质量把控能力和标准化思维
+
+---
+## 四、职业发展路径板块
+分「短期 (1-3年)」「中期 (3-5年)」「长期 (5年以上)」三个阶段，每个阶段包含：
+- 目标职位
+- 核心任务 / 能力升级重点
+- 行动建议（用「✅」标注具体动作）
+
+---
+## 五、结语建议板块
+给候选人的投递/面试策略总结，3-4条可落地的行动建议。
+
+---
+### 格式约束
+- 所有对比类、评分类内容必须用表格呈现，禁止纯文本堆砌
+- 每个板块用「---」分隔，标题用「#」「##」分级，保持视觉清晰
+- 语言需专业、简洁，避免冗余表述
+
+要求分析全面、具体，避免模板化回复，完全基于提供的JD和简历内容"""
+
+
+# 报告板块标题，顺序即合并顺序，需与 html_report 中的板块标题保持一致
+REPORT_SECTIONS = [
+    "一、评分与分析理由板块",
+    "二、对照岗位 JD 逐条修改简历板块",
+    "三、面试可能问的问题板块",
+    "四、职业发展路径板块",
+    "五、结语建议板块",
+]
+
+# 板块生成失败或超时时的占位内容
+SECTION_PLACEHOLDER = "> ⚠️ 该板块生成失败或超时，请稍后重新分析"
+
+
+def build_materials(resume_text: str, jd_text: str, target_position: Optional[str] = None) -> str:
+    """
+    构建输入材料文本
+    按变化频率从低到高排列：目标岗位、JD、简历，批量筛选同一JD时可共享更长的缓存前缀
+
+    Args:
+        resume_text: 简历文本内容
+        jd_text: 职位JD文本内容
+        target_position: 目标岗位
+
+    Returns:
+        输入材料文本
+    """
+    parts = ["### 输入材料"]
+    if target_position:
+        parts.append(f"目标岗位：{target_position}")
+    parts.append(f"目标岗位 JD 文本：\n{jd_text}")
+    parts.append(f"候选人简历文本：\n{resume_text}")
+    return "\n\n".join(parts)
+
+
+def build_messages(resume_text: str, jd_text: str, target_position: Optional[str] = None) -> List[Dict[str, str]]:
+    """
+    构建分析请求的消息列表：固定的system前缀 + 输入材料
+
+    Args:
+        resume_text: 简历文本内容
+        jd_text: 职位JD文本内容
+        target_position: 目标岗位
+
+    Returns:
+        chat.completions 所需的消息列表
+    """
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": build_materials(resume_text, jd_text, target_position)}
+    ]
+
+
+def build_section_messages(resume_text: str, jd_text: str, target_position: Optional[str], section: int) -> List[Dict[str, str]]:
+    """
+    构建只生成单个板块的消息列表，用于分板块并行生成
+    板块指令追加在完整消息之后，各板块请求共享system提示词与输入材料构成的前缀
+
+    Args:
+        resume_text: 简历文本内容
+        jd_text: 职位JD文本内容
+        target_position: 目标岗位
+        section: 板块序号（REPORT_SECTIONS 的下标）
+
+    Returns:
+        chat.completions 所需的消息列表
+    """
+    title = REPORT_SECTIONS[section]
+    messages = build_messages(resume_text, jd_text, target_position)
+    messages.append({
+        "role": "user",
+        "content": f"本次只输出「{title}」这一个板块：以「## {title}」作为标题开头，严格遵循上述该板块的格式要求，"
+                   f"不要输出其他板块、「---」分隔线或额外说明。"
+    })
+    return messages
+
+
+def build_row_update_messages(resume_text: str, jd_text: str, target_position: Optional[str],
+                              changed_lines: List[str]) -> List[Dict[str, str]]:
+    """
+    构建只为简历修改内容补充「逐条修改」表格行的消息列表，用于增量重新分析
+
+    Args:
+        resume_text: 修改后的简历文本
+        jd_text: 职位JD文本内容
+        target_position: 目标岗位
+        changed_lines: 新增或改写的简历行
+
+    Returns:
+        chat.completions 所需的消息列表
+    """
+    changes = "\n".join(f"- {line}" for line in changed_lines)
+    messages = build_messages(resume_text, jd_text, target_position)
+    messages.append({
+        "role": "user",
+        "content": f"候选人修改了简历，以下是新增或改写的内容：\n{changes}\n\n"
+                   f"只针对这些内容，输出「{REPORT_SECTIONS[1]}」表格中对应的行，"
+                   f"每行格式为「| 简历现有内容 | 岗位 JD 要求 | 差异分析 | 修改建议 |」，"
+                   f"不要输出表头、分隔行或其他任何内容。"
+    })
+    return messages
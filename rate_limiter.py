@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求频率限制
+基于GCRA（通用信元速率算法，等价于令牌桶）实现，每个客户端只需保存一个
+「理论到达时间」（TAT），单次检查为O(1)；空闲客户端的状态会被自动淘汰。
+后端可选进程内内存或SQLite（WAL），后者让同一节点上的多个工作进程共享配额
+"""
+
+import os
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Any, NamedTuple
+
+
+class RateLimitResult(NamedTuple):
+    """单次限流检查结果"""
+    allowed: bool
+    # 本次之后剩余的可用成本
+    remaining: float
+    # 被拒绝时，需要等待多久（秒）才能再次发起同样成本的请求
+    retry_after: float
+
+
+class _MemoryBackend:
+    """进程内状态：按最近更新时间排序的 key -> TAT"""
+
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self._tat = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def update(self, key: str, now: float, cost_interval: float, tolerance: float):
+        with self._lock:
+            # 最久未更新的状态在队首；TAT已过去的状态等价于满桶，可直接丢弃
+            while self._tat:
+                oldest_key, oldest_tat = next(iter(self._tat.items()))
+                if oldest_tat > now and len(self._tat) < self.max_keys:
+                    break
+                del self._tat[oldest_key]
+                self.evictions += 1
+
+            tat = max(self._tat.get(key, now), now)
+            new_tat = tat + cost_interval
+            if new_tat - now > tolerance:
+                return False, tat
+            self._tat[key] = new_tat
+            self._tat.move_to_end(key)
+            return True, new_tat
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'keys': len(self._tat), 'evictions': self.evictions}
+
+
+class _SQLiteBackend:
+    """SQLite状态：同一数据库文件可被多个进程共享，写入在 BEGIN IMMEDIATE 事务中完成"""
+
+    # 每隔多少次检查清理一次空闲状态
+    SWEEP_EVERY = 1000
+
+    def __init__(self, path: str):
+        self.path = path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._checks = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute("CREATE TABLE IF NOT EXISTS rate_limit (key TEXT PRIMARY KEY, tat REAL NOT NULL)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_rate_limit_tat ON rate_limit (tat)")
+
+    def update(self, key: str, now: float, cost_interval: float, tolerance: float):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tat FROM rate_limit WHERE key = ?", (key,)).fetchone()
+            tat = max(row[0], now) if row else now
+            new_tat = tat + cost_interval
+            allowed = new_tat - now <= tolerance
+            if allowed:
+                conn.execute("INSERT OR REPLACE INTO rate_limit (key, tat) VALUES (?, ?)", (key, new_tat))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        with self._lock:
+            self._checks += 1
+            sweep = self._checks % self.SWEEP_EVERY == 0
+        if sweep:
+            removed = conn.execute("DELETE FROM rate_limit WHERE tat <= ?", (now,)).rowcount
+            with self._lock:
+                self.evictions += removed
+        return (True, new_tat) if allowed else (False, tat)
+
+    def stats(self) -> Dict[str, Any]:
+        keys = self._conn().execute("SELECT COUNT(*) FROM rate_limit").fetchone()[0]
+        with self._lock:
+            return {'keys': keys, 'evictions': self.evictions}
+
+    def _conn(self) -> sqlite3.Connection:
+        # SQLite连接不能跨线程共享，每个线程持有自己的连接
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+class RateLimiter:
+    """GCRA限流器，按请求成本扣减配额"""
+
+    def __init__(self, limit: float = 6, period: float = 60, backend: str = 'memory',
+                 path: Optional[str] = None, max_keys: int = 100000):
+        """
+        初始化限流器
+
+        Args:
+            limit: 每个周期内允许的总成本（同时也是允许的最大突发量）
+            period: 周期长度（秒）
+            backend: 状态后端，memory（单进程）或 sqlite（同节点多进程共享）
+            path: sqlite后端的数据库文件路径
+            max_keys: memory后端最多保存的客户端数，超出时淘汰最久未访问的客户端
+        """
+        if limit <= 0 or period <= 0:
+            raise ValueError("限流配额与周期必须为正数")
+        self.limit = limit
+        self.period = period
+        # 每单位成本对应的时间间隔
+        self.interval = period / limit
+        if backend == 'sqlite':
+            self._backend = _SQLiteBackend(path or os.path.join('.cache', 'rate_limit.sqlite3'))
+        elif backend == 'memory':
+            self._backend = _MemoryBackend(max_keys)
+        else:
+            raise ValueError(f"未知的限流后端：{backend}")
+        self.backend_name = backend
+        self._stats_lock = threading.Lock()
+        self.allowed = 0
+        self.rejected = 0
+
+    def validate_cost(self, cost: float):
+        """
+        校验请求成本：成本超过周期配额的请求即使在满桶时也无法通过，重试没有意义
+
+        Raises:
+            ValueError: 成本超过配额
+        """
+        if cost > self.limit:
+            raise ValueError(f"请求成本{cost:g}超过限流配额{self.limit:g}，该请求永远无法通过")
+
+    def check(self, key: str, cost: float = 1, now: Optional[float] = None) -> RateLimitResult:
+        """
+        检查并扣减配额
+
+        Args:
+            key: 客户端标识（如IP）
+            cost: 本次请求的成本
+            now: 当前时间，默认取 time.time()
+
+        Returns:
+            RateLimitResult
+
+        Raises:
+            ValueError: 成本超过配额（这类请求不应返回可重试的429）
+        """
+        self.validate_cost(cost)
+        now = time.time() if now is None else now
+        cost_interval = cost * self.interval
+        allowed, tat = self._backend.update(key, now, cost_interval, self.period)
+
+        with self._stats_lock:
+            if allowed:
+                self.allowed += 1
+            else:
+                self.rejected += 1
+
+        remaining = max(0.0, (self.period - (tat - now)) / self.interval)
+        if allowed:
+            return RateLimitResult(True, remaining, 0.0)
+        retry_after = tat + cost_interval - now - self.period
+        return RateLimitResult(False, remaining, max(0.0, retry_after))
+
+    def stats(self) -> Dict[str, Any]:
+        data = self._backend.stats()
+        with self._stats_lock:
+            data.update({
+                'backend': self.backend_name,
+                'limit': self.limit,
+                'period': self.period,
+                'allowed': self.allowed,
+                'rejected': self.rejected,
+            })
+        return data
+
+
+# 创建全局限流器
+rate_limiter = RateLimiter(
+    limit=float(os.getenv('RATE_LIMIT_PER_MINUTE', 6)),
+    period=60,
+    backend=os.getenv('RATE_LIMIT_BACKEND', 'memory'),
+    path=os.getenv('RATE_LIMIT_PATH') or None,
+    max_keys=int(os.getenv('RATE_LIMIT_MAX_KEYS', 100000))
+)
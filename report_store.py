@@ -0,0 +1,270 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+分析报告存储
+按报告ID持久化每次分析的Markdown与渲染后的HTML：HTML只在保存时渲染一次，以gzip（安装zstandard时另存zstd）
+预压缩后写入SQLite，查看时按客户端支持的编码直接返回压缩内容，并提供ETag与Last-Modified支持条件请求，
+报告链接可以反复打开、分享而不会重新分析或重新渲染。报告默认引用带内容指纹的共享样式表，
+下载、打印等需要独立HTML的场景按需内联样式
+"""
+
+import os
+import gzip
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from typing import Optional, Dict, Any, Tuple
+
+import html_report
+from cache_store import MemoryLRUCache
+from http_delivery import negotiated_response, COMPRESS_LEVEL, REPORT_STYLESHEET_URL
+
+logger = logging.getLogger(__name__)
+
+# 报告查看页允许浏览器缓存的时间（秒）；同一报告ID的内容不会改变，过期后凭ETag重新验证
+REPORT_CACHE_MAX_AGE = int(os.getenv('REPORT_CACHE_MAX_AGE', 3600))
+# gzip压缩级别
+REPORT_GZIP_LEVEL = int(os.getenv('REPORT_GZIP_LEVEL', 9))
+# 报告是否引用共享样式表（关闭时每份报告内联完整样式）
+REPORT_EXTERNAL_CSS = os.getenv('REPORT_EXTERNAL_CSS', '1') == '1'
+
+
+def _zstd_compressor():
+    """安装了zstandard时返回zstd压缩器，否则返回None"""
+    if os.getenv('REPORT_STORE_ZSTD', '1') != '1':
+        return None
+    try:
+        import zstandard
+    except ImportError:
+        return None
+    return zstandard.ZstdCompressor(level=19)
+
+
+class StoredReport:
+    """一份已保存的报告：预压缩的HTML及用于条件请求的元数据"""
+
+    __slots__ = ('report_id', 'target_position', 'etag', 'created_at', 'bodies')
+
+    def __init__(self, report_id: str, target_position: str, etag: str, created_at: float, bodies: Dict[str, bytes]):
+        """
+        Args:
+            report_id: 报告ID
+            target_position: 目标岗位
+            etag: HTML内容摘要
+            created_at: 保存时间戳
+            bodies: 编码 -> 压缩后的HTML（至少包含gzip）
+        """
+        self.report_id = report_id
+        self.target_position = target_position
+        self.etag = etag
+        self.created_at = created_at
+        self.bodies = bodies
+
+    @property
+    def size(self) -> int:
+        return sum(len(body) for body in self.bodies.values())
+
+    @property
+    def html(self) -> str:
+        """解压后的HTML"""
+        return gzip.decompress(self.bodies['gzip']).decode('utf-8')
+
+    def response(self, headers, inline: bool = False) -> Tuple[int, Dict[str, str], bytes]:
+        """
+        生成报告查看响应（与Web框架无关，Flask与ASGI模式共用）
+
+        Args:
+            headers: 请求头（支持 .get 的映射）
+            inline: 是否返回内联样式的独立HTML
+
+        Returns:
+            (状态码, 响应头, 响应体)；客户端缓存有效时返回304与空响应体
+        """
+        # 报告包含个人信息，只允许浏览器缓存
+        cache_control = f'private, max-age={REPORT_CACHE_MAX_AGE}'
+        if not inline:
+            return negotiated_response(headers, self.etag, self.bodies, lambda: self.html.encode('utf-8'),
+                                       'text/html; charset=utf-8', cache_control, self.created_at)
+        data = html_report.inline_stylesheet(self.html, REPORT_STYLESHEET_URL).encode('utf-8')
+        return negotiated_response(headers, f'{self.etag}-inline', {'gzip': gzip.compress(data, COMPRESS_LEVEL)},
+                                   data, 'text/html; charset=utf-8', cache_control, self.created_at)
+
+
+class ReportStore:
+    """报告存储：SQLite持久化 + 内存LRU缓存最近查看的报告，线程安全"""
+
+    def __init__(self, path: Optional[str], ttl: Optional[float] = None, max_bytes: Optional[int] = None,
+                 memory_entries: int = 256):
+        """
+        初始化报告存储
+
+        Args:
+            path: SQLite数据库文件路径，None表示仅保存在内存中
+            ttl: 报告保存时间（秒），None表示永久保存
+            max_bytes: 磁盘上报告内容（压缩后）的总字节数上限，超出时删除最早的报告，None表示不限制
+            memory_entries: 内存中缓存的报告数
+        """
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.memory = MemoryLRUCache(max_entries=memory_entries, ttl=ttl, sizeof=lambda report: report.size)
+        self._zstd = _zstd_compressor()
+        self._local = threading.local()
+        self._stats_lock = threading.Lock()
+        self.renders = 0
+        self.evictions = 0
+
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            self._conn().execute(
+                "CREATE TABLE IF NOT EXISTS reports ("
+                " report_id TEXT PRIMARY KEY,"
+                " target_position TEXT NOT NULL,"
+                " markdown BLOB NOT NULL,"
+                " html_gzip BLOB NOT NULL,"
+                " html_zstd BLOB,"
+                " etag TEXT NOT NULL,"
+                " size INTEGER NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " expires_at REAL)"
+            )
+            self._conn().execute("CREATE INDEX IF NOT EXISTS idx_reports_created ON reports (created_at)")
+
+    def save(self, report_id: str, markdown_content: str, target_position: str,
+             html_content: Optional[str] = None) -> StoredReport:
+        """
+        保存报告，同一ID已存在时覆盖
+
+        Args:
+            report_id: 报告ID（一般为分析ID）
+            markdown_content: Markdown格式的分析报告
+            target_position: 目标岗位
+            html_content: 已渲染的HTML，None时在此渲染
+
+        Returns:
+            保存的报告
+        """
+        if html_content is None:
+            html_content = html_report.markdown_to_html(
+                markdown_content, target_position, REPORT_STYLESHEET_URL if REPORT_EXTERNAL_CSS else None
+            )
+            with self._stats_lock:
+                self.renders += 1
+        data = html_content.encode('utf-8')
+        bodies = {'gzip': gzip.compress(data, REPORT_GZIP_LEVEL, mtime=0)}
+        if self._zstd is not None:
+            bodies['zstd'] = self._zstd.compress(data)
+        report = StoredReport(report_id, target_position, hashlib.sha256(data).hexdigest()[:32], time.time(), bodies)
+
+        if self.path:
+            markdown_gzip = gzip.compress(markdown_content.encode('utf-8'), REPORT_GZIP_LEVEL, mtime=0)
+            size = report.size + len(markdown_gzip)
+            expires_at = report.created_at + self.ttl if self.ttl else None
+            conn = self._conn()
+            conn.execute(
+                "INSERT OR REPLACE INTO reports (report_id, target_position, markdown, html_gzip, html_zstd, etag,"
+                " size, created_at, expires_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (report_id, target_position, markdown_gzip, bodies['gzip'], bodies.get('zstd'), report.etag,
+                 size, report.created_at, expires_at)
+            )
+            if self.max_bytes is not None:
+                self._evict(conn)
+        self.memory.set(report_id, report)
+        return report
+
+    def get(self, report_id: str) -> Optional[StoredReport]:
+        """读取报告，不存在或已过期时返回None"""
+        if not report_id:
+            return None
+        report = self.memory.get(report_id)
+        if report is not None or not self.path:
+            return report
+
+        row = self._conn().execute(
+            "SELECT target_position, html_gzip, html_zstd, etag, created_at, expires_at FROM reports"
+            " WHERE report_id = ?", (report_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        target_position, html_gzip, html_zstd, etag, created_at, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            self._conn().execute("DELETE FROM reports WHERE report_id = ?", (report_id,))
+            return None
+        bodies = {'gzip': html_gzip}
+        if html_zstd is not None:
+            bodies['zstd'] = html_zstd
+        report = StoredReport(report_id, target_position, etag, created_at, bodies)
+        self.memory.set(report_id, report)
+        return report
+
+    def get_markdown(self, report_id: str) -> Optional[str]:
+        """读取报告的Markdown原文，仅磁盘存储可用"""
+        if not self.path:
+            return None
+        row = self._conn().execute(
+            "SELECT markdown FROM reports WHERE report_id = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (report_id, time.time())
+        ).fetchone()
+        return gzip.decompress(row[0]).decode('utf-8') if row else None
+
+    def stats(self) -> Dict[str, Any]:
+        data = {'memory': self.memory.stats(), 'zstd': self._zstd is not None}
+        with self._stats_lock:
+            data['renders'] = self.renders
+            data['evictions'] = self.evictions
+        if self.path:
+            entries, total = self._conn().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM reports"
+            ).fetchone()
+            data['disk'] = {'entries': entries, 'bytes': total}
+        else:
+            data['disk'] = None
+        return data
+
+    def _evict(self, conn: sqlite3.Connection):
+        conn.execute("DELETE FROM reports WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),))
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM reports").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        victims = []
+        for report_id, size in conn.execute("SELECT report_id, size FROM reports ORDER BY created_at").fetchall():
+            if total <= self.max_bytes:
+                break
+            victims.append((report_id,))
+            total -= size
+        conn.executemany("DELETE FROM reports WHERE report_id = ?", victims)
+        for (report_id,) in victims:
+            self.memory.delete(report_id)
+        with self._stats_lock:
+            self.evictions += len(victims)
+
+    def _conn(self) -> sqlite3.Connection:
+        # SQLite连接不能跨线程共享，每个线程持有自己的连接
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+
+def build_report_store() -> ReportStore:
+    """根据环境变量构建报告存储，磁盘存储初始化失败时仅使用内存"""
+    ttl = float(os.getenv('REPORT_STORE_TTL', 30 * 24 * 3600)) or None
+    memory_entries = int(os.getenv('REPORT_STORE_MEMORY_ENTRIES', 256))
+    path = os.getenv('REPORT_STORE_PATH', os.path.join('.cache', 'reports.sqlite3'))
+    if path:
+        try:
+            return ReportStore(path, ttl=ttl, max_bytes=int(os.getenv('REPORT_STORE_MAX_BYTES', 500 * 1024 * 1024)),
+                               memory_entries=memory_entries)
+        except Exception as e:
+            logger.error(f"报告磁盘存储初始化失败，仅使用内存：{str(e)}")
+    # 仅内存时由LRU承担存储，适当放大容量
+    return ReportStore(None, ttl=ttl, memory_entries=max(memory_entries, 1024))
+
+
+# 创建全局报告存储
+report_store = build_report_store()
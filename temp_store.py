@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+临时内容存储
+保存上传文件提取出的文本，供后续分析请求按文件ID读取。
+支持字节预算、LRU + TTL淘汰、后台定时清理和线程安全访问；
+后端可选进程内内存或SQLite（WAL），后者可让多个工作进程共享同一批文件ID
+"""
+
+import os
+import json
+import time
+import uuid
+import logging
+import threading
+from typing import Optional, Dict, Any
+
+from cache_store import MemoryLRUCache, SQLiteCache
+
+logger = logging.getLogger(__name__)
+
+
+def _record_size(record: Dict[str, Any]) -> int:
+    return len((record.get('content') or '').encode('utf-8')) + len((record.get('filename') or '').encode('utf-8'))
+
+
+class _SQLiteBackend:
+    """将记录序列化为JSON后存入SQLite缓存"""
+
+    def __init__(self, path: str, ttl: float, max_bytes: int):
+        self._cache = SQLiteCache(path, ttl=ttl, max_bytes=max_bytes)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        value = self._cache.get(key)
+        return json.loads(value) if value is not None else None
+
+    def set(self, key: str, record: Dict[str, Any]):
+        self._cache.set(key, json.dumps(record, ensure_ascii=False))
+
+    def delete(self, key: str) -> bool:
+        return self._cache.delete(key)
+
+    def purge_expired(self) -> int:
+        return self._cache.purge_expired()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+class _MemoryBackend:
+    """进程内LRU存储"""
+
+    def __init__(self, ttl: float, max_bytes: int):
+        self._cache = MemoryLRUCache(max_entries=None, max_bytes=max_bytes, ttl=ttl, sizeof=_record_size)
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        record = self._cache.get(key)
+        # 返回副本，避免调用方修改影响已存储的记录
+        return dict(record) if record is not None else None
+
+    def set(self, key: str, record: Dict[str, Any]):
+        self._cache.set(key, dict(record))
+
+    def delete(self, key: str) -> bool:
+        return self._cache.delete(key)
+
+    def purge_expired(self) -> int:
+        return self._cache.purge_expired()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+class TempContentStore:
+    """按文件ID存取提取文本的临时存储"""
+
+    def __init__(self, backend: str = 'memory', path: Optional[str] = None,
+                 ttl: float = 3600, max_bytes: int = 256 * 1024 * 1024):
+        """
+        初始化存储
+
+        Args:
+            backend: 存储后端，memory（单进程）或 sqlite（多进程共享）
+            path: sqlite后端的数据库文件路径
+            ttl: 文件自最近一次写入/续期起的保留时长（秒）
+            max_bytes: 存储内容的总字节数上限，超出时淘汰最久未使用的文件
+        """
+        self.ttl = ttl
+        if backend == 'sqlite':
+            self._backend = _SQLiteBackend(path or os.path.join('.cache', 'temp_files.sqlite3'), ttl, max_bytes)
+        elif backend == 'memory':
+            self._backend = _MemoryBackend(ttl, max_bytes)
+        else:
+            raise ValueError(f"未知的临时存储后端：{backend}")
+        self.backend_name = backend
+        self._sweeper = None
+        self._stop = threading.Event()
+
+    def put(self, content: Optional[str], filename: str, file_id: Optional[str] = None) -> str:
+        """
+        保存文件内容
+
+        Args:
+            content: 提取出的文本
+            filename: 原始文件名
+            file_id: 指定文件ID，未指定时自动生成
+
+        Returns:
+            文件ID
+        """
+        file_id = file_id or str(uuid.uuid4())
+        self._backend.set(file_id, {
+            'content': content,
+            'filename': filename,
+            'timestamp': time.time()
+        })
+        return file_id
+
+    def get(self, file_id: str) -> Optional[Dict[str, Any]]:
+        """按文件ID读取记录，不存在或已过期时返回None"""
+        if not file_id:
+            return None
+        return self._backend.get(file_id)
+
+    def touch(self, file_id: str) -> bool:
+        """为仍然有效的文件续期，返回文件是否存在"""
+        record = self.get(file_id)
+        if record is None:
+            return False
+        record['timestamp'] = time.time()
+        self._backend.set(file_id, record)
+        return True
+
+    def delete(self, file_id: str) -> bool:
+        return self._backend.delete(file_id)
+
+    def __contains__(self, file_id: str) -> bool:
+        return self.get(file_id) is not None
+
+    def purge_expired(self) -> int:
+        """清理过期文件，返回清理数量"""
+        return self._backend.purge_expired()
+
+    def start_sweeper(self, interval: float = 60) -> threading.Thread:
+        """
+        启动后台清理线程，定期清理过期文件（重复调用不会启动多个线程）
+
+        Args:
+            interval: 清理间隔（秒）
+        """
+        if self._sweeper is not None and self._sweeper.is_alive():
+            return self._sweeper
+
+        def _sweep():
+            while not self._stop.wait(interval):
+                try:
+                    removed = self.purge_expired()
+                    if removed:
+                        logger.info(f"已清理{removed}个过期临时文件")
+                except Exception as e:
+                    logger.error(f"临时文件清理失败：{str(e)}")
+
+        self._sweeper = threading.Thread(target=_sweep, name='temp-store-sweeper', daemon=True)
+        self._sweeper.start()
+        return self._sweeper
+
+    def stop_sweeper(self):
+        self._stop.set()
+
+    def stats(self) -> Dict[str, Any]:
+        data = self._backend.stats()
+        data['backend'] = self.backend_name
+        return data
+
+
+# 创建全局临时存储
+temp_store = TempContentStore(
+    backend=os.getenv('TEMP_STORE_BACKEND', 'memory'),
+    path=os.getenv('TEMP_STORE_PATH') or None,
+    ttl=float(os.getenv('TEMP_FILE_TTL', 3600)),
+    max_bytes=int(os.getenv('TEMP_STORE_MAX_BYTES', 256 * 1024 * 1024))
+)
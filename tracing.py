@@ -0,0 +1,497 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+请求级追踪
+同一次用户操作（上传JD与简历、发起分析、轮询结果）的各个请求共用一个追踪ID：客户端通过W3C traceparent请求头
+（或 X-Trace-Id）传入，服务端在上传解析、文件提取、OCR、大模型调用与报告渲染等环节记录嵌套的span，
+并在响应头 X-Trace-Id 中返回追踪ID。结束的span由后台线程批量追加到JSON lines文件，每行是一个OTLP/JSON格式的
+ExportTraceServiceRequest（与OpenTelemetry Collector的file exporter输出格式一致），可导入Jaeger等工具或直接用jq分析
+
+说明：
+    - 当前span保存在contextvars中；提交到线程池的任务需用 propagate 包装，才能沿用提交时的追踪上下文
+    - 未配置导出文件或未被采样时span不记录，但追踪ID照常传递并返回给客户端
+"""
+
+import os
+import re
+import json
+import time
+import queue
+import atexit
+import random
+import logging
+import inspect
+import functools
+import threading
+import contextlib
+import contextvars
+from typing import Optional, Dict, Any, Tuple, List
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+# span导出文件（JSON lines），为空表示不导出
+TRACE_EXPORT_PATH = os.getenv('TRACE_EXPORT_PATH', os.path.join('.cache', 'traces.jsonl'))
+# 导出文件超过该大小（字节）时轮转为 .1 文件
+TRACE_EXPORT_MAX_BYTES = int(os.getenv('TRACE_EXPORT_MAX_BYTES', 100 * 1024 * 1024))
+# 新建追踪的采样率；携带traceparent的请求沿用客户端的采样标志
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 1))
+TRACE_SERVICE_NAME = os.getenv('TRACE_SERVICE_NAME', 'aipm-resume-analyzer')
+
+# 返回追踪ID的响应头（也接受同名请求头传入追踪ID）
+TRACE_HEADER = 'X-Trace-Id'
+# 不记录追踪的路径（指标抓取）
+UNTRACED_PATHS = ('/metrics',)
+
+# OTLP span类型
+KIND_INTERNAL = 1
+KIND_SERVER = 2
+KIND_CLIENT = 3
+
+# OTLP状态码
+STATUS_UNSET = 0
+STATUS_OK = 1
+STATUS_ERROR = 2
+
+_TRACEPARENT_RE = re.compile(r'^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$')
+_TRACE_ID_RE = re.compile(r'^[0-9a-f]{32}$')
+
+SPANS_TOTAL = metrics.registry.counter('aipm_trace_spans_total', '已结束的追踪span数（exported/dropped）', ('outcome',))
+
+
+def _random_id(nbytes: int) -> str:
+    value = 0
+    while not value:
+        value = random.getrandbits(nbytes * 8)
+    return format(value, f'0{nbytes * 2}x')
+
+
+def _otlp_value(value) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {'boolValue': value}
+    if isinstance(value, int):
+        return {'intValue': str(value)}
+    if isinstance(value, float):
+        return {'doubleValue': value}
+    return {'stringValue': str(value)}
+
+
+def _otlp_attributes(attributes: Dict[str, Any]) -> List[Dict[str, Any]]:
+    return [{'key': key, 'value': _otlp_value(value)} for key, value in attributes.items() if value is not None]
+
+
+class Span:
+    """一段计时的操作，结束时交给导出器"""
+
+    __slots__ = ('trace_id', 'span_id', 'parent_id', 'name', 'kind', 'recording', 'attributes', 'events',
+                 'status', 'status_message', 'start_ns', '_start', 'end_ns')
+
+    def __init__(self, name: str, trace_id: str, parent_id: Optional[str], recording: bool,
+                 kind: int = KIND_INTERNAL, attributes: Optional[Dict[str, Any]] = None):
+        """
+        Args:
+            name: span名称
+            trace_id: 追踪ID（32位十六进制）
+            parent_id: 父span ID，None表示根span
+            recording: 是否记录并导出
+            kind: span类型
+            attributes: 初始属性
+        """
+        self.trace_id = trace_id
+        self.span_id = _random_id(8)
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.recording = recording
+        self.attributes = dict(attributes) if attributes else {}
+        self.events = []
+        self.status = STATUS_UNSET
+        self.status_message = ''
+        self.start_ns = time.time_ns()
+        # 耗时以单调时钟计算，不受系统时间调整影响
+        self._start = time.perf_counter_ns()
+        self.end_ns = None
+
+    @property
+    def traceparent(self) -> str:
+        """向下游传递的W3C traceparent请求头"""
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.recording else '00'}"
+
+    @property
+    def duration(self) -> float:
+        """耗时（秒），未结束时为截至当前的耗时"""
+        end = self.end_ns if self.end_ns is not None else self.start_ns + time.perf_counter_ns() - self._start
+        return (end - self.start_ns) / 1e9
+
+    def set_attribute(self, key: str, value):
+        if self.recording:
+            self.attributes[key] = value
+
+    def add_event(self, name: str, attributes: Optional[Dict[str, Any]] = None):
+        if self.recording:
+            self.events.append((time.time_ns(), name, attributes or {}))
+
+    def record_exception(self, exc: BaseException):
+        """标记为失败并记录异常类型与信息"""
+        self.status = STATUS_ERROR
+        self.status_message = type(exc).__name__
+        self.add_event('exception', {'exception.type': type(exc).__name__, 'exception.message': str(exc)})
+
+    def end(self):
+        if self.end_ns is not None:
+            return
+        self.end_ns = self.start_ns + time.perf_counter_ns() - self._start
+        if self.recording:
+            exporter.export(self)
+
+    def to_otlp(self) -> Dict[str, Any]:
+        data = {
+            'traceId': self.trace_id,
+            'spanId': self.span_id,
+            'name': self.name,
+            'kind': self.kind,
+            'startTimeUnixNano': str(self.start_ns),
+            'endTimeUnixNano': str(self.end_ns),
+            'attributes': _otlp_attributes(self.attributes),
+            'status': {'code': self.status},
+        }
+        if self.parent_id:
+            data['parentSpanId'] = self.parent_id
+        if self.status_message:
+            data['status']['message'] = self.status_message
+        if self.events:
+            data['events'] = [
+                {'timeUnixNano': str(ts), 'name': name, 'attributes': _otlp_attributes(attributes)}
+                for ts, name, attributes in self.events
+            ]
+        return data
+
+
+class JsonLinesExporter:
+    """后台线程批量追加OTLP/JSON lines，导出不阻塞请求处理；队列满时丢弃span"""
+
+    def __init__(self, path: Optional[str], max_bytes: int, max_queue: int = 10000, batch_size: int = 512,
+                 flush_interval: float = 1.0):
+        """
+        Args:
+            path: 导出文件路径，None或空表示不导出
+            max_bytes: 导出文件轮转阈值（字节）
+            max_queue: 待写入span数上限
+            batch_size: 每行（每次写入）最多包含的span数
+            flush_interval: 后台线程最长等待时间（秒）
+        """
+        self.path = path or None
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._write_lock = threading.Lock()
+        self._thread = None
+        self._thread_lock = threading.Lock()
+        if self.path:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+
+    @property
+    def enabled(self) -> bool:
+        return self.path is not None
+
+    def export(self, span: Span):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(span)
+        except queue.Full:
+            SPANS_TOTAL.inc(outcome='dropped')
+
+    def flush(self):
+        """同步写出队列中的全部span"""
+        while True:
+            batch = self._drain([])
+            if not batch:
+                return
+            self._write(batch)
+
+    def _ensure_worker(self):
+        # 延迟到首次导出时启动，多进程部署时fork后的子进程会重新启动自己的写入线程
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._thread_lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._worker, name='trace-exporter', daemon=True)
+                self._thread.start()
+
+    def _drain(self, batch: List[Span]) -> List[Span]:
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _worker(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            self._write(self._drain([first]))
+
+    def _write(self, batch: List[Span]):
+        line = json.dumps({'resourceSpans': [{
+            'resource': {'attributes': _otlp_attributes({'service.name': TRACE_SERVICE_NAME,
+                                                         'process.pid': os.getpid()})},
+            'scopeSpans': [{'scope': {'name': __name__}, 'spans': [span.to_otlp() for span in batch]}],
+        }]}, ensure_ascii=False, separators=(',', ':'))
+        with self._write_lock:
+            try:
+                if self.max_bytes and os.path.exists(self.path) and os.path.getsize(self.path) >= self.max_bytes:
+                    os.replace(self.path, self.path + '.1')
+                with open(self.path, 'a', encoding='utf-8') as f:
+                    f.write(line + '\n')
+                SPANS_TOTAL.inc(len(batch), outcome='exported')
+            except OSError as e:
+                SPANS_TOTAL.inc(len(batch), outcome='dropped')
+                logger.error(f"追踪数据写入失败：{str(e)}")
+
+
+# 创建全局span导出器
+exporter = JsonLinesExporter(TRACE_EXPORT_PATH, TRACE_EXPORT_MAX_BYTES)
+atexit.register(exporter.flush)
+
+_current_span = contextvars.ContextVar('current_span', default=None)
+
+
+def disable():
+    """关闭当前进程的span导出（用作进程池子进程的初始化函数），追踪ID仍照常传递"""
+    exporter.path = None
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_trace_id() -> Optional[str]:
+    span = _current_span.get()
+    return span.trace_id if span else None
+
+
+def set_attribute(key: str, value):
+    """为当前span设置属性，没有当前span时忽略"""
+    span = _current_span.get()
+    if span is not None:
+        span.set_attribute(key, value)
+
+
+def add_event(name: str, attributes: Optional[Dict[str, Any]] = None):
+    """为当前span添加事件，没有当前span时忽略"""
+    span = _current_span.get()
+    if span is not None:
+        span.add_event(name, attributes)
+
+
+def _sample() -> bool:
+    return exporter.enabled and random.random() < TRACE_SAMPLE_RATE
+
+
+def start_span(name: str, attributes: Optional[Dict[str, Any]] = None, kind: int = KIND_INTERNAL) -> Span:
+    """创建当前span的子span（没有当前span时开始新的追踪），不改变当前span"""
+    parent = _current_span.get()
+    if parent is None:
+        return Span(name, _random_id(16), None, _sample(), kind, attributes)
+    return Span(name, parent.trace_id, parent.span_id, parent.recording, kind, attributes)
+
+
+def activate(span: Span) -> contextvars.Token:
+    """将span设为当前span，返回用于 deactivate 的令牌"""
+    return _current_span.set(span)
+
+
+def deactivate(token: contextvars.Token):
+    try:
+        _current_span.reset(token)
+    except ValueError:
+        # 令牌来自其他上下文（如流式响应在别的线程中结束），该上下文随请求结束丢弃
+        pass
+
+
+@contextlib.contextmanager
+def span(name: str, attributes: Optional[Dict[str, Any]] = None, kind: int = KIND_INTERNAL):
+    """
+    在with块内记录一个span并将其设为当前span
+
+    Args:
+        name: span名称
+        attributes: 初始属性
+        kind: span类型
+    """
+    current = start_span(name, attributes, kind)
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.record_exception(e)
+        raise
+    finally:
+        _current_span.reset(token)
+        current.end()
+
+
+def record_span(name: str, seconds: float, attributes: Optional[Dict[str, Any]] = None):
+    """补记一个刚刚结束、耗时已知的子span（如在进程池中测得的耗时）"""
+    current = start_span(name, attributes)
+    delta = int(seconds * 1e9)
+    current.start_ns -= delta
+    current._start -= delta
+    current.end()
+
+
+def traced(name: str, kind: int = KIND_INTERNAL):
+    """
+    记录函数调用span的装饰器，支持普通函数、协程、生成器与异步生成器
+    （生成器从开始迭代计时到迭代结束，span只在每次取值期间作为当前span，不会泄漏到迭代方）
+
+    Args:
+        name: span名称
+        kind: span类型
+    """
+    def decorator(func):
+        if inspect.isasyncgenfunction(func):
+            @functools.wraps(func)
+            async def async_gen_wrapper(*args, **kwargs):
+                current = start_span(name, kind=kind)
+                agen = func(*args, **kwargs)
+                try:
+                    while True:
+                        token = _current_span.set(current)
+                        try:
+                            item = await agen.__anext__()
+                        except StopAsyncIteration:
+                            return
+                        finally:
+                            _current_span.reset(token)
+                        yield item
+                except GeneratorExit:
+                    current.set_attribute('cancelled', True)
+                    await agen.aclose()
+                    raise
+                except BaseException as e:
+                    current.record_exception(e)
+                    raise
+                finally:
+                    current.end()
+            return async_gen_wrapper
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name, kind=kind):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        if inspect.isgeneratorfunction(func):
+            @functools.wraps(func)
+            def gen_wrapper(*args, **kwargs):
+                yield from iterate_in_span(start_span(name, kind=kind), func(*args, **kwargs))
+            return gen_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name, kind=kind):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def iterate_in_span(current: Span, iterable):
+    """
+    在span下迭代（如流式响应体），每次取值期间以该span为当前span，迭代结束或被关闭时结束span
+
+    Args:
+        current: 已开始的span
+        iterable: 被迭代的对象，有close方法时结束后调用
+    """
+    iterator = iter(iterable)
+    try:
+        while True:
+            token = _current_span.set(current)
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                _current_span.reset(token)
+            yield item
+    except GeneratorExit:
+        current.set_attribute('cancelled', True)
+        raise
+    except BaseException as e:
+        current.record_exception(e)
+        raise
+    finally:
+        close = getattr(iterable, 'close', None)
+        if close is not None:
+            close()
+        current.end()
+
+
+def propagate(func):
+    """
+    绑定当前追踪上下文，提交到线程池的函数在工作线程中沿用提交时的当前span
+    （每次调用使用上下文的独立副本，同一包装函数可在多个线程中并发执行）
+    """
+    context = contextvars.copy_context()
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        return context.copy().run(func, *args, **kwargs)
+    return wrapper
+
+
+def extract_context(headers) -> Tuple[Optional[str], Optional[str], Optional[bool]]:
+    """
+    从请求头解析上游追踪上下文
+
+    Args:
+        headers: 请求头（支持 .get 的映射）
+
+    Returns:
+        (追踪ID, 父span ID, 是否采样)；无效或缺失的部分为None
+    """
+    match = _TRACEPARENT_RE.match((headers.get('traceparent') or '').strip().lower())
+    if match and match.group(1) != '0' * 32 and match.group(2) != '0' * 16:
+        return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+    trace_id = (headers.get(TRACE_HEADER) or '').strip().lower()
+    if _TRACE_ID_RE.match(trace_id) and trace_id != '0' * 32:
+        return trace_id, None, None
+    return None, None, None
+
+
+def start_request(method: str, path: str, headers, client: Optional[str] = None) -> Optional[Span]:
+    """
+    为一次HTTP请求创建服务端span（Flask与ASGI模式共用），不改变当前span
+
+    Args:
+        method: 请求方法
+        path: 请求路径
+        headers: 请求头
+        client: 客户端地址
+
+    Returns:
+        请求span；不记录追踪的路径返回None
+    """
+    if path in UNTRACED_PATHS:
+        return None
+    trace_id, parent_id, sampled = extract_context(headers)
+    recording = (exporter.enabled and sampled) if sampled is not None else _sample()
+    attributes = {'http.request.method': method, 'url.path': path, 'client.address': client}
+    return Span(f'{method} {path}', trace_id or _random_id(16), parent_id, recording, KIND_SERVER, attributes)
+
+
+def finish_request(request_span: Span, status: int, route: Optional[str] = None):
+    """记录响应状态（与匹配到的路由模板），在请求结束时调用 end"""
+    request_span.set_attribute('http.response.status_code', status)
+    if route:
+        request_span.name = f"{request_span.attributes.get('http.request.method', '')} {route}"
+        request_span.set_attribute('http.route', route)
+    if status >= 500:
+        request_span.status = STATUS_ERROR